@@ -75,7 +75,8 @@ DATABASES = {
         'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
         'PORT': os.getenv('POSTGRES_PORT', '5432'),
         'OPTIONS': {
-            'options': '-c search_path=public -c client_encoding=UTF8'
+            'options': '-c search_path=public -c client_encoding=UTF8',
+            'application_name': os.getenv('DJANGO_DB_APPLICATION_NAME', 'zakupki-admin'),
         },
         'CONN_MAX_AGE': 600,
     }
@@ -56,6 +56,87 @@ async def user_info(message: Message, db_user: User) -> None:
     await message.answer(text, parse_mode="HTML")
 
 
+@router.message(Command("llm_stats"))
+async def llm_stats(message: Message, db_user: User) -> None:
+    """Состояние очереди запросов к LLM (только для админов)"""
+    if not is_admin(db_user):
+        await message.answer("⚠️ Эта команда доступна только администраторам.")
+        return
+    
+    from services.ai import llm_scheduler
+    metrics = llm_scheduler.get_metrics()
+    queue_by_priority = ", ".join(f"{name}: {count}" for name, count in metrics["queue_by_priority"].items()) or "пусто"
+    
+    text = "🧠 <b>Очередь запросов к LLM:</b>\n\n"
+    text += f"В очереди: {metrics['queue_depth']} ({queue_by_priority})\n"
+    text += f"Выполняется: {metrics['active']} из {metrics['max_concurrency']}\n\n"
+    text += f"Запросов: {metrics['requests']}\n"
+    text += f"Повторов: {metrics['retries']} (из них 429: {metrics['rate_limited']})\n"
+    text += f"Ошибок: {metrics['failures']}\n\n"
+    text += f"Ожидание в очереди: среднее {metrics['wait_avg_ms']} мс, p95 {metrics['wait_p95_ms']} мс, макс. {metrics['wait_max_ms']} мс"
+    
+    await message.answer(text, parse_mode="HTML")
+
+
+@router.message(Command("db_stats"))
+async def db_stats(message: Message, db_user: User) -> None:
+    """Соединения пула БД по апдейтам (только для админов)"""
+    if not is_admin(db_user):
+        await message.answer("⚠️ Эта команда доступна только администраторам.")
+        return
+    
+    from database import pool_monitor
+    metrics = pool_monitor.get_metrics()
+    capacity = metrics["pool_capacity"] if metrics["pool_capacity"] is not None else "без ограничения"
+    
+    text = "🗄 <b>Соединения с БД:</b>\n\n"
+    text += f"Пул: {metrics['pool_class']}, емкость: {capacity}"
+    if metrics["pool_size"] is not None:
+        text += f" ({metrics['pool_size']} + overflow {metrics['max_overflow']}, таймаут {metrics['pool_timeout']} с)"
+    text += "\n"
+    text += f"Занято сейчас: {metrics['checked_out']} (пик: {metrics['peak_checked_out']}), свободно: {metrics['idle']}, overflow: {metrics['overflow_in_use']}\n"
+    text += (
+        f"Ожидание соединения: среднее {metrics['wait_avg_ms']} мс, p95 {metrics['wait_p95_ms']} мс, "
+        f"макс. {metrics['wait_max_ms']} мс\n"
+    )
+    text += f"Ожиданий > 10 мс: {metrics['checkout_waits']}, отказов по таймауту: {metrics['checkout_timeouts']}\n\n"
+    text += f"Апдейтов: {metrics['updates']} (обращались к БД: {metrics['updates_with_connections']})\n"
+    text += f"Максимум соединений на апдейт: {metrics['max_connections_per_update']}\n"
+    text += f"Апдейтов с несколькими соединениями одновременно: {metrics['multi_connection_updates']}\n"
+    text += f"Долгих удержаний соединения: {metrics['long_holds']}"
+    
+    await message.answer(text, parse_mode="HTML")
+
+
+@router.message(Command("job_stats"))
+async def job_stats(message: Message, db_user: User) -> None:
+    """Запуски фоновых задач за последние сутки (только для админов)"""
+    if not is_admin(db_user):
+        await message.answer("⚠️ Эта команда доступна только администраторам.")
+        return
+    
+    from datetime import datetime, timedelta
+    from database import SchedulerRepository
+    async with async_session_maker() as session:
+        stats = await SchedulerRepository(session).get_job_stats(since=datetime.utcnow() - timedelta(days=1))
+    
+    if not stats:
+        await message.answer("📝 За последние сутки фоновые задачи не запускались.")
+        return
+    
+    status_emoji = {"success": "✅", "failed": "❌", "running": "⏳", "missed": "⚠️"}
+    text = "⏱ <b>Фоновые задачи за сутки:</b>\n\n"
+    for job in stats:
+        avg = f"{job['avg_duration']:.1f}" if job["avg_duration"] is not None else "-"
+        longest = f"{job['max_duration']:.1f}" if job["max_duration"] is not None else "-"
+        text += f"{status_emoji.get(job['last_status'], '•')} <b>{job['job_id']}</b>\n"
+        text += f"  Запусков: {job['runs']}, ошибок: {job['failed']}, пропущено: {job['missed']}\n"
+        text += f"  Длительность: среднее {avg} с, макс. {longest} с\n"
+        text += f"  Последний запуск: {job['last_started_at']:%d.%m %H:%M} UTC\n\n"
+    
+    await message.answer(text, parse_mode="HTML")
+
+
 @router.message(Command("set_manager_role"))
 async def set_manager_role(message: Message, db_user: User) -> None:
     """Выдать роль manager пользователю (только для админов)"""
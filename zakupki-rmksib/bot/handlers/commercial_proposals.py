@@ -8,18 +8,35 @@ from database.models import User, CommercialProposal
 from database import async_session_maker, LotRepository
 from database.repositories.commercial_proposal_repository import CommercialProposalRepository
 from services.documentation import save_documentation_file, extract_text_from_file, is_supported_format
-from services.ai.commercial_proposal_analysis import analyze_supplier_reliability, calculate_integral_rating
+from services.ai.commercial_proposal_analysis import analyze_suppliers_reliability, calculate_integral_rating, supplier_key
 from services.cp_data_extraction import extract_cp_data_combined
+from services.cp_batch import CPBatchItem, process_cp_batch, unpack_zip
+from config.settings import settings
 from utils.formatters import format_rub, format_separator
+from utils.telegram_helpers import send_long_message, split_message_text, stream_to_message
 from bot.keyboards.inline import get_main_menu_button
+from aiogram.exceptions import TelegramBadRequest
 from pathlib import Path
 from datetime import datetime
+from typing import Dict, List, Set
+import asyncio
+import html
+import io
 import logging
 import re
+import time
 
 router = Router()
 logger = logging.getLogger(__name__)
 
+# Документы альбома приходят отдельными сообщениями с общим media_group_id:
+# они собираются и обрабатываются одним пакетом через MEDIA_GROUP_WAIT_SECONDS после первого
+MEDIA_GROUP_WAIT_SECONDS = 1.5
+_media_groups: Dict[str, List[Message]] = {}
+_batch_tasks: Set[asyncio.Task] = set()
+
+UPLOAD_HINT = "Можно отправить сразу несколько файлов (альбомом) или ZIP-архив с КП."
+
 
 @router.message(F.text == "📄 Анализ КП")
 async def show_cp_menu(message: Message, db_user: User, state: FSMContext) -> None:
@@ -35,7 +52,8 @@ async def show_cp_menu(message: Message, db_user: User, state: FSMContext) -> No
         if proposals:
             text = f"📄 <b>Анализ коммерческих предложений</b>\n\n"
             text += f"Загружено КП: {len(proposals)}\n\n"
-            text += "📎 <b>Загрузите файл коммерческого предложения</b> (PDF, DOCX, DOC, TXT, RTF, Excel):"
+            text += "📎 <b>Загрузите файл коммерческого предложения</b> (PDF, DOCX, DOC, TXT, RTF, Excel):\n"
+            text += f"<i>{UPLOAD_HINT}</i>"
             
             keyboard = InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(text="📊 Сформировать отчет сравнения", callback_data="cp:compare")],
@@ -49,7 +67,8 @@ async def show_cp_menu(message: Message, db_user: User, state: FSMContext) -> No
         else:
             # Если КП нет, просто запрашиваем загрузку
             text = "📄 <b>Анализ коммерческих предложений</b>\n\n"
-            text += "📎 <b>Загрузите файл коммерческого предложения</b> (PDF, DOCX, DOC, TXT, RTF, Excel):"
+            text += "📎 <b>Загрузите файл коммерческого предложения</b> (PDF, DOCX, DOC, TXT, RTF, Excel):\n"
+            text += f"<i>{UPLOAD_HINT}</i>"
             
             await state.set_state(CommercialProposalStates.uploading_proposal)
             await message.answer(text, parse_mode="HTML")
@@ -84,7 +103,8 @@ async def start_upload_next_cp(query, db_user: User, state: FSMContext):
     
     await query.message.edit_text(
         "📎 <b>Загрузите файл коммерческого предложения</b>\n\n"
-        "Поддерживаемые форматы: PDF, DOCX, DOC, TXT, RTF, Excel (XLSX, XLS)",
+        "Поддерживаемые форматы: PDF, DOCX, DOC, TXT, RTF, Excel (XLSX, XLS)\n"
+        f"<i>{UPLOAD_HINT}</i>",
         parse_mode="HTML"
     )
 
@@ -253,6 +273,168 @@ async def handle_text_in_upload_state(message: Message, state: FSMContext, db_us
     )
 
 
+def _telegram_loader(message: Message):
+    """Скачивание документа сообщения (выполняется, когда до файла дойдет очередь в пакете)"""
+    async def load() -> bytes:
+        buffer = io.BytesIO()
+        await message.bot.download(message.document, destination=buffer)
+        return buffer.getvalue()
+    return load
+
+
+def _format_batch_results(items: List[CPBatchItem], skipped: List[str], total_proposals: int) -> str:
+    """Сводная таблица результатов пакета"""
+    saved_count = sum(1 for item in items if item.proposal_id)
+    separator = format_separator(30)
+    text = f"{separator}\n"
+    text += "✅ <b>Пакет коммерческих предложений обработан</b>\n"
+    text += f"{separator}\n\n"
+    text += f"Сохранено: <code>{saved_count}</code> из <code>{len(items)}</code>\n\n"
+    
+    for idx, item in enumerate(items, 1):
+        filename = html.escape(item.filename)
+        if item.error:
+            text += f"<b>{idx}.</b> ❌ {filename}\n"
+            text += f"   Ошибка: {html.escape(item.error[:200])}\n\n"
+            continue
+        supplier_name = item.data.get("supplier_name")
+        total_amount = item.data.get("total_amount")
+        items_count = item.data.get("items_count")
+        text += f"<b>{idx}.</b> 📎 {filename}\n"
+        text += f"   🏢 {html.escape(supplier_name) if supplier_name else 'Поставщик не определен ⚠️'}\n"
+        text += f"   💰 {format_rub(total_amount) if total_amount else 'Сумма не найдена ⚠️'}"
+        if items_count:
+            text += f" | 📦 {items_count} наименований"
+        text += "\n\n"
+    
+    if skipped:
+        shown = ", ".join(skipped[:20]) + (f" и еще {len(skipped) - 20}" if len(skipped) > 20 else "")
+        text += f"⏭️ <b>Пропущено файлов:</b> {len(skipped)} (неподдерживаемый формат или больше {settings.CP_BATCH_MAX_FILES} файлов): {html.escape(shown)}\n\n"
+    
+    text += f"{separator}\n"
+    text += "🚚 Транспортные расходы в пакетном режиме не запрашиваются.\n"
+    text += f"Всего загружено КП: <code>{total_proposals}</code>\n\n"
+    text += "Выберите действие:"
+    return text
+
+
+async def _run_cp_batch(message: Message, state: FSMContext, db_user: User, items: List[CPBatchItem], skipped: List[str]) -> None:
+    """Обработать пакет КП с одним сообщением о ходе обработки и показать сводную таблицу"""
+    total = len(items)
+    progress = await message.answer(f"⏳ <b>Обрабатываю коммерческие предложения: 0 из {total}</b>", parse_mode="HTML")
+    last_edit = 0.0
+    
+    async def on_progress(done: int, total: int) -> None:
+        nonlocal last_edit
+        now = time.monotonic()
+        # Правки не чаще лимита Telegram
+        if now - last_edit < settings.STREAM_EDIT_INTERVAL_SECONDS:
+            return
+        last_edit = now
+        filled = round(10 * done / total)
+        await progress.edit_text(
+            f"⏳ <b>Обрабатываю коммерческие предложения: {done} из {total}</b>\n\n"
+            f"{'▓' * filled}{'░' * (10 - filled)}",
+            parse_mode="HTML"
+        )
+    
+    await process_cp_batch(items, db_user.id, on_progress=on_progress)
+    
+    async with async_session_maker() as session:
+        proposals = await CommercialProposalRepository(session).get_all(user_id=db_user.id, limit=100)
+    
+    try:
+        await progress.delete()
+    except TelegramBadRequest:
+        pass
+    
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="➕ Загрузить еще КП", callback_data="cp:upload_next")],
+        [InlineKeyboardButton(text="📊 Сформировать отчет сравнения", callback_data="cp:compare")]
+    ])
+    await state.clear()
+    await send_long_message(
+        message.bot,
+        message.chat.id,
+        _format_batch_results(items, skipped, len(proposals)),
+        reply_markup=keyboard
+    )
+
+
+async def _process_album_later(key: str, state: FSMContext, db_user: User) -> None:
+    """Обработать документы альбома, собранные за MEDIA_GROUP_WAIT_SECONDS"""
+    await asyncio.sleep(MEDIA_GROUP_WAIT_SECONDS)
+    messages = sorted(_media_groups.pop(key, []), key=lambda msg: msg.message_id)
+    if not messages:
+        return
+    
+    items: List[CPBatchItem] = []
+    skipped: List[str] = []
+    for msg in messages:
+        filename = msg.document.file_name or f"document_{msg.message_id}"
+        if not is_supported_format(filename) or len(items) >= settings.CP_BATCH_MAX_FILES:
+            skipped.append(filename)
+            continue
+        items.append(CPBatchItem(filename=filename, load=_telegram_loader(msg)))
+    
+    try:
+        if not items:
+            await messages[0].answer(
+                "❌ В альбоме нет файлов поддерживаемых форматов.\n\n"
+                "Поддерживаемые форматы: PDF, DOCX, DOC, TXT, RTF, Excel (XLSX, XLS)"
+            )
+            return
+        await _run_cp_batch(messages[0], state, db_user, items, skipped)
+    except Exception as e:
+        logger.error(f"Error processing proposal album: {e}", exc_info=True)
+        await messages[0].answer(f"❌ Ошибка при обработке файлов: {str(e)}")
+
+
+@router.message(StateFilter(CommercialProposalStates.uploading_proposal), F.document, F.media_group_id)
+async def collect_proposal_album(message: Message, state: FSMContext, db_user: User):
+    """Документ из альбома: собираем документы альбома и обрабатываем их одним пакетом"""
+    key = f"{message.chat.id}:{message.media_group_id}"
+    if key in _media_groups:
+        _media_groups[key].append(message)
+        return
+    
+    _media_groups[key] = [message]
+    # Обработчик не ждет остальные документы альбома: в режиме webhook они обрабатываются
+    # в том же процессе строго после этого сообщения
+    task = asyncio.create_task(_process_album_later(key, state, db_user))
+    _batch_tasks.add(task)
+    task.add_done_callback(_batch_tasks.discard)
+
+
+async def process_proposal_archive(message: Message, state: FSMContext, db_user: User):
+    """ZIP-архив с файлами КП: распаковываем и обрабатываем файлы одним пакетом"""
+    try:
+        buffer = io.BytesIO()
+        await message.bot.download(message.document, destination=buffer)
+        files, skipped = await asyncio.to_thread(unpack_zip, buffer.getvalue())
+    except ValueError as e:
+        await message.answer(f"❌ Не удалось распаковать архив: {str(e)}")
+        return
+    except Exception as e:
+        logger.error(f"Error downloading proposal archive: {e}", exc_info=True)
+        await message.answer(f"❌ Ошибка при обработке архива: {str(e)}")
+        return
+    
+    if not files:
+        await message.answer(
+            "❌ В архиве нет файлов поддерживаемых форматов.\n\n"
+            "Поддерживаемые форматы: PDF, DOCX, DOC, TXT, RTF, Excel (XLSX, XLS)"
+        )
+        return
+    
+    items = [CPBatchItem(filename=filename, content=content) for filename, content in files]
+    try:
+        await _run_cp_batch(message, state, db_user, items, skipped)
+    except Exception as e:
+        logger.error(f"Error processing proposal archive: {e}", exc_info=True)
+        await message.answer(f"❌ Ошибка при обработке архива: {str(e)}")
+
+
 @router.message(StateFilter(CommercialProposalStates.uploading_proposal), F.document)
 async def process_proposal_file(message: Message, state: FSMContext, db_user: User):
     """Обработка загрузки файла КП - после загрузки сразу запрашиваем транспортные расходы"""
@@ -264,10 +446,14 @@ async def process_proposal_file(message: Message, state: FSMContext, db_user: Us
     
     file_ext = Path(document.file_name).suffix.lower() if document.file_name else ''
     
+    if file_ext == '.zip':
+        await process_proposal_archive(message, state, db_user)
+        return
+    
     if not is_supported_format(document.file_name or ''):
         await message.answer(
             f"❌ Неподдерживаемый формат файла: {file_ext}\n\n"
-            "Поддерживаемые форматы: PDF, DOCX, DOC, TXT, RTF, Excel (XLSX, XLS)\n\n"
+            "Поддерживаемые форматы: PDF, DOCX, DOC, TXT, RTF, Excel (XLSX, XLS), а также ZIP-архив с такими файлами\n\n"
             "Попробуйте загрузить файл снова:"
         )
         return
@@ -337,63 +523,67 @@ async def compare_proposals(query, db_user: User):
         )
         return
     
-    # Анализируем КП, которые еще не были проанализированы
-    await query.message.edit_text(
+    # Анализируем надежность поставщиков, которые еще не были проанализированы:
+    # каждый поставщик один раз, все запросы параллельно
+    pending = [proposal for proposal in proposals if proposal.supplier_rating is None]
+    suppliers = {}
+    for proposal in pending:
+        suppliers.setdefault(supplier_key(proposal.supplier_name, proposal.supplier_inn), proposal.supplier_name)
+    
+    status_message = query.message
+    await status_message.edit_text(
         "⏳ <b>Анализирую коммерческие предложения...</b>\n\n"
         "Это может занять некоторое время.",
         parse_mode="HTML"
     )
     
+    reliability = {}
+    
+    async def analysis_progress():
+        async for key, analysis_result in analyze_suppliers_reliability(
+            (proposal.supplier_name, proposal.supplier_inn) for proposal in pending
+        ):
+            reliability[key] = analysis_result
+            yield f"✅ {html.escape(suppliers[key])}: <code>{analysis_result['rating']}</code>/100\n"
+    
+    if suppliers:
+        await stream_to_message(
+            status_message,
+            analysis_progress(),
+            header=f"⏳ <b>Анализирую надежность поставщиков: {len(suppliers)}</b>\n\n",
+            parse_mode="HTML",
+            min_interval=settings.STREAM_EDIT_INTERVAL_SECONDS
+        )
+    
     analyzed_count = 0
+    changed = []
     for proposal in proposals:
         if proposal.supplier_rating is None:
-            # Анализируем надежность поставщика
-            try:
-                analysis_result = await analyze_supplier_reliability(
-                    proposal.supplier_name,
-                    proposal.supplier_inn
-                )
-                
-                # Рассчитываем интегральный рейтинг
-                integral_rating = calculate_integral_rating(
-                    proposal.product_price,
-                    proposal.delivery_cost,
-                    analysis_result["rating"],
-                    proposal.other_conditions
-                )
-                
-                # Обновляем КП
-                proposal.supplier_rating = analysis_result["rating"]
-                proposal.supplier_reliability_info = analysis_result["reliability_info"]
-                proposal.integral_rating = integral_rating
-                proposal.analyzed_at = datetime.utcnow()
-                
-                async with async_session_maker() as session:
-                    cp_repo = CommercialProposalRepository(session)
-                    await cp_repo.update(proposal)
-                
-                analyzed_count += 1
-            except Exception as e:
-                logger.error(f"Error analyzing proposal {proposal.id}: {e}", exc_info=True)
-        else:
-            # Если рейтинг уже есть, но интегральный рейтинг не рассчитан, пересчитываем
-            if proposal.integral_rating is None:
-                integral_rating = calculate_integral_rating(
-                    proposal.product_price,
-                    proposal.delivery_cost,
-                    proposal.supplier_rating,
-                    proposal.other_conditions
-                )
-                proposal.integral_rating = integral_rating
-                
-                async with async_session_maker() as session:
-                    cp_repo = CommercialProposalRepository(session)
-                    await cp_repo.update(proposal)
-    
-    # Получаем обновленные данные
-    async with async_session_maker() as session:
-        cp_repo = CommercialProposalRepository(session)
-        proposals = await cp_repo.get_all(user_id=db_user.id, limit=100)
+            analysis_result = reliability.get(supplier_key(proposal.supplier_name, proposal.supplier_inn))
+            if analysis_result is None:
+                continue
+            proposal.supplier_rating = analysis_result["rating"]
+            proposal.supplier_reliability_info = analysis_result["reliability_info"]
+            proposal.analyzed_at = datetime.utcnow()
+            analyzed_count += 1
+        elif proposal.integral_rating is not None:
+            continue
+        # Интегральный рейтинг для новых оценок и для КП, у которых он еще не рассчитан
+        proposal.integral_rating = calculate_integral_rating(
+            proposal.product_price,
+            proposal.delivery_cost,
+            proposal.supplier_rating,
+            proposal.other_conditions
+        )
+        changed.append(proposal)
+    
+    # Все оценки сохраняем одной транзакцией
+    if changed:
+        try:
+            async with async_session_maker() as session:
+                await CommercialProposalRepository(session).update_many(changed)
+        except Exception as e:
+            logger.error(f"Error saving proposal ratings: {e}", exc_info=True)
     
     # Сортируем по интегральному рейтингу (от большего к меньшему)
     proposals_sorted = sorted(proposals, key=lambda x: x.integral_rating or 0, reverse=True)
@@ -447,7 +637,11 @@ async def compare_proposals(query, db_user: User):
         get_main_menu_button()
     ])
     
-    await query.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
+    # Первая часть отчета заменяет сообщение о ходе анализа, остальные отправляются следом
+    parts = split_message_text(text)
+    await status_message.edit_text(parts[0], parse_mode="HTML", reply_markup=keyboard if len(parts) == 1 else None)
+    if len(parts) > 1:
+        await send_long_message(status_message.bot, status_message.chat.id, "\n".join(parts[1:]), reply_markup=keyboard)
 
 
 @router.callback_query(F.data == "cp:list")
@@ -522,7 +716,8 @@ async def clear_all_proposals(query, db_user: User, state: FSMContext):
         
         # Показываем меню для загрузки новых КП
         await query.message.answer(
-            "📎 <b>Загрузите файл коммерческого предложения</b> (PDF, DOCX, DOC, TXT, RTF, Excel):",
+            "📎 <b>Загрузите файл коммерческого предложения</b> (PDF, DOCX, DOC, TXT, RTF, Excel):\n"
+            f"<i>{UPLOAD_HINT}</i>",
             parse_mode="HTML"
         )
         await state.set_state(CommercialProposalStates.uploading_proposal)
@@ -544,7 +739,8 @@ async def start_new_proposals(query, db_user: User, state: FSMContext):
     
     await query.message.edit_text(
         "📎 <b>Загрузите файл коммерческого предложения</b>\n\n"
-        "Поддерживаемые форматы: PDF, DOCX, DOC, TXT, RTF, Excel (XLSX, XLS)",
+        "Поддерживаемые форматы: PDF, DOCX, DOC, TXT, RTF, Excel (XLSX, XLS)\n"
+        f"<i>{UPLOAD_HINT}</i>",
         parse_mode="HTML"
     )
     await state.set_state(CommercialProposalStates.uploading_proposal)
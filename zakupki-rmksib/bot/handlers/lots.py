@@ -8,7 +8,7 @@ from database.models import User, Lot
 from database import async_session_maker, LotRepository, UserRepository, UserPreferenceRepository
 from utils.formatters import format_rub, format_date, format_separator, format_number
 from datetime import datetime
-from services.ai import analyze_lot, analyze_documentation
+from services.ai import analyze_lot, analyze_lot_stream, analyze_documentation_stream
 from services.documentation import save_documentation_file, extract_text_from_file, is_supported_format, download_documentation_from_url
 from services.notifications import send_email
 from config import settings
@@ -60,54 +60,40 @@ def _lot_detail_keyboard(lot_number: str, has_documentation: bool = False, has_u
 	return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-async def _lot_matches_preferences(
-	lot: Lot,
-	customers: list | None,
-	nomenclature: list | None,
-	budget_min: int | None = None,
-	budget_max: int | None = None
-) -> bool:
-	"""Проверяет соответствие лота настройкам пользователя"""
-	cust_ok = True
-	nom_ok = True
-	budget_ok = True
-	
-	# Проверка заказчика
-	if customers and len(customers) > 0:  # Проверяем, что список не пустой
-		if lot.customer:
-			# Проверяем точное совпадение или частичное (на случай различий в написании)
-			cust_ok = lot.customer in customers
-			# Также проверяем частичное совпадение (если название заказчика содержит выбранное)
-			if not cust_ok:
-				cust_ok = any(cust in lot.customer for cust in customers) or any(lot.customer in cust for cust in customers)
-		else:
-			cust_ok = False  # Если у лота нет заказчика, а фильтр установлен - не проходит
-		logger.debug(f"Lot {lot.lot_number}: customer check - lot.customer={lot.customer}, customers={customers}, cust_ok={cust_ok}")
-	
-	# Проверка номенклатуры
-	if nomenclature and len(nomenclature) > 0:  # Проверяем, что список не пустой
-		from config.nomenclature import check_nomenclature_match_enhanced
-		nom_ok = await check_nomenclature_match_enhanced(
-			lot_title=lot.title,
-			lot_nomenclature=lot.nomenclature,
-			lot_description=lot.description,
-			nomenclature_list=nomenclature,
-			use_llm=True  # Используем LLM для семантического сопоставления
-		)
-		logger.debug(f"Lot {lot.lot_number}: nomenclature check - title={lot.title[:50]}, nom_ok={nom_ok}")
-	
-	# Проверка бюджета
-	if budget_min is not None or budget_max is not None:
-		budget = float(lot.budget) if lot.budget else 0.0
-		if budget_min is not None and budget < budget_min:
-			budget_ok = False
-		if budget_max is not None and budget > budget_max:
-			budget_ok = False
-		logger.debug(f"Lot {lot.lot_number}: budget check - budget={budget}, min={budget_min}, max={budget_max}, budget_ok={budget_ok}")
+async def _search_preferred_lots(
+	lot_repo: LotRepository,
+	pref,
+	page: int = 1,
+	page_size: int = 10
+) -> tuple[list[Lot], int]:
+	"""
+	Страница лотов, соответствующих настройкам пользователя, и их общее количество
 	
-	result = cust_ok and nom_ok and budget_ok
-	logger.debug(f"Lot {lot.lot_number}: final match={result} (cust={cust_ok}, nom={nom_ok}, budget={budget_ok})")
-	return result
+	Фильтрация и пагинация выполняются в БД. Номенклатура проверяется по разметке,
+	сделанной при загрузке лота; лоты без разметки проверяются по ключевым словам
+	в названии до фоновой доразметки.
+	"""
+	from config.nomenclature import ALL_LOTS_KEY, get_nomenclature_keywords
+	
+	nomenclature_tags = None
+	fallback_keywords = None
+	if pref.nomenclature and ALL_LOTS_KEY not in pref.nomenclature:
+		nomenclature_tags = list(pref.nomenclature)
+		fallback_keywords = [
+			keyword
+			for group in nomenclature_tags
+			for keyword in get_nomenclature_keywords(group)
+		]
+	
+	return await lot_repo.search(
+		customers=pref.customers or None,
+		nomenclature_tags=nomenclature_tags,
+		budget_min=pref.budget_min,
+		budget_max=pref.budget_max,
+		page=page,
+		page_size=page_size,
+		fallback_keywords=fallback_keywords
+	)
 
 
 @router.message(F.text == "📋 Мои лоты")
@@ -120,27 +106,18 @@ async def show_my_lots(message: Message, db_user: User) -> None:
 		# Получаем настройки пользователя
 		pref = await pref_repo.get_or_create(db_user.id)
 		
-		# Получаем все лоты (сортируем по дате создания, новые первыми)
-		all_lots = await lot_repo.get_all(limit=100, inverted=True)
-		
-		# Фильтруем по настройкам пользователя
-		filtered_lots = []
+		# Фильтруем по настройкам пользователя и берем первую страницу (новые первыми)
+		page_size = 10
+		current_page = 1
 		logger.info(f"Filtering lots for user {db_user.id}: customers={pref.customers}, nomenclature={pref.nomenclature}, budget_min={pref.budget_min}, budget_max={pref.budget_max}")
-		for lot in all_lots:
-			if await _lot_matches_preferences(
-				lot,
-				pref.customers,
-				pref.nomenclature,
-				pref.budget_min,
-				pref.budget_max
-			):
-				filtered_lots.append(lot)
-		
-		logger.info(f"Filtered {len(filtered_lots)} lots from {len(all_lots)} total lots")
-	
-	if not filtered_lots:
+		page_lots, total_lots = await _search_preferred_lots(lot_repo, pref, current_page, page_size)
+		all_lots_count = await lot_repo.count_active()
+		
+		logger.info(f"Filtered {total_lots} lots from {all_lots_count} total lots")
+	
+	if not page_lots:
 		# Проверяем, есть ли вообще лоты в системе
-		if not all_lots:
+		if not all_lots_count:
 			# Нет лотов вообще - предлагаем запросить закупки
 			keyboard = InlineKeyboardMarkup(inline_keyboard=[
 				[InlineKeyboardButton(text="🔄 Запросить закупки", callback_data="pref:fetch_lots")],
@@ -181,7 +158,7 @@ async def show_my_lots(message: Message, db_user: User) -> None:
 			
 			await message.answer(
 				f"📭 <b>Нет лотов, соответствующих вашим настройкам</b>\n\n"
-				f"Всего лотов в системе: {len(all_lots)}\n\n"
+				f"Всего лотов в системе: {all_lots_count}\n\n"
 				f"<b>Ваши фильтры:</b>\n{filters_text}\n\n"
 				f"Вы можете просмотреть все лоты или изменить настройки:",
 				parse_mode="HTML",
@@ -191,20 +168,15 @@ async def show_my_lots(message: Message, db_user: User) -> None:
 	
 	# Используем пагинацию
 	from bot.keyboards.inline import get_lots_pagination_keyboard
-	page_size = 10
-	current_page = 1
 	
 	# Формируем текст для первой страницы
-	total_lots = len(filtered_lots)
 	start_idx = 0
-	end_idx = min(page_size, total_lots)
-	page_lots = filtered_lots[start_idx:end_idx]
 	
 	separator = format_separator(30)
 	text = f"{separator}\n"
 	text += f"📋 <b>Ваши лоты</b>\n"
 	text += f"{separator}\n\n"
-	text += f"Всего: <code>{total_lots}</code> из <code>{len(all_lots)}</code>\n"
+	text += f"Всего: <code>{total_lots}</code> из <code>{all_lots_count}</code>\n"
 	if total_lots > page_size:
 		text += f"Страница: <code>{current_page}</code> из <code>{(total_lots + page_size - 1) // page_size}</code>\n"
 	text += "\n"
@@ -224,10 +196,11 @@ async def show_my_lots(message: Message, db_user: User) -> None:
 		text += f"   🆔 <code>{lot.lot_number}</code>\n\n"
 	
 	keyboard = get_lots_pagination_keyboard(
-		filtered_lots, 
+		page_lots, 
 		current_page=current_page, 
 		page_size=page_size,
-		back_source="filtered"  # Указываем, что это раздел "Мои лоты"
+		back_source="filtered",  # Указываем, что это раздел "Мои лоты"
+		total_count=total_lots
 	)
 	
 	await message.answer(text, parse_mode="HTML", reply_markup=keyboard)
@@ -343,21 +316,22 @@ async def mail_analysis_cb(query, db_user: User):
 
 async def _mail_analysis(lot_number: str, origin_message: Message) -> None:
 	async with async_session_maker() as session:
-		lot_repo = LotRepository(session)
+		lot = await LotRepository(session).get_by_lot_number(lot_number)
+	if not lot:
+		await origin_message.answer("❌ Лот не найден.")
+		return
+	
+	# Для email-рассылки используем настройки по умолчанию (глобальные)
+	# или можно использовать настройки первого активного пользователя
+	# Здесь используем глобальные настройки для простоты
+	budget_min = None
+	budget_max = None
+	
+	# Анализ - без открытой сессии, чтобы не держать соединение с БД во время запроса к LLM
+	analysis = await analyze_lot(lot, budget_min=budget_min, budget_max=budget_max)
+	async with async_session_maker() as session:
 		u_repo = UserRepository(session)
 		p_repo = UserPreferenceRepository(session)
-		lot = await lot_repo.get_by_lot_number(lot_number)
-		if not lot:
-			await origin_message.answer("❌ Лот не найден.")
-			return
-		
-		# Для email-рассылки используем настройки по умолчанию (глобальные)
-		# или можно использовать настройки первого активного пользователя
-		# Здесь используем глобальные настройки для простоты
-		budget_min = None
-		budget_max = None
-		
-		analysis = await analyze_lot(lot, budget_min=budget_min, budget_max=budget_max)
 		# Build recipients based on preferences
 		active_users = await u_repo.get_all_active(limit=10000)
 		recipients: list[str] = []
@@ -371,23 +345,24 @@ async def _mail_analysis(lot_number: str, origin_message: Message) -> None:
 			nom_ok = True if not pref.nomenclature else bool(set(pref.nomenclature).intersection(set(lot.nomenclature or [])))
 			if pref.notify_enabled and cust_ok and nom_ok:
 				recipients.append(user.contact_email)
-		# Fallback to global
-		if not recipients and settings.NOTIFY_EMAILS:
-			recipients = settings.NOTIFY_EMAILS
-		if not recipients:
-			await origin_message.answer("Получатели не настроены.")
-			return
-		subject = f"Быстрый анализ лота {lot.lot_number}: {lot.title[:60]}"
-		body = (
-			f"<h3>Быстрый анализ лота {lot.lot_number}</h3>"
-			f"<p><b>Заказчик:</b> {lot.customer or '-'}<br>"
-			f"<b>Номенклатура:</b> {', '.join(lot.nomenclature or []) or '-'}<br>"
-			f"<b>Бюджет:</b> {format_rub(float(lot.budget))}<br>"
-			f"<b>Дедлайн:</b> {format_date(lot.deadline)}</p>"
-			f"<p><b>Анализ:</b><br>{analysis.replace('\n', '<br>')}</p>"
-		)
-		sent = await send_email(subject, body, recipients)
-		await origin_message.answer("📧 Анализ отправлен" if sent else "⚠️ Не удалось отправить email")
+	# Получатели собраны - дальше отправка письма, сессия уже закрыта
+	# Fallback to global
+	if not recipients and settings.NOTIFY_EMAILS:
+		recipients = settings.NOTIFY_EMAILS
+	if not recipients:
+		await origin_message.answer("Получатели не настроены.")
+		return
+	subject = f"Быстрый анализ лота {lot.lot_number}: {lot.title[:60]}"
+	body = (
+		f"<h3>Быстрый анализ лота {lot.lot_number}</h3>"
+		f"<p><b>Заказчик:</b> {lot.customer or '-'}<br>"
+		f"<b>Номенклатура:</b> {', '.join(lot.nomenclature or []) or '-'}<br>"
+		f"<b>Бюджет:</b> {format_rub(float(lot.budget))}<br>"
+		f"<b>Дедлайн:</b> {format_date(lot.deadline)}</p>"
+		f"<p><b>Анализ:</b><br>{analysis.replace('\n', '<br>')}</p>"
+	)
+	sent = await send_email(subject, body, recipients)
+	await origin_message.answer("📧 Анализ отправлен" if sent else "⚠️ Не удалось отправить email")
 
 
 @router.callback_query(F.data.startswith("download_doc:"))
@@ -678,6 +653,15 @@ async def handle_documentation_upload(message: Message, db_user: User, state: FS
 		await message.answer(user_message, parse_mode="HTML", reply_markup=keyboard)
 
 
+
+async def _edit_or_answer(query, text: str) -> Message:
+	"""Показывает статус в сообщении callback'а (или новым сообщением) и возвращает сообщение для дальнейших правок"""
+	try:
+		await query.message.edit_text(text)
+		return query.message
+	except Exception:
+		return await query.message.answer(text)
+
 @router.callback_query(F.data.startswith("analyze_doc:"))
 async def analyze_documentation_cb(query, db_user: User):
 	"""
@@ -690,13 +674,15 @@ async def analyze_documentation_cb(query, db_user: User):
 	await analyze_lot_cb(query, db_user)
 
 
-@router.callback_query(F.data.startswith("analyze_lot:"))
+@router.callback_query(F.data.startswith("analyze_lot:") | F.data.startswith("reanalyze_lot:"))
 async def analyze_lot_cb(query, db_user: User):
 	"""
 	Универсальный обработчик анализа лота.
 	Автоматически выбирает режим:
 	- Если есть документация → ДЕТАЛЬНЫЙ анализ (analyze_documentation)
 	- Если нет документации → БЫСТРЫЙ анализ (analyze_lot)
+	
+	Повторный анализ с теми же данными берется из кэша; "reanalyze_lot:" запрашивает модель заново.
 	"""
 	# Сразу отвечаем на callback query, чтобы избежать ошибки "query is too old"
 	try:
@@ -705,7 +691,8 @@ async def analyze_lot_cb(query, db_user: User):
 		# Если query уже устарел, игнорируем ошибку
 		pass
 	
-	lot_number = query.data.split(":", 1)[1]
+	action, lot_number = query.data.split(":", 1)
+	refresh = action == "reanalyze_lot"
 	
 	# Пробуем отредактировать сообщение, если не получится - отправляем новое
 	try:
@@ -768,18 +755,29 @@ async def analyze_lot_cb(query, db_user: User):
 	try:
 		# Если есть текст документации - анализируем по документации
 		if has_documentation_text and lot.documentation_text:
-			try:
-				await query.message.edit_text("📄 Выполняю детальный анализ документации...")
-			except Exception:
-				await query.message.answer("📄 Выполняю детальный анализ документации...")
+			status_message = await _edit_or_answer(query, "📄 Выполняю детальный анализ документации...")
 			
-			analysis = await analyze_documentation(lot, lot.documentation_text, budget_min=budget_min, budget_max=budget_max)
+			from utils.telegram_helpers import stream_to_message
+			keyboard = InlineKeyboardMarkup(inline_keyboard=[
+				[InlineKeyboardButton(text="✅ В работу", callback_data=f"lots:set_in_work:{lot_number}")],
+				[InlineKeyboardButton(text="❌ Отказ", callback_data=f"lots:reject:{lot_number}")],
+				[InlineKeyboardButton(text="🔍 Поиск Поставщика", callback_data=f"lots:search_supplier:{lot_number}")],
+				[InlineKeyboardButton(text="🔄 Переанализировать", callback_data=f"reanalyze_lot:{lot_number}")],
+				[InlineKeyboardButton(text="🔙 Назад к лотам", callback_data="lots:back")]
+			])
+			
+			# Выводим анализ документации по мере генерации
+			analysis = await stream_to_message(
+				status_message,
+				analyze_documentation_stream(lot, lot.documentation_text, budget_min=budget_min, budget_max=budget_max, refresh=refresh),
+				header=f"📄 <b>Детальный анализ лота {lot_number}</b>\n\n",
+				parse_mode="HTML",
+				reply_markup=keyboard,
+				min_interval=settings.STREAM_EDIT_INTERVAL_SECONDS
+			)
 			
 			if not analysis:
-				try:
-					await query.message.edit_text("❌ Не удалось получить анализ от модели.")
-				except Exception:
-					await query.message.answer("❌ Не удалось получить анализ от модели.")
+				await status_message.edit_text("❌ Не удалось получить анализ от модели.")
 				return
 			
 			# Помечаем как проанализированную
@@ -789,52 +787,29 @@ async def analyze_lot_cb(query, db_user: User):
 				if lot:
 					lot.documentation_analyzed = True
 					await lot_repo.update(lot)
-			
-			# Отправляем анализ документации
-			from utils.telegram_helpers import send_long_message
-			keyboard = InlineKeyboardMarkup(inline_keyboard=[
-				[InlineKeyboardButton(text="✅ В работу", callback_data=f"lots:set_in_work:{lot_number}")],
-				[InlineKeyboardButton(text="❌ Отказ", callback_data=f"lots:reject:{lot_number}")],
-				[InlineKeyboardButton(text="🔍 Поиск Поставщика", callback_data=f"lots:search_supplier:{lot_number}")],
-				[InlineKeyboardButton(text="🔙 Назад к лотам", callback_data="lots:back")]
-			])
-			
-			await send_long_message(
-				query.message.bot,
-				query.message.chat.id,
-				f"📄 <b>Детальный анализ лота {lot_number}</b>\n\n{analysis}",
-				parse_mode="HTML",
-				reply_markup=keyboard
-			)
 		else:
 			# Если нет документации - выполняем быстрый анализ по данным лота
-			try:
-				await query.message.edit_text("🧠 Выполняю быстрый анализ лота...")
-			except Exception:
-				await query.message.answer("🧠 Выполняю быстрый анализ лота...")
+			status_message = await _edit_or_answer(query, "🧠 Выполняю быстрый анализ лота...")
 			
-			result = await analyze_lot(lot, budget_min=budget_min, budget_max=budget_max)
-			if not result:
-				try:
-					await query.message.edit_text("❌ Не удалось получить анализ от модели.")
-				except Exception:
-					await query.message.answer("❌ Не удалось получить анализ от модели.")
-				return
-			
-			from utils.telegram_helpers import send_long_message
+			from utils.telegram_helpers import stream_to_message
 			# После анализа показываем кнопки для установки статуса
 			keyboard = InlineKeyboardMarkup(inline_keyboard=[
 				[InlineKeyboardButton(text="✅ В работу", callback_data=f"lots:set_in_work:{lot_number}")],
 				[InlineKeyboardButton(text="❌ Отказ", callback_data=f"lots:reject:{lot_number}")],
+				[InlineKeyboardButton(text="🔄 Переанализировать", callback_data=f"reanalyze_lot:{lot_number}")],
 				[InlineKeyboardButton(text="🔙 Назад к лотам", callback_data="lots:back")]
 			])
-			await send_long_message(
-				query.message.bot,
-				query.message.chat.id,
-				f"🧠 <b>Быстрый анализ лота {lot_number}</b>\n\n{result}",
+			result = await stream_to_message(
+				status_message,
+				analyze_lot_stream(lot, budget_min=budget_min, budget_max=budget_max, refresh=refresh),
+				header=f"🧠 <b>Быстрый анализ лота {lot_number}</b>\n\n",
 				parse_mode="HTML",
-				reply_markup=keyboard
+				reply_markup=keyboard,
+				min_interval=settings.STREAM_EDIT_INTERVAL_SECONDS
 			)
+			if not result:
+				await status_message.edit_text("❌ Не удалось получить анализ от модели.")
+				return
 		
 		# query.answer уже был вызван в начале функции
 		
@@ -868,9 +843,11 @@ async def show_all_lots_cb(query, db_user: User):
 	"""Показать все лоты без фильтрации"""
 	async with async_session_maker() as session:
 		lot_repo = LotRepository(session)
-		all_lots = await lot_repo.get_all(limit=100, inverted=True)
+		page_size = 10
+		current_page = 1
+		page_lots, total_lots = await lot_repo.search(page=current_page, page_size=page_size)
 	
-	if not all_lots:
+	if not page_lots:
 		await query.answer("📭 Лотов в системе нет", show_alert=True)
 		return
 	
@@ -878,13 +855,8 @@ async def show_all_lots_cb(query, db_user: User):
 	
 	# Используем пагинацию
 	from bot.keyboards.inline import get_lots_pagination_keyboard
-	page_size = 10
-	current_page = 1
 	
-	total_lots = len(all_lots)
 	start_idx = 0
-	end_idx = min(page_size, total_lots)
-	page_lots = all_lots[start_idx:end_idx]
 	
 	separator = format_separator(30)
 	text = f"{separator}\n"
@@ -913,12 +885,13 @@ async def show_all_lots_cb(query, db_user: User):
 		text += "\n"
 	
 	keyboard = get_lots_pagination_keyboard(
-		all_lots, 
+		page_lots, 
 		current_page=current_page, 
 		page_size=page_size,
 		page_callback_prefix="lots:all_page:",  # Используем отдельный префикс для пагинации всех лотов
 		show_add_doc_button=False,  # Не показываем кнопку "Добавить документацию" в разделе "Показать все лоты"
-		back_source="all"  # Указываем, что это раздел "Показать все лоты"
+		back_source="all",  # Указываем, что это раздел "Показать все лоты"
+		total_count=total_lots
 	)
 	# Добавляем кнопку "Назад"
 	keyboard.inline_keyboard.append([InlineKeyboardButton(text="🔙 Назад к фильтрованным лотам", callback_data="lots:back:filtered")])
@@ -942,17 +915,14 @@ async def handle_all_lots_pagination(query, db_user: User):
 	
 	async with async_session_maker() as session:
 		lot_repo = LotRepository(session)
-		# Получаем все лоты без фильтрации
-		all_lots = await lot_repo.get_all(limit=100, inverted=True)
+		# Получаем страницу лотов без фильтрации
+		page_size = 10
+		page_lots, total_lots = await lot_repo.search(page=page_num, page_size=page_size)
 	
 	# Используем пагинацию
 	from bot.keyboards.inline import get_lots_pagination_keyboard
-	page_size = 10
 	
-	total_lots = len(all_lots)
 	start_idx = (page_num - 1) * page_size
-	end_idx = start_idx + page_size
-	page_lots = all_lots[start_idx:end_idx]
 	
 	separator = format_separator(30)
 	text = f"{separator}\n"
@@ -981,12 +951,13 @@ async def handle_all_lots_pagination(query, db_user: User):
 		text += "\n"
 	
 	keyboard = get_lots_pagination_keyboard(
-		all_lots, 
+		page_lots, 
 		current_page=page_num, 
 		page_size=page_size,
 		page_callback_prefix="lots:all_page:",  # Используем отдельный префикс для пагинации всех лотов
 		show_add_doc_button=False,  # Не показываем кнопку "Добавить документацию" в разделе "Показать все лоты"
-		back_source="all"  # Указываем, что это раздел "Показать все лоты"
+		back_source="all",  # Указываем, что это раздел "Показать все лоты"
+		total_count=total_lots
 	)
 	# Добавляем кнопку "Назад"
 	keyboard.inline_keyboard.append([InlineKeyboardButton(text="🔙 Назад к фильтрованным лотам", callback_data="lots:back:filtered")])
@@ -1010,35 +981,21 @@ async def handle_lots_pagination(query, db_user: User):
 		# Получаем настройки пользователя
 		pref = await pref_repo.get_or_create(db_user.id)
 		
-		# Получаем все лоты
-		all_lots = await lot_repo.get_all(limit=100, inverted=True)
-		
-		# Фильтруем по настройкам пользователя
-		filtered_lots = []
-		for lot in all_lots:
-			if await _lot_matches_preferences(
-				lot,
-				pref.customers,
-				pref.nomenclature,
-				pref.budget_min,
-				pref.budget_max
-			):
-				filtered_lots.append(lot)
+		# Получаем запрошенную страницу лотов, отфильтрованных по настройкам пользователя
+		page_size = 10
+		page_lots, total_lots = await _search_preferred_lots(lot_repo, pref, page_num, page_size)
+		all_lots_count = await lot_repo.count_active()
 	
 	# Используем пагинацию
 	from bot.keyboards.inline import get_lots_pagination_keyboard
-	page_size = 10
 	
-	total_lots = len(filtered_lots)
 	start_idx = (page_num - 1) * page_size
-	end_idx = start_idx + page_size
-	page_lots = filtered_lots[start_idx:end_idx]
 	
 	separator = format_separator(30)
 	text = f"{separator}\n"
 	text += f"📋 <b>Ваши лоты</b>\n"
 	text += f"{separator}\n\n"
-	text += f"Всего: <code>{total_lots}</code> из <code>{len(all_lots)}</code>\n"
+	text += f"Всего: <code>{total_lots}</code> из <code>{all_lots_count}</code>\n"
 	if total_lots > page_size:
 		text += f"Страница: <code>{page_num}</code> из <code>{(total_lots + page_size - 1) // page_size}</code>\n"
 	text += "\n"
@@ -1058,10 +1015,11 @@ async def handle_lots_pagination(query, db_user: User):
 		text += f"   🆔 <code>{lot.lot_number}</code>\n\n"
 	
 	keyboard = get_lots_pagination_keyboard(
-		filtered_lots, 
+		page_lots, 
 		current_page=page_num, 
 		page_size=page_size,
-		back_source="filtered"  # Указываем, что это раздел "Мои лоты"
+		back_source="filtered",  # Указываем, что это раздел "Мои лоты"
+		total_count=total_lots
 	)
 	
 	await query.answer()
@@ -1188,22 +1146,14 @@ async def back_to_lots_list(query, db_user: User):
 				pref_repo = UserPreferenceRepository(session)
 				
 				pref = await pref_repo.get_or_create(db_user.id)
-				all_lots = await lot_repo.get_all(limit=100, inverted=True)
-				
-				filtered_lots = []
-				for lot in all_lots:
-					if await _lot_matches_preferences(
-						lot,
-						pref.customers,
-						pref.nomenclature,
-						pref.budget_min,
-						pref.budget_max
-					):
-						filtered_lots.append(lot)
+				page_size = 10
+				current_page = 1
+				page_lots, total_lots = await _search_preferred_lots(lot_repo, pref, current_page, page_size)
+				all_lots_count = await lot_repo.count_active()
 			
-			if not filtered_lots:
+			if not page_lots:
 				# Если нет фильтрованных лотов, показываем сообщение
-				if not all_lots:
+				if not all_lots_count:
 					keyboard = InlineKeyboardMarkup(inline_keyboard=[
 						[InlineKeyboardButton(text="🔄 Запросить закупки", callback_data="pref:fetch_lots")],
 						[InlineKeyboardButton(text="⚙️ Настройки", callback_data="pref:menu")]
@@ -1241,7 +1191,7 @@ async def back_to_lots_list(query, db_user: User):
 					
 					await query.message.edit_text(
 						f"📭 <b>Нет лотов, соответствующих вашим настройкам</b>\n\n"
-						f"Всего лотов в системе: {len(all_lots)}\n\n"
+						f"Всего лотов в системе: {all_lots_count}\n\n"
 						f"<b>Ваши фильтры:</b>\n{filters_text}\n\n"
 						f"Вы можете просмотреть все лоты или изменить настройки:",
 						parse_mode="HTML",
@@ -1251,19 +1201,14 @@ async def back_to_lots_list(query, db_user: User):
 			
 			# Формируем текст для первой страницы
 			from bot.keyboards.inline import get_lots_pagination_keyboard
-			page_size = 10
-			current_page = 1
 			
-			total_lots = len(filtered_lots)
 			start_idx = 0
-			end_idx = min(page_size, total_lots)
-			page_lots = filtered_lots[start_idx:end_idx]
 			
 			separator = format_separator(30)
 			text = f"{separator}\n"
 			text += f"📋 <b>Ваши лоты</b>\n"
 			text += f"{separator}\n\n"
-			text += f"Всего: <code>{total_lots}</code> из <code>{len(all_lots)}</code>\n"
+			text += f"Всего: <code>{total_lots}</code> из <code>{all_lots_count}</code>\n"
 			if total_lots > page_size:
 				text += f"Страница: <code>{current_page}</code> из <code>{(total_lots + page_size - 1) // page_size}</code>\n"
 			text += "\n"
@@ -1282,10 +1227,11 @@ async def back_to_lots_list(query, db_user: User):
 				text += f"   🆔 <code>{lot.lot_number}</code>\n\n"
 			
 			keyboard = get_lots_pagination_keyboard(
-				filtered_lots, 
+				page_lots, 
 				current_page=current_page, 
 				page_size=page_size,
-				back_source="filtered"
+				back_source="filtered",
+				total_count=total_lots
 			)
 			
 			await query.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
@@ -1647,6 +1593,13 @@ async def confirm_lot_creation(message: Message, db_user: User, state: FSMContex
 				source="email"  # или "manual"
 			)
 		
+		# Размечаем лот номенклатурными группами, как и лоты от парсера (после закрытия сессии - запрос к LLM)
+		try:
+			from services.parsers.job import classify_lots
+			await classify_lots([lot])
+		except Exception as e:
+			logger.warning(f"Could not classify manual lot {lot_number} by nomenclature: {e}")
+		
 		await state.clear()
 		await message.answer(
 			f"✅ <b>Лот создан успешно!</b>\n\n"
@@ -1837,10 +1790,7 @@ async def analyze_manual_documentation(query, db_user: User, state: FSMContext):
 		return
 	
 	# Пробуем отредактировать сообщение, если не получится - отправляем новое
-	try:
-		await query.message.edit_text("🧠 Анализирую документацию, подождите...")
-	except Exception:
-		await query.message.answer("🧠 Анализирую документацию, подождите...")
+	status_message = await _edit_or_answer(query, "🧠 Анализирую документацию, подождите...")
 	
 	try:
 		# Создаем временный объект Lot для анализа
@@ -1868,16 +1818,31 @@ async def analyze_manual_documentation(query, db_user: User, state: FSMContext):
 			budget_min = pref.budget_min
 			budget_max = pref.budget_max
 		
-		# Анализируем документацию
-		analysis = await analyze_documentation(temp_lot, documentation_text, budget_min=budget_min, budget_max=budget_max)
+		from utils.telegram_helpers import stream_to_message
+		keyboard = InlineKeyboardMarkup(inline_keyboard=[
+			[InlineKeyboardButton(text="🔍 Поиск Поставщика", callback_data="lots:search_supplier_from_doc")],
+			[InlineKeyboardButton(text="❌ Отклонить лот", callback_data="lots:reject_from_doc")],
+			[InlineKeyboardButton(text="🔙 Назад к лотам", callback_data="lots:back")]
+		])
+		
+		# Анализируем документацию, выводя ответ по мере генерации
+		analysis = await stream_to_message(
+			status_message,
+			analyze_documentation_stream(temp_lot, documentation_text, budget_min=budget_min, budget_max=budget_max),
+			header=(
+				f"📄 <b>Детальный анализ лота</b>\n\n"
+				f"📎 Файл: {filename}\n\n"
+			),
+			parse_mode="HTML",
+			reply_markup=keyboard,
+			min_interval=settings.STREAM_EDIT_INTERVAL_SECONDS
+		)
 		
 		if not analysis:
-			await query.message.edit_text("❌ Не удалось получить анализ от модели.")
+			await status_message.edit_text("❌ Не удалось получить анализ от модели.")
 			await query.answer("❌ Ошибка анализа", show_alert=True)
 			return
 		
-		# Отправляем анализ
-		from utils.telegram_helpers import send_long_message
 		# Сохраняем данные для последующего использования (поиск поставщиков)
 		await state.update_data(
 			documentation_text=documentation_text,
@@ -1885,22 +1850,6 @@ async def analyze_manual_documentation(query, db_user: User, state: FSMContext):
 			analysis=analysis
 		)
 		
-		keyboard = InlineKeyboardMarkup(inline_keyboard=[
-			[InlineKeyboardButton(text="🔍 Поиск Поставщика", callback_data="lots:search_supplier_from_doc")],
-			[InlineKeyboardButton(text="❌ Отклонить лот", callback_data="lots:reject_from_doc")],
-			[InlineKeyboardButton(text="🔙 Назад к лотам", callback_data="lots:back")]
-		])
-		
-		await send_long_message(
-			query.message.bot,
-			query.message.chat.id,
-			f"📄 <b>Детальный анализ лота</b>\n\n"
-			f"📎 Файл: {filename}\n\n"
-			f"{analysis}",
-			parse_mode="HTML",
-			reply_markup=keyboard
-		)
-		
 		# НЕ очищаем state, т.к. данные нужны для поиска поставщиков
 		# query.answer уже был вызван в начале функции
 		
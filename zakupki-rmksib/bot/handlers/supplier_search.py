@@ -442,7 +442,7 @@ async def process_document_upload(message: Message, state: FSMContext, bot: Bot)
                 parse_mode="HTML"
             )
             
-            text = await extract_text_from_file(file_path)
+            text = await extract_text_from_file(file_path, max_chars=settings.DOC_TEXT_CHAR_BUDGET or None)
             if not text or text.startswith("[Ошибка"):
                 await status_msg.edit_text(
                     f"❌ Не удалось извлечь текст из документа.\n\n"
@@ -179,12 +179,18 @@ def get_lots_pagination_keyboard(
     callback_prefix: str = "lots:view:",
     page_callback_prefix: str = "lots:page:",
     show_add_doc_button: bool = True,
-    back_source: str = "filtered"  # "filtered" для "Мои лоты", "all" для "Показать все лоты"
+    back_source: str = "filtered",  # "filtered" для "Мои лоты", "all" для "Показать все лоты"
+    total_count: int | None = None
 ) -> InlineKeyboardMarkup:
-    """Создает клавиатуру с пагинацией для списка лотов"""
+    """
+    Создает клавиатуру с пагинацией для списка лотов
+    
+    Если передан total_count, lots - это уже выбранная из БД текущая страница,
+    а total_count - общее количество лотов. Иначе lots - полный список, который режется здесь.
+    """
     from bot.keyboards.inline import get_main_menu_button
     
-    total_lots = len(lots)
+    total_lots = total_count if total_count is not None else len(lots)
     total_pages = (total_lots + page_size - 1) // page_size if total_lots > 0 else 1
     
     # Ограничиваем текущую страницу
@@ -193,7 +199,7 @@ def get_lots_pagination_keyboard(
     # Вычисляем индексы для текущей страницы
     start_idx = (current_page - 1) * page_size
     end_idx = start_idx + page_size
-    page_lots = lots[start_idx:end_idx]
+    page_lots = lots if total_count is not None else lots[start_idx:end_idx]
     
     keyboard = []
     
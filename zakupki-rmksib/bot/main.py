@@ -1,36 +1,28 @@
 import asyncio
 import logging
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.base import BaseStorage
 from config.settings import settings
 from bot.handlers import start, admin, lots, suppliers, statistics, preferences_gui, supplier_search, rfq, settings_advanced, commercial_proposals
 from bot.handlers import settings as settings_handler
 from bot.handlers import unknown
 from bot.middlewares.auth import AuthMiddleware
 from bot.middlewares.logging import LoggingMiddleware
+from bot.states.storage import create_fsm_storage
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from services import run_parsers_once
-from services.parsers.job import cleanup_expired_lots
+from services.ai import close_http_client
+from services.scheduler import add_background_jobs
+from database import last_seen_writer
 
-async def main() -> None:
-    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-
-    # Проверка обязательных параметров
-    if not settings.BOT_TOKEN:
-        logging.error("BOT_TOKEN не установлен! Установите его в файле .env")
-        raise ValueError("BOT_TOKEN is required. Please set it in .env file")
-
-    # Примечание: БД инициализируется через Alembic миграции при запуске Docker
-    # Для локального запуска: alembic upgrade head
 
-    bot = Bot(token=settings.BOT_TOKEN)
-    storage = MemoryStorage()
+def create_dispatcher(storage: BaseStorage) -> Dispatcher:
+    """Dispatcher с middleware и роутерами бота (общий для polling и процессов-обработчиков webhook)"""
     dp = Dispatcher(storage=storage)
 
     # Регистрируем middleware на уровне message для правильной передачи данных
     dp.message.middleware(AuthMiddleware())
     dp.message.middleware(LoggingMiddleware())
-    
+
     # Также регистрируем для callback queries
     dp.callback_query.middleware(AuthMiddleware())
     dp.callback_query.middleware(LoggingMiddleware())
@@ -55,34 +47,77 @@ async def main() -> None:
     dp.include_router(rfq.router)
     # Обработчик неизвестных сообщений - должен быть последним
     dp.include_router(unknown.router)
+    return dp
 
-    # Scheduler для периодических парсингов и очистки
+
+def create_scheduler(background_jobs: bool = True) -> AsyncIOScheduler:
+    """
+    Scheduler процесса бота
+
+    Args:
+        background_jobs: Добавить парсинг, очистку и доразметку лотов (при SCHEDULER_EMBEDDED=false
+            их выполняет отдельный процесс python -m services.scheduler); запись last_seen добавляется всегда -
+            накопитель у каждого процесса свой
+    """
     scheduler = AsyncIOScheduler()
-    
-    # Парсинг лотов (каждые N минут, если настроено)
-    parser_interval = getattr(settings, 'PARSER_INTERVAL_MINUTES', 720)  # По умолчанию 12 часов
-    if parser_interval > 0:
-        scheduler.add_job(
-            run_parsers_once, 
-            "interval", 
-            minutes=parser_interval, 
-            id="parser-job", 
-            replace_existing=True
-        )
-    
-    # Очистка лотов с истекающим дедлайном (каждый день в 3:00)
+
+    if background_jobs:
+        # Задачи выполняются под арендой в БД: при нескольких процессах каждый запуск выполняется один раз
+        add_background_jobs(scheduler)
+
+    # Запись накопленных last_seen пользователей (AuthMiddleware не пишет в БД на каждое сообщение)
     scheduler.add_job(
-        cleanup_expired_lots,
-        "cron",
-        hour=3,
-        minute=0,
-        id="cleanup-expired-lots",
+        last_seen_writer.flush,
+        "interval",
+        seconds=settings.LAST_SEEN_FLUSH_SECONDS,
+        id="flush-last-seen",
         replace_existing=True
     )
-    
+    return scheduler
+
+
+async def close_resources() -> None:
+    """Освобождение ресурсов процесса при остановке"""
+    # Сохраняем last_seen, накопленные после последней записи
+    await last_seen_writer.flush()
+    # Закрываем пул соединений к Perplexity API
+    await close_http_client()
+    # Останавливаем процессы извлечения текста из документов
+    from services.documentation import extraction_pool
+    extraction_pool.shutdown()
+
+
+async def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    # Проверка обязательных параметров
+    if not settings.BOT_TOKEN:
+        logging.error("BOT_TOKEN не установлен! Установите его в файле .env")
+        raise ValueError("BOT_TOKEN is required. Please set it in .env file")
+
+    # Примечание: БД инициализируется через Alembic миграции при запуске Docker
+    # Для локального запуска: alembic upgrade head
+
+    if settings.BOT_MODE == "webhook":
+        # Прием апдейтов по webhook и обработка в процессах-обработчиках (bot/webhook.py, bot/worker.py)
+        from bot.webhook import run_webhook
+        await run_webhook()
+        return
+
+    bot = Bot(token=settings.BOT_TOKEN)
+    # Состояния FSM в Redis: переживают перезапуск и общие для всех процессов бота
+    storage = await create_fsm_storage()
+    dp = create_dispatcher(storage)
+
+    # Scheduler для периодических парсингов и очистки
+    scheduler = create_scheduler(background_jobs=settings.SCHEDULER_EMBEDDED)
     scheduler.start()
 
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        scheduler.shutdown(wait=False)
+        await close_resources()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,8 +1,10 @@
 """Middleware для проверки доступа пользователей"""
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery, TelegramObject
+from datetime import datetime
 from typing import Any, Callable, Dict, Awaitable
-from database import async_session_maker, UserRepository
+from sqlalchemy.orm.attributes import set_committed_value
+from database import async_session_maker, UserRepository, user_cache, last_seen_writer, pool_monitor
 
 
 class AuthMiddleware(BaseMiddleware):
@@ -19,21 +21,40 @@ class AuthMiddleware(BaseMiddleware):
         if not user:
             return await adviser(event, data)
 
-        # Создаём async сессию для handler
-        async with async_session_maker() as session:
-            user_repo = UserRepository(session)
-            db_user = await user_repo.get_or_create_by_telegram_id(
-                telegram_id=user.id,
-                username=user.username,
-                full_name=user.full_name or f"{user.first_name} {user.last_name or ''}".strip()
-            )
-
-            # Обновляем last_seen
-            await user_repo.update_last_seen(db_user)
-            
-            # Передаём данные пользователя (не ORM объект) в handler
-            data['db_user'] = db_user
-            data['session'] = session
-            
-            # Вызываем handler внутри контекста сессии
-            return await adviser(event, data)
+        # Учитываем соединения с БД, которые берет обработка апдейта (см. /db_stats)
+        with pool_monitor.track_update(f"{type(event).__name__} from {user.id}"):
+            return await self._handle(adviser, event, data, user)
+
+    async def _handle(
+        self,
+        adviser: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+        user
+    ) -> Any:
+
+        username = user.username
+        full_name = user.full_name or f"{user.first_name} {user.last_name or ''}".strip()
+
+        # Пользователь из кэша; в БД идем только при промахе или если имя в Telegram изменилось
+        db_user = user_cache.get(user.id)
+        if db_user is None or (db_user.username, db_user.full_name) != (username, full_name):
+            async with async_session_maker() as session:
+                user_repo = UserRepository(session)
+                fresh_user = await user_repo.get_or_create_by_telegram_id(
+                    telegram_id=user.id,
+                    username=username,
+                    full_name=full_name
+                )
+            user_cache.put(fresh_user)
+            db_user = user_cache.get(user.id) or fresh_user
+
+        # last_seen записывается пакетно (см. LastSeenWriter), в handler передаем актуальное значение
+        now = datetime.utcnow()
+        set_committed_value(db_user, "last_seen", now)
+        last_seen_writer.touch(db_user.id, now)
+
+        # Передаём отсоединенный объект пользователя (не привязан к сессии middleware) в handler.
+        # Сессию handler открывает сам (async_session_maker) и только на время работы с БД
+        data['db_user'] = db_user
+        return await adviser(event, data)
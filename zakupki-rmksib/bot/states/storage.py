@@ -0,0 +1,108 @@
+"""Хранилище FSM: Redis с TTL и компактной сериализацией данных состояния"""
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.redis import RedisStorage
+from loguru import logger
+from config.settings import settings
+
+
+def _encode(value: Any) -> Any:
+    """Типы, которые handlers кладут в состояние, но json не умеет (дедлайн лота - datetime)"""
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"__decimal__": str(value)}
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1:
+        if "__datetime__" in obj:
+            return datetime.fromisoformat(obj["__datetime__"])
+        if "__date__" in obj:
+            return date.fromisoformat(obj["__date__"])
+        if "__decimal__" in obj:
+            return Decimal(obj["__decimal__"])
+    return obj
+
+
+def dump_state_data(data: Dict[str, Any], compress_threshold: int) -> bytes:
+    """
+    Сериализует данные состояния: компактный JSON в UTF-8 (кириллица без \\uXXXX),
+    большие данные (тексты документации, результаты поиска поставщиков) сжимаются zlib
+    """
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_encode).encode("utf-8")
+    if compress_threshold > 0 and len(payload) > compress_threshold:
+        return zlib.compress(payload, 6)
+    return payload
+
+
+def load_state_data(value: bytes | str) -> Dict[str, Any]:
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    # JSON-объект начинается с "{", сжатые данные - с заголовка zlib
+    if not value.startswith(b"{"):
+        value = zlib.decompress(value)
+    return json.loads(value, object_hook=_decode)
+
+
+class CompactRedisStorage(RedisStorage):
+    """
+    RedisStorage, хранящий данные состояния в компактном (при необходимости сжатом) виде.
+    Записи, сохраненные обычным RedisStorage (JSON), читаются без миграции.
+    """
+
+    def __init__(self, *args: Any, compress_threshold: int = 1024, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.compress_threshold = compress_threshold
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        redis_key = self.key_builder.build(key, "data")
+        if not data:
+            await self.redis.delete(redis_key)
+            return
+        await self.redis.set(redis_key, dump_state_data(dict(data), self.compress_threshold), ex=self.data_ttl)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        value = await self.redis.get(self.key_builder.build(key, "data"))
+        if value is None:
+            return {}
+        return load_state_data(value)
+
+
+async def create_fsm_storage() -> BaseStorage:
+    """
+    Хранилище FSM для Dispatcher: Redis, если задан REDIS_URL (состояния переживают перезапуск
+    и доступны всем процессам бота), иначе MemoryStorage (только для локальной разработки)
+    """
+    if not settings.REDIS_URL:
+        logger.warning("REDIS_URL не задан: состояния FSM хранятся в памяти и теряются при перезапуске")
+        return MemoryStorage()
+
+    ttl = int(settings.FSM_STATE_TTL_HOURS * 3600) or None
+    storage = CompactRedisStorage.from_url(
+        settings.REDIS_URL,
+        key_builder=DefaultKeyBuilder(prefix=settings.FSM_KEY_PREFIX),
+        state_ttl=ttl,
+        data_ttl=ttl,
+        compress_threshold=settings.FSM_COMPRESS_THRESHOLD_BYTES,
+    )
+    try:
+        await storage.redis.ping()
+    except Exception as e:
+        await storage.close()
+        raise RuntimeError(
+            f"Redis для состояний FSM недоступен ({settings.REDIS_URL}): {e}. "
+            f"Запустите Redis или уберите REDIS_URL для хранения состояний в памяти"
+        ) from e
+    logger.info(f"FSM storage: Redis, TTL {settings.FSM_STATE_TTL_HOURS} ч")
+    return storage
@@ -0,0 +1,153 @@
+"""
+Режим webhook: aiohttp-сервер принимает апдейты Telegram и раскладывает их по очередям в Redis,
+откуда их забирают процессы-обработчики (bot/worker.py).
+
+Очередь (шард) выбирается по чату: все апдейты одного чата попадают в одну очередь и обрабатываются
+одним процессом по порядку, а разные чаты обрабатываются параллельно разными процессами.
+Telegram получает ответ сразу после записи в очередь, поэтому за доставку отвечает обработчик:
+апдейт удаляется из Redis только после обработки (повтор после падения обработчика возможен).
+"""
+import asyncio
+import hmac
+import json
+import multiprocessing
+import re
+from typing import Any, Dict, List, Optional
+from aiogram import Bot
+from aiohttp import web
+from loguru import logger
+from redis.asyncio import Redis
+from config.settings import settings
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+# Допустимый секрет по правилам Telegram (setWebhook secret_token)
+SECRET_RE = re.compile(r"[A-Za-z0-9_-]{1,256}")
+
+
+def update_queue_key(shard: int) -> str:
+    return f"{settings.WEBHOOK_QUEUE_PREFIX}:{shard}"
+
+
+def processing_list_key(shard: int) -> str:
+    """Апдейты очереди, которые обработчик взял, но еще не обработал (см. bot/worker.py)"""
+    return f"{settings.WEBHOOK_QUEUE_PREFIX}:{shard}:processing"
+
+
+def chat_key(update: Dict[str, Any]) -> int:
+    """Ключ упорядочивания апдейта: id чата, для апдейтов без чата (inline) - id пользователя"""
+    for field, event in update.items():
+        if field == "update_id" or not isinstance(event, dict):
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        user = event.get("from") or event.get("user")
+        if chat:
+            return int(chat["id"])
+        if user:
+            return int(user["id"])
+        break
+    return int(update.get("update_id", 0))
+
+
+def shard_for_update(update: Dict[str, Any], shards: int) -> int:
+    """Номер очереди для апдейта (все апдейты чата - в одну очередь)"""
+    return abs(chat_key(update)) % max(1, shards)
+
+
+async def handle_update(request: web.Request) -> web.Response:
+    """Проверяет секрет и ставит апдейт в очередь; Telegram получает ответ сразу, не дожидаясь обработки"""
+    # Без секрета любой мог бы прислать апдейт от имени администратора: AuthMiddleware доверяет from_user
+    secret = request.headers.get(SECRET_HEADER, "")
+    if not settings.WEBHOOK_SECRET or not hmac.compare_digest(secret.encode(), settings.WEBHOOK_SECRET.encode()):
+        return web.Response(status=401)
+    raw = await request.read()
+    try:
+        update = json.loads(raw)
+    except ValueError:
+        return web.Response(status=400)
+    shard = shard_for_update(update, settings.BOT_WORKERS)
+    await request.app["redis"].rpush(update_queue_key(shard), raw)
+    return web.Response()
+
+
+async def health(request: web.Request) -> web.Response:
+    redis: Redis = request.app["redis"]
+    depths = [await redis.llen(update_queue_key(shard)) for shard in range(settings.BOT_WORKERS)]
+    processing = [await redis.llen(processing_list_key(shard)) for shard in range(settings.BOT_WORKERS)]
+    return web.json_response({"status": "ok", "queue_depths": depths, "processing": processing})
+
+
+def _start_workers() -> List[multiprocessing.Process]:
+    from bot.worker import worker_main
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    for shard in range(settings.BOT_WORKERS):
+        process = context.Process(target=worker_main, args=(shard,), name=f"bot-worker-{shard}", daemon=False)
+        process.start()
+        processes.append(process)
+    logger.info(f"Started {len(processes)} bot workers")
+    return processes
+
+
+def _stop_workers(processes: List[multiprocessing.Process]) -> None:
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        # Обработчик дожидается начатых апдейтов (см. bot/worker.py)
+        process.join(timeout=settings.BOT_WORKER_SHUTDOWN_TIMEOUT + 5)
+        if process.is_alive():
+            process.kill()
+
+
+async def run_webhook() -> None:
+    """Запуск webhook-сервера, процессов-обработчиков (если BOT_WORKERS_EMBEDDED) и фоновых задач"""
+    from bot.main import create_dispatcher, create_scheduler, close_resources
+    from aiogram.fsm.storage.memory import MemoryStorage
+
+    if not settings.REDIS_URL:
+        raise ValueError("Для BOT_MODE=webhook нужен REDIS_URL: через Redis идут очереди апдейтов и состояния FSM")
+    if not settings.WEBHOOK_URL:
+        raise ValueError("Для BOT_MODE=webhook нужен WEBHOOK_URL (публичный https-адрес сервера)")
+    if not SECRET_RE.fullmatch(settings.WEBHOOK_SECRET):
+        raise ValueError(
+            "Для BOT_MODE=webhook нужен WEBHOOK_SECRET (1-256 символов: латинские буквы, цифры, _ и -): "
+            "без него адрес webhook принимает апдейты от кого угодно"
+        )
+
+    bot = Bot(token=settings.BOT_TOKEN)
+    redis = Redis.from_url(settings.REDIS_URL)
+    # Dispatcher нужен только чтобы узнать, какие типы апдейтов обрабатывает бот
+    allowed_updates = create_dispatcher(MemoryStorage()).resolve_used_update_types()
+    await bot.set_webhook(
+        url=settings.WEBHOOK_URL.rstrip("/") + settings.WEBHOOK_PATH,
+        secret_token=settings.WEBHOOK_SECRET,
+        allowed_updates=allowed_updates,
+        max_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+    )
+
+    app = web.Application()
+    app["redis"] = redis
+    app.router.add_post(settings.WEBHOOK_PATH, handle_update)
+    app.router.add_get("/health", health)
+
+    workers: Optional[List[multiprocessing.Process]] = _start_workers() if settings.BOT_WORKERS_EMBEDDED else None
+
+    # Фоновые задачи (парсинг, очистка) - в этом процессе, если не вынесены в python -m services.scheduler
+    scheduler = create_scheduler(background_jobs=settings.SCHEDULER_EMBEDDED)
+    scheduler.start()
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, settings.WEBHOOK_HOST, settings.WEBHOOK_PORT).start()
+    logger.info(f"Webhook server listening on {settings.WEBHOOK_HOST}:{settings.WEBHOOK_PORT}{settings.WEBHOOK_PATH}")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        scheduler.shutdown(wait=False)
+        if workers:
+            await asyncio.to_thread(_stop_workers, workers)
+        await redis.aclose()
+        await bot.session.close()
+        await close_resources()
@@ -0,0 +1,170 @@
+"""
+Процесс-обработчик апдейтов для режима webhook: забирает апдейты своей очереди из Redis и передает их в Dispatcher.
+
+Апдейты одного чата обрабатываются строго по очереди (следующий начинается после завершения предыдущего),
+разных чатов - параллельно, не более BOT_WORKER_CONCURRENCY одновременно. Апдейт, ожидающий завершения
+предыдущего апдейта своего чата, слот не занимает; у чата может быть не больше BOT_WORKER_CHAT_BACKLOG
+необработанных апдейтов (остальные отбрасываются как флуд), у процесса - не больше BOT_WORKER_MAX_PENDING.
+
+Доставка "хотя бы один раз": апдейт переносится из очереди в список обрабатываемых (BLMOVE) и удаляется
+из него после обработки. Апдейты, оставшиеся в списке после падения или остановки процесса (в том числе
+не завершившиеся за BOT_WORKER_SHUTDOWN_TIMEOUT), при следующем запуске возвращаются в начало очереди
+и обрабатываются повторно.
+
+Запуск отдельно от webhook-сервера (например, на другой машине, при BOT_WORKERS_EMBEDDED=false):
+    python -m bot.worker 0
+"""
+import asyncio
+import json
+import logging
+import signal
+import sys
+from typing import Any, Awaitable, Callable, Dict, Optional
+from aiogram import Bot, Dispatcher
+from loguru import logger
+from redis.asyncio import Redis
+from config.settings import settings
+from bot.webhook import update_queue_key, processing_list_key, chat_key
+
+
+class ChatOrderedRunner:
+    """Запускает обработку апдейтов: по порядку внутри чата, параллельно между чатами"""
+
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        concurrency: int,
+        max_pending: int,
+        chat_backlog: int,
+        ack: Callable[[bytes], Awaitable[None]],
+    ):
+        self.dp = dp
+        self.bot = bot
+        self._slots = asyncio.Semaphore(max(1, concurrency))  # Одновременно обрабатываемые апдейты
+        self._pending = asyncio.Semaphore(max(1, max_pending))  # Принятые, но еще не обработанные апдейты
+        self._chat_backlog = max(1, chat_backlog)
+        self._ack = ack  # Вызывается, когда апдейт обработан или отброшен
+        self._tails: Dict[int, asyncio.Task] = {}  # Последний поставленный апдейт каждого чата
+        self._backlogs: Dict[int, int] = {}  # Необработанных апдейтов каждого чата
+        self._tasks: set = set()
+
+    async def submit(self, raw: bytes) -> None:
+        """Поставить апдейт в обработку (ждет, если у процесса уже BOT_WORKER_MAX_PENDING необработанных апдейтов)"""
+        await self._pending.acquire()
+        data: Dict[str, Any] = json.loads(raw)
+        key = chat_key(data)
+        if self._backlogs.get(key, 0) >= self._chat_backlog:
+            # Чат прислал больше апдейтов, чем успевает обработать: не даем ему занять очередь процесса
+            logger.warning(f"Dropping update {data.get('update_id')}: chat {key} has {self._chat_backlog} unprocessed updates")
+            self._pending.release()
+            await self._ack(raw)
+            return
+        self._backlogs[key] = self._backlogs.get(key, 0) + 1
+        previous = self._tails.get(key)
+        task = asyncio.create_task(self._process(raw, data, previous))
+        self._tails[key] = task
+        self._tasks.add(task)
+        task.add_done_callback(lambda done: self._on_done(key, done))
+
+    async def _process(self, raw: bytes, data: Dict[str, Any], previous: Optional[asyncio.Task]) -> None:
+        if previous is not None:
+            # Ошибки предыдущего апдейта уже залогированы, порядок важнее
+            await asyncio.gather(previous, return_exceptions=True)
+        # Слот занимается только после завершения предыдущего апдейта чата: ожидающие своей очереди
+        # апдейты одного чата не мешают другим чатам
+        async with self._slots:
+            try:
+                await self.dp.feed_raw_update(self.bot, data)
+            except Exception as e:
+                logger.error(f"Error processing update {data.get('update_id')}: {e}", exc_info=True)
+        try:
+            await self._ack(raw)
+        except Exception as e:
+            # Апдейт останется в списке обрабатываемых и будет обработан повторно после перезапуска
+            logger.error(f"Could not acknowledge update {data.get('update_id')}: {e}")
+
+    def _on_done(self, key: int, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        self._pending.release()
+        self._backlogs[key] -= 1
+        if not self._backlogs[key]:
+            del self._backlogs[key]
+        if self._tails.get(key) is task:
+            del self._tails[key]
+
+    async def drain(self, timeout: float) -> None:
+        """Дождаться начатых апдейтов"""
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+
+
+async def requeue_unfinished(redis: Redis, shard: int) -> int:
+    """Вернуть в начало очереди апдейты, не обработанные прошлым запуском обработчика (в исходном порядке)"""
+    moved = 0
+    while await redis.lmove(processing_list_key(shard), update_queue_key(shard), src="RIGHT", dest="LEFT") is not None:
+        moved += 1
+    return moved
+
+
+async def run_worker(shard: int) -> None:
+    from bot.main import create_dispatcher, create_scheduler, close_resources
+    from bot.states.storage import create_fsm_storage
+
+    bot = Bot(token=settings.BOT_TOKEN)
+    storage = await create_fsm_storage()
+    dp = create_dispatcher(storage)
+    redis = Redis.from_url(settings.REDIS_URL)
+    queue_key = update_queue_key(shard)
+    processing_key = processing_list_key(shard)
+
+    async def ack(raw: bytes) -> None:
+        await redis.lrem(processing_key, 1, raw)
+
+    runner = ChatOrderedRunner(
+        dp,
+        bot,
+        concurrency=settings.BOT_WORKER_CONCURRENCY,
+        max_pending=settings.BOT_WORKER_MAX_PENDING,
+        chat_backlog=settings.BOT_WORKER_CHAT_BACKLOG,
+        ack=ack,
+    )
+    requeued = await requeue_unfinished(redis, shard)
+    if requeued:
+        logger.warning(f"Bot worker {shard}: {requeued} updates from the previous run are queued again")
+
+    # В обработчике - только запись last_seen; парсинг и очистка работают в процессе webhook-сервера или планировщика
+    scheduler = create_scheduler(background_jobs=False)
+    scheduler.start()
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    logger.info(f"Bot worker {shard} is consuming {queue_key}")
+    await dp.emit_startup(bot=bot)
+    try:
+        while not stopping.is_set():
+            raw = await redis.blmove(queue_key, processing_key, timeout=1, src="LEFT", dest="RIGHT")
+            if raw is None:
+                continue
+            await runner.submit(raw)
+    finally:
+        await runner.drain(settings.BOT_WORKER_SHUTDOWN_TIMEOUT)
+        scheduler.shutdown(wait=False)
+        # Закрывает хранилище FSM
+        await dp.emit_shutdown(bot=bot)
+        await redis.aclose()
+        await bot.session.close()
+        await close_resources()
+        logger.info(f"Bot worker {shard} stopped")
+
+
+def worker_main(shard: int) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    asyncio.run(run_worker(shard))
+
+
+if __name__ == "__main__":
+    worker_main(int(sys.argv[1]) if len(sys.argv) > 1 else 0)
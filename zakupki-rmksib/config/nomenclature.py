@@ -1,4 +1,7 @@
 """Справочник номенклатурных групп"""
+import asyncio
+import json
+import re
 from typing import Dict, List, Optional
 from loguru import logger
 
@@ -104,6 +107,16 @@ def get_nomenclature_keywords(nomenclature_name: str) -> List[str]:
     return NOMENCLATURE_CATALOG.get(nomenclature_name, [])
 
 
+def classify_nomenclature_by_keywords(lot_name: str) -> List[str]:
+    """Возвращает все номенклатурные группы, ключевые слова которых встречаются в названии лота"""
+    lot_name_lower = lot_name.lower()
+    return [
+        group_name
+        for group_name, keywords in NOMENCLATURE_CATALOG.items()
+        if any(keyword in lot_name_lower for keyword in keywords)
+    ]
+
+
 def check_nomenclature_match(lot_name: str, nomenclature_list: List[str]) -> bool:
     """
     Проверяет, соответствует ли название лота выбранным номенклатурным группам
@@ -137,171 +150,245 @@ def check_nomenclature_match(lot_name: str, nomenclature_list: List[str]) -> boo
     return False
 
 
-async def check_nomenclature_match_with_llm(
+def _build_lot_text(
     lot_title: str,
     lot_nomenclature: Optional[List[str] | Dict] = None,
-    lot_description: Optional[str] = None,
-    nomenclature_list: List[str] = None
-) -> bool:
-    """
-    Проверяет соответствие номенклатуры лота выбранным номенклатурным группам
-    с использованием LLM для семантического сопоставления.
+    lot_description: Optional[str] = None
+) -> str:
+    """Формирует текстовое представление лота для LLM-классификации"""
+    lot_text_parts = [lot_title]
+    if lot_description:
+        lot_text_parts.append(f"Описание: {lot_description[:500]}")  # Ограничиваем длину
     
-    Сначала пытается использовать простое сопоставление по ключевым словам.
-    Если простое сопоставление не дает результата, использует LLM для семантического анализа.
+    # Обрабатываем номенклатуру из лота
+    if lot_nomenclature:
+        if isinstance(lot_nomenclature, dict):
+            # Если это словарь, извлекаем значения
+            nom_items = []
+            for key, value in lot_nomenclature.items():
+                if isinstance(value, list):
+                    nom_items.extend([str(v) for v in value])
+                else:
+                    nom_items.append(str(value))
+            if nom_items:
+                lot_text_parts.append(f"Номенклатура в лоте: {', '.join(nom_items[:10])}")
+        elif isinstance(lot_nomenclature, list):
+            nom_str = ', '.join([str(item) for item in lot_nomenclature[:10]])
+            if nom_str:
+                lot_text_parts.append(f"Номенклатура в лоте: {nom_str}")
     
-    Args:
-        lot_title: Название лота
-        lot_nomenclature: Номенклатура из лота (список строк или словарь)
-        lot_description: Описание лота (опционально, для более точного анализа)
-        nomenclature_list: Список выбранных номенклатурных групп из настроек
+    return "\n".join(lot_text_parts)
+
+
+def _match_known_groups(items) -> List[str]:
+    """Оставляет только группы из справочника (без учета регистра), в написании справочника"""
+    groups_by_lower = {group_name.lower(): group_name for group_name in NOMENCLATURE_CATALOG}
+    matched = []
+    for item in items:
+        group_name = groups_by_lower.get(str(item).strip().lower())
+        if group_name and group_name not in matched:
+            matched.append(group_name)
+    return matched
+
+
+def _parse_llm_groups(response: str, lots_count: int) -> Dict[int, List[str]]:
+    """
+    Разбирает JSON-ответ LLM вида {"1": ["Группа", ...], "2": []}
+    
+    Если JSON целиком не разбирается (обрезанный ответ, markdown-обертка, лишний текст),
+    извлекаются отдельные записи "N": [...], которые удалось распознать.
     
     Returns:
-        True если лот соответствует хотя бы одной номенклатурной группе
+        Словарь {индекс лота (с 0): список известных групп}. Лоты без корректного ответа отсутствуют.
     """
-    if not nomenclature_list:
-        return True
+    parsed: Dict[int, List[str]] = {}
     
-    # Если выбрана позиция "Все лоты", пропускаем все лоты без фильтрации
-    if ALL_LOTS_KEY in nomenclature_list:
-        return True
+    raw = None
+    json_match = re.search(r"\{.*\}", response, re.DOTALL)
+    if json_match:
+        try:
+            raw = json.loads(json_match.group(0))
+        except ValueError:
+            raw = None
     
-    # Сначала пробуем простое сопоставление по ключевым словам
-    simple_match = check_nomenclature_match(lot_title, nomenclature_list)
-    if simple_match:
-        logger.debug(f"Simple nomenclature match found for: {lot_title[:50]}")
-        return True
+    if isinstance(raw, dict):
+        entries = list(raw.items())
+    else:
+        # Поэлементный разбор: берем только записи с закрытым списком групп
+        entries = [
+            (key, re.findall(r'"((?:[^"\\]|\\.)*)"', items))
+            for key, items in re.findall(r'"?(\d+)"?\s*:\s*\[([^\[\]]*)\]', response)
+        ]
     
-    # Если простое сопоставление не дало результата, используем LLM
-    try:
-        from services.ai.perplexity import ask_perplexity
-        
-        # Формируем текст для анализа
-        lot_text_parts = [lot_title]
-        if lot_description:
-            lot_text_parts.append(f"Описание: {lot_description[:500]}")  # Ограничиваем длину
-        
-        # Обрабатываем номенклатуру из лота
-        if lot_nomenclature:
-            if isinstance(lot_nomenclature, dict):
-                # Если это словарь, извлекаем значения
-                nom_items = []
-                for key, value in lot_nomenclature.items():
-                    if isinstance(value, list):
-                        nom_items.extend([str(v) for v in value])
-                    else:
-                        nom_items.append(str(value))
-                if nom_items:
-                    lot_text_parts.append(f"Номенклатура в лоте: {', '.join(nom_items[:10])}")
-            elif isinstance(lot_nomenclature, list):
-                nom_str = ', '.join([str(item) for item in lot_nomenclature[:10]])
-                if nom_str:
-                    lot_text_parts.append(f"Номенклатура в лоте: {nom_str}")
-        
-        lot_text = "\n".join(lot_text_parts)
-        
-        # Формируем список номенклатурных групп с их ключевыми словами для контекста
-        nomenclature_context = []
-        for nom_group in nomenclature_list:
-            keywords = get_nomenclature_keywords(nom_group)
-            if keywords:
-                nomenclature_context.append(f"- {nom_group}: {', '.join(keywords[:5])}")
-        
-        nomenclature_context_str = "\n".join(nomenclature_context)
-        
-        # Формируем промпт для LLM
-        system_prompt = """Ты эксперт по классификации товаров и номенклатуре в промышленных закупках.
-Твоя задача - определить, относится ли товар/услуга из лота к указанным номенклатурным группам.
+    for key, value in entries:
+        try:
+            index = int(key) - 1
+        except (TypeError, ValueError):
+            continue
+        if not 0 <= index < lots_count or not isinstance(value, list):
+            continue
+        parsed[index] = _match_known_groups(value)
+    return parsed
+
+
+async def _classify_batch_with_llm(lot_texts: List[str]) -> Optional[Dict[int, List[str]]]:
+    """
+    Один запрос к LLM для пакета лотов
+    
+    Returns:
+        Словарь {индекс лота в пакете: список групп} (может быть неполным, если ответ поврежден).
+        None - запрос к LLM не выполнен.
+    """
+    from services.ai.perplexity import ask_perplexity
+    from services.ai.scheduler import PRIORITY_BACKGROUND
+    
+    groups_context = "\n".join(
+        f"- {group_name}: {', '.join(keywords[:5])}"
+        for group_name, keywords in NOMENCLATURE_CATALOG.items()
+    )
+    lots_context = "\n\n".join(
+        f"Лот {idx}:\n{lot_text}" for idx, lot_text in enumerate(lot_texts, 1)
+    )
+    
+    system_prompt = """Ты эксперт по классификации товаров и номенклатуре в промышленных закупках.
+Твоя задача - отнести каждый лот к номенклатурным группам из справочника.
 
-Отвечай ТОЛЬКО "ДА" или "НЕТ" без дополнительных пояснений."""
-        
-        user_prompt = f"""Определи, относится ли товар/услуга из следующего лота к одной из указанных номенклатурных групп:
+Отвечай ТОЛЬКО JSON-объектом без пояснений."""
+    
+    user_prompt = f"""Определи, к каким номенклатурным группам относится товар/услуга каждого лота.
 
-<ДАННЫЕ ЛОТА>
-{lot_text}
-</ДАННЫЕ ЛОТА>
+<НОМЕНКЛАТУРНЫЕ ГРУППЫ>
+{groups_context}
+</НОМЕНКЛАТУРНЫЕ ГРУППЫ>
 
-<НОМЕНКЛАТУРНЫЕ ГРУППЫ ИЗ НАСТРОЕК>
-{nomenclature_context_str}
-</НОМЕНКЛАТУРНЫЕ ГРУППЫ ИЗ НАСТРОЕК>
+<ЛОТЫ>
+{lots_context}
+</ЛОТЫ>
 
 <ИНСТРУКЦИЯ>
-Проанализируй семантически и логически:
-1. Определи, к какой категории относится товар/услуга из лота
-2. Проверь, входит ли эта категория в одну из указанных номенклатурных групп
-3. Учитывай, что названия могут отличаться, но товар может относиться к той же категории
-4. Например: "болты М12" относятся к "Метизы и крепёжные изделия", даже если в названии нет слова "метиз"
+1. Для каждого лота укажи все подходящие группы, используя названия групп ТОЧНО как в справочнике
+2. Учитывай, что названия могут отличаться, но товар может относиться к той же категории
+3. Например: "болты М12" относятся к "Метизы и крепёжные изделия", даже если в названии нет слова "метиз"
+4. Если лот не относится ни к одной группе, укажи пустой список
+5. Ответ должен содержать запись для каждого лота от 1 до {len(lot_texts)}
 
-Ответь ТОЛЬКО "ДА" если товар относится хотя бы к одной группе, или "НЕТ" если не относится ни к одной.
+Формат ответа: {{"1": ["Группа"], "2": []}}
 </ИНСТРУКЦИЯ>"""
-        
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
-        
-        # Вызываем LLM с коротким ответом
-        response = await ask_perplexity(messages, temperature=0.1, max_tokens=50)
-        
-        # Парсим ответ
-        response_upper = response.strip().upper()
-        if "ДА" in response_upper or "YES" in response_upper:
-            logger.info(f"LLM confirmed nomenclature match for: {lot_title[:50]}")
-            return True
-        else:
-            logger.debug(f"LLM rejected nomenclature match for: {lot_title[:50]}")
-            return False
-            
+    
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    
+    try:
+        response = await ask_perplexity(
+            messages,
+            temperature=0.1,
+            max_tokens=100 + 60 * len(lot_texts),
+            priority=PRIORITY_BACKGROUND
+        )
     except Exception as e:
-        logger.error(f"Error in LLM nomenclature matching: {e}", exc_info=True)
-        # В случае ошибки возвращаем False (не пропускаем лот, если не уверены)
-        return False
+        logger.error(f"Error in LLM nomenclature classification: {e}", exc_info=True)
+        return None
+    
+    parsed = _parse_llm_groups(response, len(lot_texts))
+    if len(parsed) < len(lot_texts):
+        logger.warning(f"Malformed LLM nomenclature reply: parsed {len(parsed)} of {len(lot_texts)} lots")
+    return parsed
 
 
-async def check_nomenclature_match_enhanced(
-    lot_title: str,
-    lot_nomenclature: Optional[List[str] | Dict] = None,
-    lot_description: Optional[str] = None,
-    nomenclature_list: List[str] = None,
-    use_llm: bool = True
-) -> bool:
+async def classify_nomenclature_with_llm(lot_texts: List[str]) -> Dict[int, List[str]]:
     """
-    Улучшенная проверка соответствия номенклатуры с возможностью использования LLM.
+    Определяет номенклатурные группы для нескольких лотов пакетными запросами к LLM
     
-    Сначала пытается использовать простое сопоставление по ключевым словам.
-    Если простое сопоставление не дает результата и use_llm=True, использует LLM.
+    Лоты отправляются пакетами по NOMENCLATURE_LLM_BATCH_SIZE в одном промпте, пакеты - параллельно.
+    Лоты, для которых ответ пакета не удалось разобрать, переспрашиваются по одному.
     
     Args:
-        lot_title: Название лота
-        lot_nomenclature: Номенклатура из лота (список строк или словарь)
-        lot_description: Описание лота (опционально)
-        nomenclature_list: Список выбранных номенклатурных групп из настроек
-        use_llm: Использовать ли LLM для семантического сопоставления при отсутствии точного совпадения
+        lot_texts: Тексты лотов (см. _build_lot_text)
     
     Returns:
-        True если лот соответствует хотя бы одной номенклатурной группе
+        Словарь {индекс лота в lot_texts: список групп}. Лоты, которые не удалось классифицировать
+        (ошибка LLM), в словаре отсутствуют.
     """
-    if not nomenclature_list:
-        return True
+    if not lot_texts:
+        return {}
     
-    if ALL_LOTS_KEY in nomenclature_list:
-        return True
+    from config.settings import settings
     
-    # Сначала пробуем простое сопоставление
-    simple_match = check_nomenclature_match(lot_title, nomenclature_list)
-    if simple_match:
-        return True
+    batch_size = max(1, settings.NOMENCLATURE_LLM_BATCH_SIZE)
+    batches = [
+        list(range(start, min(start + batch_size, len(lot_texts))))
+        for start in range(0, len(lot_texts), batch_size)
+    ]
+    replies = await asyncio.gather(*[
+        _classify_batch_with_llm([lot_texts[idx] for idx in batch]) for batch in batches
+    ])
     
-    # Если простое сопоставление не дало результата и разрешено использование LLM
-    if use_llm:
-        return await check_nomenclature_match_with_llm(
-            lot_title,
-            lot_nomenclature,
-            lot_description,
-            nomenclature_list
-        )
+    result: Dict[int, List[str]] = {}
+    retry: List[int] = []
+    for batch, reply in zip(batches, replies):
+        if reply is None:
+            # LLM недоступна - лоты пакета остаются для повторной разметки позже
+            continue
+        for position, idx in enumerate(batch):
+            if position in reply:
+                result[idx] = reply[position]
+            elif len(batch) > 1:
+                retry.append(idx)
     
-    return False
-
+    if retry:
+        single_replies = await asyncio.gather(*[
+            _classify_batch_with_llm([lot_texts[idx]]) for idx in retry
+        ])
+        for idx, reply in zip(retry, single_replies):
+            if reply and 0 in reply:
+                result[idx] = reply[0]
+    
+    logger.info(
+        f"LLM classified {len(result)} of {len(lot_texts)} lots by nomenclature "
+        f"({len(batches)} batch requests, {len(retry)} single retries)"
+    )
+    return result
 
 
+async def classify_lots_nomenclature(lots: List[Dict]) -> List[Optional[List[str]]]:
+    """
+    Размечает лоты номенклатурными группами: по ключевым словам и пакетными запросами к LLM.
+    
+    Совпадение по ключевым словам не исключает лот из запроса к LLM: лот с ключевым словом
+    одной группы может относиться и к другим группам по смыслу (например, "болты и кабель
+    для подстанции"). К LLM не отправляются только лоты, уже покрывающие весь справочник.
+    Итоговые группы - объединение групп по ключевым словам и групп от LLM.
+    
+    Args:
+        lots: Словари с полями title, description, nomenclature
+    
+    Returns:
+        Список групп для каждого лота (в том же порядке).
+        None - лот классифицировать не удалось (ошибка LLM), его нужно разметить позже
+        (до этого лот подбирается по ключевым словам в названии).
+    """
+    results: List[Optional[List[str]]] = [
+        classify_nomenclature_by_keywords(lot.get("title") or "") for lot in lots
+    ]
+    
+    pending = [idx for idx, groups in enumerate(results) if len(groups) < len(NOMENCLATURE_CATALOG)]
+    if pending:
+        lot_texts = [
+            _build_lot_text(
+                lots[idx].get("title") or "",
+                lots[idx].get("nomenclature"),
+                lots[idx].get("description")
+            )
+            for idx in pending
+        ]
+        llm_groups = await classify_nomenclature_with_llm(lot_texts)
+        for position, idx in enumerate(pending):
+            groups = llm_groups.get(position)
+            if groups is None:
+                results[idx] = None
+            else:
+                results[idx] = results[idx] + [group for group in groups if group not in results[idx]]
+    
+    return results
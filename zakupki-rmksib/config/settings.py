@@ -29,6 +29,60 @@ class Settings:
     BUDGET_THRESHOLD_RUB = int(os.getenv('BUDGET_THRESHOLD_RUB', '3000000'))
     AI_OVERHEAD_PERCENT = int(os.getenv('AI_OVERHEAD_PERCENT', '15'))
     PARSER_INTERVAL_MINUTES = int(os.getenv('PARSER_INTERVAL_MINUTES', '30'))
+    PARSER_DOWNLOAD_CONCURRENCY = int(os.getenv('PARSER_DOWNLOAD_CONCURRENCY', '8'))  # Одновременных скачиваний документации при загрузке лотов
+    PARSER_EXTRACT_CONCURRENCY = int(os.getenv('PARSER_EXTRACT_CONCURRENCY', '2'))  # Одновременных извлечений текста из документации
+    PARSER_QUEUE_SIZE = int(os.getenv('PARSER_QUEUE_SIZE', '16'))  # Размер очередей между стадиями загрузки (ограничивает память при медленных стадиях)
+    SCHEDULER_EMBEDDED = os.getenv('SCHEDULER_EMBEDDED', 'true').lower() in ('1', 'true', 'yes')  # Выполнять фоновые задачи в процессе бота (false - отдельный процесс python -m services.scheduler)
+    SCHEDULER_JOBSTORE_URL = os.getenv('SCHEDULER_JOBSTORE_URL', '')  # БД для хранилища задач отдельного планировщика (по умолчанию - основная БД)
+    SCHEDULER_MISFIRE_GRACE_SECONDS = int(os.getenv('SCHEDULER_MISFIRE_GRACE_SECONDS', '3600'))  # Пропущенный запуск выполняется, если опоздание не больше N секунд
+    SCHEDULER_LEASE_SECONDS = int(os.getenv('SCHEDULER_LEASE_SECONDS', '120'))  # Срок аренды задачи (продлевается, пока задача выполняется)
+    SCHEDULER_FIRE_JITTER_SECONDS = int(os.getenv('SCHEDULER_FIRE_JITTER_SECONDS', '60'))  # Допуск на опоздание срабатывания: аренда после запуска держится на период задачи минус этот допуск
+    SCHEDULER_HISTORY_DAYS = int(os.getenv('SCHEDULER_HISTORY_DAYS', '30'))  # Сколько дней хранить историю запусков задач
+    DOC_EXTRACT_WORKERS = int(os.getenv('DOC_EXTRACT_WORKERS', '2'))  # Процессов для извлечения текста из документов (PDF, DOCX, Excel)
+    DOC_EXTRACT_TIMEOUT_SECONDS = float(os.getenv('DOC_EXTRACT_TIMEOUT_SECONDS', '120'))  # Максимальное время разбора одного файла
+    DOC_EXTRACT_MEMORY_LIMIT_MB = int(os.getenv('DOC_EXTRACT_MEMORY_LIMIT_MB', '1536'))  # Лимит адресного пространства процесса разбора, МБ (0 - без лимита; не работает в Windows)
+    DOC_TEXT_CHAR_BUDGET = int(os.getenv('DOC_TEXT_CHAR_BUDGET', '20000'))  # Сколько символов текста документа извлекать, когда текст идет только в промпт и не сохраняется (поиск поставщиков по документу; разбор PDF останавливается на набравшей их странице; 0 - весь текст)
+    EXCEL_SCAN_CACHE_SIZE = int(os.getenv('EXCEL_SCAN_CACHE_SIZE', '32'))  # Сколько разобранных таблиц Excel хранить в памяти (кэш по хешу файла; 0 - без кэша)
+    CP_LLM_CONFIDENCE_THRESHOLD = float(os.getenv('CP_LLM_CONFIDENCE_THRESHOLD', '0.5'))  # Поля КП с уверенностью ниже порога (0..1) уточняются через LLM
+    CP_BATCH_CONCURRENCY = int(os.getenv('CP_BATCH_CONCURRENCY', '4'))  # Сколько КП пакета (альбом или ZIP) обрабатывать одновременно
+    CP_BATCH_MAX_FILES = int(os.getenv('CP_BATCH_MAX_FILES', '50'))  # Максимум файлов КП в одном пакете
+    CP_ZIP_MAX_UNPACKED_MB = int(os.getenv('CP_ZIP_MAX_UNPACKED_MB', '200'))  # Максимальный размер распакованных файлов ZIP-архива с КП, МБ
+    NOMENCLATURE_LLM_BATCH_SIZE = int(os.getenv('NOMENCLATURE_LLM_BATCH_SIZE', '20'))  # Лотов в одном запросе к LLM при классификации номенклатуры
+    LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '4'))  # Одновременных запросов к LLM на процесс
+    LLM_REQUESTS_PER_MINUTE = float(os.getenv('LLM_REQUESTS_PER_MINUTE', '45'))  # Ограничение частоты (лимит провайдера с запасом), 0 - без ограничения
+    LLM_BURST = int(os.getenv('LLM_BURST', '5'))  # Допустимый всплеск запросов сверх средней частоты
+    LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '3'))  # Повторов при 429/5xx и сетевых ошибках
+    ANALYSIS_CACHE_TTL_HOURS = int(os.getenv('ANALYSIS_CACHE_TTL_HOURS', '72'))  # Сколько часов анализ лота/документации считается актуальным
+    STREAM_EDIT_INTERVAL_SECONDS = float(os.getenv('STREAM_EDIT_INTERVAL_SECONDS', '1.5'))  # Как часто обновлять сообщение при потоковом выводе анализа (лимит Telegram ~1 правка/с на чат)
+    BOT_MODE = os.getenv('BOT_MODE', 'polling')  # polling - один процесс; webhook - webhook-сервер и процессы-обработчики
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # Публичный https-адрес webhook-сервера (без пути)
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram/webhook')
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')  # Секрет, который Telegram передает в заголовке X-Telegram-Bot-Api-Secret-Token (обязателен для BOT_MODE=webhook)
+    WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))  # Одновременных соединений Telegram к webhook
+    WEBHOOK_QUEUE_PREFIX = os.getenv('WEBHOOK_QUEUE_PREFIX', 'bot:updates')  # Префикс очередей апдейтов в Redis
+    BOT_WORKERS = int(os.getenv('BOT_WORKERS', '2'))  # Процессов-обработчиков (очередей апдейтов) в режиме webhook
+    BOT_WORKERS_EMBEDDED = os.getenv('BOT_WORKERS_EMBEDDED', 'true').lower() in ('1', 'true', 'yes')  # Запускать обработчики из webhook-сервера (false - запуск отдельно: python -m bot.worker N)
+    BOT_WORKER_CONCURRENCY = int(os.getenv('BOT_WORKER_CONCURRENCY', '50'))  # Апдейтов, обрабатываемых одним процессом одновременно
+    BOT_WORKER_MAX_PENDING = int(os.getenv('BOT_WORKER_MAX_PENDING', '1000'))  # Принятых из очереди, но еще не обработанных апдейтов на процесс
+    BOT_WORKER_CHAT_BACKLOG = int(os.getenv('BOT_WORKER_CHAT_BACKLOG', '20'))  # Необработанных апдейтов одного чата (сверх - отбрасываются как флуд)
+    BOT_WORKER_SHUTDOWN_TIMEOUT = float(os.getenv('BOT_WORKER_SHUTDOWN_TIMEOUT', '30'))  # Сколько секунд ждать начатые апдейты при остановке обработчика
+    FSM_STATE_TTL_HOURS = int(os.getenv('FSM_STATE_TTL_HOURS', '72'))  # Сколько часов хранить незавершенные состояния диалогов в Redis (0 - без ограничения)
+    FSM_COMPRESS_THRESHOLD_BYTES = int(os.getenv('FSM_COMPRESS_THRESHOLD_BYTES', '1024'))  # Сжимать данные состояния больше N байт (тексты документации, результаты поиска)
+    FSM_KEY_PREFIX = os.getenv('FSM_KEY_PREFIX', 'fsm')  # Префикс ключей FSM в Redis
+    USER_CACHE_TTL_SECONDS = float(os.getenv('USER_CACHE_TTL_SECONDS', '60'))  # Сколько секунд AuthMiddleware использует пользователя из кэша без запроса к БД (0 - без кэша)
+    LAST_SEEN_FLUSH_SECONDS = int(os.getenv('LAST_SEEN_FLUSH_SECONDS', '30'))  # Как часто записывать накопленные last_seen пользователей в БД
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))  # Постоянных соединений в пуле процесса
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '5'))  # Дополнительных соединений сверх пула при пиковой нагрузке
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))  # Сколько секунд ждать свободного соединения, прежде чем вернуть ошибку
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))  # Переоткрывать соединения старше N секунд (-1 - не переоткрывать)
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')  # Проверять соединение перед выдачей из пула (после рестарта Postgres)
+    DB_CONNECT_TIMEOUT = float(os.getenv('DB_CONNECT_TIMEOUT', '10'))  # Таймаут установки соединения с Postgres, секунд
+    DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', '100'))  # Кэш подготовленных выражений asyncpg на соединение (0 - при pgbouncer в режиме transaction)
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '30000'))  # statement_timeout на сервере для соединений бота (0 - без ограничения)
+    DB_APPLICATION_NAME = os.getenv('DB_APPLICATION_NAME', 'zakupki-bot')  # application_name соединений (видно в pg_stat_activity)
+    DB_LONG_HOLD_SECONDS = float(os.getenv('DB_LONG_HOLD_SECONDS', '5'))  # Предупреждать в логе, если соединение с БД удерживается дольше (обычно - сессия открыта во время запроса к LLM)
     ENCRYPTION_KEY = os.getenv('ENCRYPTION_KEY', '')  # Ключ для шифрования паролей (опционально)
 
 def get_notify_emails():
@@ -1,19 +1,27 @@
 """Database package - models, repositories, connections"""
 from database.connection import engine, async_session_maker, get_session, init_db
-from database.models import Base, User, UserPreference, Lot, Supplier, CommercialProposal
+from database.models import Base, User, UserPreference, Lot, Supplier, CommercialProposal, LotNomenclatureTag, LotAnalysis, SchedulerLease, ScheduledJobRun
 from database.repositories.user_repository import UserRepository
 from database.repositories.user_pref_repository import UserPreferenceRepository
 from database.repositories.lot_repository import LotRepository
 from database.repositories.supplier_repository import SupplierRepository
 from database.repositories.commercial_proposal_repository import CommercialProposalRepository
+from database.repositories.lot_analysis_repository import LotAnalysisRepository
+from database.repositories.scheduler_repository import SchedulerRepository
+from database.user_cache import user_cache, last_seen_writer
+from database.pool_monitor import pool_monitor
 
 __all__ = [
     "Base",
     "User",
     "UserPreference",
     "Lot",
+    "LotNomenclatureTag",
     "Supplier",
     "CommercialProposal",
+    "LotAnalysis",
+    "SchedulerLease",
+    "ScheduledJobRun",
     "engine",
     "async_session_maker",
     "get_session",
@@ -23,4 +31,9 @@ __all__ = [
     "LotRepository",
     "SupplierRepository",
     "CommercialProposalRepository",
+    "LotAnalysisRepository",
+    "SchedulerRepository",
+    "user_cache",
+    "last_seen_writer",
+    "pool_monitor",
 ]
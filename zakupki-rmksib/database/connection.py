@@ -1,4 +1,9 @@
+import time
+from collections import deque
+from typing import Any, Deque, Dict
+from sqlalchemy import event, exc
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from config.settings import settings
 
 # Формируем URL подключения к БД
@@ -24,11 +29,71 @@ else:
         # Fallback на SQLite по умолчанию
         database_url = "sqlite+aiosqlite:///procurement.db"
 
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, замеряющий ожидание соединения при checkout
+    (время до получения свободного соединения или открытия нового) и отказы по pool_timeout
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_times: Deque[float] = deque(maxlen=500)
+        self.waits = 0  # Checkout, ждавших дольше 10 мс
+        self.timeouts = 0  # Отказов "QueuePool limit ... reached"
+
+    def _do_get(self):
+        started = time.monotonic()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.monotonic() - started
+            self.wait_times.append(waited)
+            if waited > 0.01:
+                self.waits += 1
+
+
+def build_engine_kwargs(url: str) -> Dict[str, Any]:
+    """
+    Параметры create_async_engine из настроек DB_*
+
+    Бот, планировщик и админ-панель работают с одной базой: суммарно
+    (DB_POOL_SIZE + DB_MAX_OVERFLOW) на процесс плюс соединения Django не должны превышать max_connections Postgres.
+    """
+    kwargs: Dict[str, Any] = {
+        "echo": False,
+        "poolclass": MeteredQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if url.startswith("postgresql+asyncpg://"):
+        server_settings = {"application_name": settings.DB_APPLICATION_NAME}
+        if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+            server_settings["statement_timeout"] = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        kwargs["connect_args"] = {
+            # Кэш подготовленных выражений на соединение (0 - для pgbouncer в режиме transaction)
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "server_settings": server_settings,
+            "timeout": settings.DB_CONNECT_TIMEOUT,
+        }
+    return kwargs
+
+
 # Создаём async engine
-engine = create_async_engine(
-    database_url,
-    echo=False
-)
+engine = create_async_engine(database_url, **build_engine_kwargs(database_url))
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine.sync_engine, "connect")
+    def _register_sqlite_functions(dbapi_connection, connection_record):
+        # Встроенная lower() SQLite меняет регистр только латиницы: без замены поиск
+        # по названию без учета регистра (func.lower) не находит кириллицу
+        dbapi_connection.create_function("lower", 1, lambda value: value.lower() if value is not None else None, deterministic=True)
 
 # Создаём фабрику async сессий
 async_session_maker = async_sessionmaker(
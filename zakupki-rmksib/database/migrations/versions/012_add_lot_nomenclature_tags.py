@@ -0,0 +1,39 @@
+"""add_lot_nomenclature_tags
+
+Revision ID: 012
+Revises: 010
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '012'
+down_revision: Union[str, None] = '010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Отметка о том, что лот размечен номенклатурными группами при загрузке
+    op.add_column('lots', sa.Column('nomenclature_classified_at', sa.DateTime(), nullable=True))
+
+    # Номенклатурные группы лота (результат классификации при загрузке)
+    op.create_table(
+        'lot_nomenclature_tags',
+        sa.Column('lot_id', sa.Integer(), nullable=False),
+        sa.Column('group_name', sa.String(length=255), nullable=False),
+        sa.ForeignKeyConstraint(['lot_id'], ['lots.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('lot_id', 'group_name')
+    )
+    op.create_index('ix_lot_nomenclature_tags_group_name', 'lot_nomenclature_tags', ['group_name'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_lot_nomenclature_tags_group_name', table_name='lot_nomenclature_tags')
+    op.drop_table('lot_nomenclature_tags')
+    op.drop_column('lots', 'nomenclature_classified_at')
@@ -0,0 +1,43 @@
+"""add_lot_analyses_table
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '013'
+down_revision: Union[str, None] = '012'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Кэш анализов лотов и документации (ключ - хэш отрисованного промпта)
+    op.create_table(
+        'lot_analyses',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('cache_key', sa.String(length=64), nullable=False),
+        sa.Column('lot_id', sa.Integer(), nullable=True),
+        sa.Column('kind', sa.String(length=32), nullable=False),
+        sa.Column('model', sa.String(length=64), nullable=False),
+        sa.Column('result', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['lot_id'], ['lots.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('cache_key')
+    )
+    op.create_index('ix_lot_analyses_lot_id', 'lot_analyses', ['lot_id'])
+    op.create_index('ix_lot_analyses_created_at', 'lot_analyses', ['created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_lot_analyses_created_at', table_name='lot_analyses')
+    op.drop_index('ix_lot_analyses_lot_id', table_name='lot_analyses')
+    op.drop_table('lot_analyses')
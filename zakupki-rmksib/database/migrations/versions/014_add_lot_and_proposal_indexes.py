@@ -0,0 +1,54 @@
+"""add_lot_and_proposal_indexes
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '014'
+down_revision: Union[str, None] = '013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Лоты: фильтр по дедлайну (актуальные/истекшие) и поиск по статусу просмотра.
+    # Заказчик в поиске сравнивается по вхождению подстроки, поэтому индекс по customer не используется
+    op.create_index('ix_lots_deadline', 'lots', ['deadline'])
+    op.create_index('ix_lots_review_status_deadline', 'lots', ['review_status', 'deadline'])
+    op.create_index('ix_lots_created_at', 'lots', ['created_at'])
+    # Частичный индекс: только лоты, еще не размеченные номенклатурными группами
+    op.create_index(
+        'ix_lots_unclassified', 'lots', ['id'],
+        postgresql_where=sa.text('nomenclature_classified_at IS NULL'),
+        sqlite_where=sa.text('nomenclature_classified_at IS NULL')
+    )
+
+    # КП: списки пользователя и лота, новые первыми
+    op.create_index('ix_commercial_proposals_created_by_created_at', 'commercial_proposals', ['created_by', 'created_at'])
+    op.create_index('ix_commercial_proposals_lot_id_created_at', 'commercial_proposals', ['lot_id', 'created_at'])
+    op.create_index('ix_commercial_proposals_created_at', 'commercial_proposals', ['created_at'])
+    # Частичный индекс: только непроанализированные КП
+    op.create_index(
+        'ix_commercial_proposals_unanalyzed', 'commercial_proposals', ['created_at'],
+        postgresql_where=sa.text('supplier_rating IS NULL'),
+        sqlite_where=sa.text('supplier_rating IS NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_commercial_proposals_unanalyzed', table_name='commercial_proposals')
+    op.drop_index('ix_commercial_proposals_created_at', table_name='commercial_proposals')
+    op.drop_index('ix_commercial_proposals_lot_id_created_at', table_name='commercial_proposals')
+    op.drop_index('ix_commercial_proposals_created_by_created_at', table_name='commercial_proposals')
+    op.drop_index('ix_lots_unclassified', table_name='lots')
+    op.drop_index('ix_lots_created_at', table_name='lots')
+    op.drop_index('ix_lots_review_status_deadline', table_name='lots')
+    op.drop_index('ix_lots_deadline', table_name='lots')
@@ -0,0 +1,49 @@
+"""add_scheduler_tables
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '015'
+down_revision: Union[str, None] = '014'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Аренды фоновых задач (одна задача - один исполнитель среди экземпляров планировщика)
+    op.create_table(
+        'scheduler_leases',
+        sa.Column('job_id', sa.String(length=64), nullable=False),
+        sa.Column('holder', sa.String(length=128), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('job_id')
+    )
+    # История запусков фоновых задач
+    op.create_table(
+        'scheduled_job_runs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('job_id', sa.String(length=64), nullable=False),
+        sa.Column('holder', sa.String(length=128), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('duration_seconds', sa.Float(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_scheduled_job_runs_job_id_started_at', 'scheduled_job_runs', ['job_id', 'started_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_scheduled_job_runs_job_id_started_at', table_name='scheduled_job_runs')
+    op.drop_table('scheduled_job_runs')
+    op.drop_table('scheduler_leases')
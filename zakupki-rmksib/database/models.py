@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, String, Boolean, Float, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Integer, String, Boolean, Float, Text, DateTime, ForeignKey, JSON, Index, text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from datetime import datetime
 from typing import Optional
@@ -37,6 +37,21 @@ class UserPreference(Base):
 
 class Lot(Base):
     __tablename__ = "lots"
+    __table_args__ = (
+        # Актуальные/истекшие лоты (get_all, count_active, search, get_expired_lots, delete_expired_lots)
+        Index("ix_lots_deadline", "deadline"),
+        # Фильтр search по статусу просмотра среди актуальных лотов
+        # (заказчик ищется по вхождению подстроки - B-tree индекс по customer тут не помогает)
+        Index("ix_lots_review_status_deadline", "review_status", "deadline"),
+        Index("ix_lots_created_at", "created_at"),
+        # Лоты без номенклатурной разметки (get_unclassified)
+        Index(
+            "ix_lots_unclassified",
+            "id",
+            postgresql_where=text("nomenclature_classified_at IS NULL"),
+            sqlite_where=text("nomenclature_classified_at IS NULL"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     platform_name: Mapped[str] = mapped_column(String(100))
@@ -57,6 +72,14 @@ class Lot(Base):
     documentation_analyzed: Mapped[bool] = mapped_column(Boolean, default=False)  # Флаг анализа документации
     source: Mapped[str | None] = mapped_column(String(50), nullable=True)  # Источник: 'parser', 'email', 'manual'
     url: Mapped[str | None] = mapped_column(String(500), nullable=True)  # URL страницы лота на площадке закупок
+    nomenclature_classified_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)  # Когда лот размечен номенклатурными группами (NULL - еще не размечен)
+
+
+class LotNomenclatureTag(Base):
+    __tablename__ = "lot_nomenclature_tags"
+
+    lot_id: Mapped[int] = mapped_column(Integer, ForeignKey("lots.id", ondelete="CASCADE"), primary_key=True)
+    group_name: Mapped[str] = mapped_column(String(255), primary_key=True, index=True)  # Название группы из NOMENCLATURE_CATALOG
 
 class Supplier(Base):
     __tablename__ = "suppliers"
@@ -72,6 +95,19 @@ class Supplier(Base):
 
 class CommercialProposal(Base):
     __tablename__ = "commercial_proposals"
+    __table_args__ = (
+        # Списки КП пользователя и лота, новые первыми (get_all, get_by_lot_id)
+        Index("ix_commercial_proposals_created_by_created_at", "created_by", "created_at"),
+        Index("ix_commercial_proposals_lot_id_created_at", "lot_id", "created_at"),
+        Index("ix_commercial_proposals_created_at", "created_at"),
+        # Непроанализированные КП (get_unanalyzed)
+        Index(
+            "ix_commercial_proposals_unanalyzed",
+            "created_at",
+            postgresql_where=text("supplier_rating IS NULL"),
+            sqlite_where=text("supplier_rating IS NULL"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     lot_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("lots.id"), nullable=True)  # Привязка к лоту (опционально)
@@ -89,3 +125,41 @@ class CommercialProposal(Base):
     created_by: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"))  # Кто создал КП
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     analyzed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)  # Когда был проведен анализ
+
+
+class LotAnalysis(Base):
+    __tablename__ = "lot_analyses"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    cache_key: Mapped[str] = mapped_column(String(64), unique=True)  # SHA-256 от отрисованного промпта, модели и версии промпта
+    lot_id: Mapped[int | None] = mapped_column(ForeignKey("lots.id", ondelete="CASCADE"), nullable=True, index=True)  # None - анализ без сохраненного лота
+    kind: Mapped[str] = mapped_column(String(32))  # "lot" - анализ по данным лота, "documentation" - анализ документации
+    model: Mapped[str] = mapped_column(String(64))
+    result: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+
+class SchedulerLease(Base):
+    """Аренда фоновой задачи: задачу выполняет только экземпляр планировщика, удерживающий аренду"""
+    __tablename__ = "scheduler_leases"
+
+    job_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    holder: Mapped[str] = mapped_column(String(128))  # Экземпляр планировщика (хост:pid)
+    expires_at: Mapped[datetime] = mapped_column(DateTime)  # До какого времени аренда действительна (UTC)
+
+
+class ScheduledJobRun(Base):
+    """История запусков фоновых задач"""
+    __tablename__ = "scheduled_job_runs"
+    __table_args__ = (
+        Index("ix_scheduled_job_runs_job_id_started_at", "job_id", "started_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    job_id: Mapped[str] = mapped_column(String(64))
+    holder: Mapped[str] = mapped_column(String(128))
+    status: Mapped[str] = mapped_column(String(16))  # running, success, failed, missed
+    started_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    duration_seconds: Mapped[float | None] = mapped_column(Float, nullable=True)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
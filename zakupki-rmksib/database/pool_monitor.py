@@ -0,0 +1,124 @@
+"""Учет соединений пула БД: сколько соединений и как долго держит каждый апдейт Telegram"""
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterator, Optional
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from config.settings import settings
+from database.connection import engine
+
+
+@dataclass
+class UpdateConnections:
+    """Соединения, взятые из пула при обработке одного апдейта"""
+    label: str
+    held: int = 0  # Удерживается сейчас
+    peak: int = 0  # Максимум одновременно
+    checkouts: int = 0  # Сколько раз соединение бралось из пула
+    held_seconds: float = 0.0  # Суммарное время удержания
+    longest_hold: float = 0.0  # Самое долгое удержание одного соединения
+
+
+_current_update: ContextVar[Optional[UpdateConnections]] = ContextVar("current_update_connections", default=None)
+
+
+class PoolMonitor:
+    """
+    Слушает события checkout/checkin пула и относит соединения к текущему апдейту (через contextvars),
+    чтобы было видно, какие обработчики держат несколько соединений или держат соединение долго
+    """
+
+    def __init__(self, engine: AsyncEngine, long_hold_seconds: float):
+        self.engine = engine
+        self.long_hold_seconds = long_hold_seconds
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.updates = 0
+        self.updates_with_connections = 0
+        self.multi_connection_updates = 0
+        self.long_holds = 0
+        self._update_peaks: Deque[int] = deque(maxlen=500)
+        event.listen(engine.sync_engine, "checkout", self._on_checkout)
+        event.listen(engine.sync_engine, "checkin", self._on_checkin)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        self.checked_out += 1
+        self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+        stats = _current_update.get()
+        connection_record.info["monitor_checkout"] = (time.monotonic(), stats)
+        if stats is not None:
+            stats.held += 1
+            stats.checkouts += 1
+            stats.peak = max(stats.peak, stats.held)
+
+    def _on_checkin(self, dbapi_connection, connection_record) -> None:
+        checkout = connection_record.info.pop("monitor_checkout", None)
+        if checkout is None:
+            return
+        self.checked_out -= 1
+        started, stats = checkout
+        held_for = time.monotonic() - started
+        if held_for >= self.long_hold_seconds:
+            self.long_holds += 1
+            logger.warning(
+                f"DB connection held for {held_for:.1f}s"
+                + (f" by {stats.label}" if stats is not None else "")
+                + " - release the session before long awaits (LLM, HTTP, email)"
+            )
+        if stats is not None:
+            stats.held -= 1
+            stats.held_seconds += held_for
+            stats.longest_hold = max(stats.longest_hold, held_for)
+
+    @contextmanager
+    def track_update(self, label: str) -> Iterator[UpdateConnections]:
+        """Учитывать соединения, взятые внутри блока (включая созданные в нем задачи), как соединения апдейта"""
+        stats = UpdateConnections(label=label)
+        token = _current_update.set(stats)
+        try:
+            yield stats
+        finally:
+            _current_update.reset(token)
+            self.updates += 1
+            self._update_peaks.append(stats.peak)
+            if stats.checkouts:
+                self.updates_with_connections += 1
+            if stats.peak > 1:
+                self.multi_connection_updates += 1
+                logger.warning(f"{label} held {stats.peak} DB connections at once ({stats.checkouts} checkouts)")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Состояние пула, ожидание соединений (по последним 500 checkout) и статистика по апдейтам (по последним 500 апдейтам)"""
+        pool = self.engine.sync_engine.pool
+        size = pool.size() if hasattr(pool, "size") else None
+        overflow = getattr(pool, "_max_overflow", 0)
+        peaks = list(self._update_peaks)
+        waits = sorted(getattr(pool, "wait_times", ()))
+        return {
+            "pool_class": type(pool).__name__,
+            "pool_size": size,
+            "max_overflow": overflow,
+            "pool_capacity": size + max(overflow, 0) if size is not None else None,
+            "pool_timeout": getattr(pool, "_timeout", None),
+            "overflow_in_use": max(pool.overflow(), 0) if hasattr(pool, "overflow") else 0,
+            "idle": pool.checkedin() if hasattr(pool, "checkedin") else None,
+            "checkout_waits": getattr(pool, "waits", 0),
+            "checkout_timeouts": getattr(pool, "timeouts", 0),
+            "wait_avg_ms": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+            "wait_p95_ms": round(waits[max(0, int(len(waits) * 0.95) - 1)] * 1000, 1) if waits else 0.0,
+            "wait_max_ms": round(waits[-1] * 1000, 1) if waits else 0.0,
+            "checked_out": self.checked_out,
+            "peak_checked_out": self.peak_checked_out,
+            "updates": self.updates,
+            "updates_with_connections": self.updates_with_connections,
+            "multi_connection_updates": self.multi_connection_updates,
+            "long_holds": self.long_holds,
+            "max_connections_per_update": max(peaks) if peaks else 0,
+        }
+
+
+pool_monitor = PoolMonitor(engine, long_hold_seconds=settings.DB_LONG_HOLD_SECONDS)
@@ -57,6 +57,11 @@ class CommercialProposalRepository:
         await self.session.refresh(proposal)
         return proposal
 
+    async def update_many(self, proposals: List[CommercialProposal]) -> None:
+        """Обновить несколько КП одной транзакцией"""
+        self.session.add_all(proposals)
+        await self.session.commit()
+
     async def delete(self, proposal: CommercialProposal) -> None:
         """Удалить КП"""
         await self.session.delete(proposal)
@@ -0,0 +1,50 @@
+"""Репозиторий для кэша анализов лотов и документации"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete
+from typing import Optional
+from datetime import datetime, timedelta
+from database.models import LotAnalysis
+
+
+class LotAnalysisRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_fresh(self, cache_key: str, max_age_hours: int) -> Optional[LotAnalysis]:
+        """Получить анализ по ключу кэша, если он не старше max_age_hours"""
+        result = await self.session.execute(
+            select(LotAnalysis)
+            .where(LotAnalysis.cache_key == cache_key)
+            .where(LotAnalysis.created_at > datetime.utcnow() - timedelta(hours=max_age_hours))
+        )
+        return result.scalar_one_or_none()
+
+    async def save(self, cache_key: str, lot_id: Optional[int], kind: str, model: str, result: str) -> LotAnalysis:
+        """Сохранить анализ (перезаписывает устаревшую запись с тем же ключом)"""
+        existing = await self.session.execute(
+            select(LotAnalysis).where(LotAnalysis.cache_key == cache_key)
+        )
+        entry = existing.scalar_one_or_none()
+        if entry is None:
+            entry = LotAnalysis(cache_key=cache_key)
+            self.session.add(entry)
+        entry.lot_id = lot_id
+        entry.kind = kind
+        entry.model = model
+        entry.result = result
+        entry.created_at = datetime.utcnow()
+        await self.session.commit()
+        return entry
+
+    async def purge_older_than(self, max_age_hours: int) -> int:
+        """
+        Удалить анализы старше max_age_hours
+
+        Returns:
+            Количество удаленных записей
+        """
+        result = await self.session.execute(
+            delete(LotAnalysis).where(LotAnalysis.created_at <= datetime.utcnow() - timedelta(hours=max_age_hours))
+        )
+        await self.session.commit()
+        return result.rowcount or 0
@@ -1,9 +1,16 @@
 """Репозиторий для работы с лотами"""
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List, Optional
+from sqlalchemy import select, delete, update, func, or_, and_, exists, literal
+from typing import Dict, List, Optional, Set, Tuple
 from datetime import datetime, timedelta
-from database.models import Lot
+from database.models import Lot, LotNomenclatureTag, LotAnalysis, CommercialProposal
+
+
+def _like_escaped(expression):
+    """Значение столбца как литерал для LIKE: %, _ и \\ экранируются (аналог autoescape для строк)"""
+    for char in ("\\", "%", "_"):
+        expression = func.replace(expression, char, "\\" + char)
+    return expression
 
 
 class LotRepository:
@@ -18,6 +25,79 @@ class LotRepository:
         await self.session.refresh(lot)
         return lot
 
+    async def create_many(self, lots_data: List[Dict]) -> List[Lot]:
+        """Создать несколько лотов одной транзакцией"""
+        lots = [Lot(**data) for data in lots_data]
+        if not lots:
+            return lots
+        self.session.add_all(lots)
+        await self.session.commit()
+        return lots
+
+    async def bulk_upsert(self, lots_data: List[Dict], chunk_size: int = 500) -> List[Lot]:
+        """
+        Вставить лоты, пропуская уже существующие (по lot_number)
+        
+        На PostgreSQL и SQLite - один INSERT ... ON CONFLICT (lot_number) DO NOTHING RETURNING
+        на пачку из chunk_size лотов, на остальных СУБД - запрос существующих номеров и вставка.
+        
+        Args:
+            lots_data: Поля лотов (набор ключей у всех лотов одинаковый)
+            chunk_size: Лотов в одном INSERT (ограничение на число параметров запроса)
+        
+        Returns:
+            Только вставленные лоты (порядок не гарантируется)
+        """
+        # Дубликаты внутри пачки: остается первое вхождение
+        unique: Dict[str, Dict] = {}
+        for data in lots_data:
+            unique.setdefault(data["lot_number"], data)
+        rows = list(unique.values())
+        if not rows:
+            return []
+        
+        dialect = self.session.bind.dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            existing = await self.get_existing_lot_numbers(list(unique))
+            return await self.create_many([data for data in rows if data["lot_number"] not in existing])
+        
+        created: List[Lot] = []
+        for start in range(0, len(rows), chunk_size):
+            stmt = (
+                dialect_insert(Lot)
+                .values(rows[start:start + chunk_size])
+                .on_conflict_do_nothing(index_elements=[Lot.lot_number])
+                .returning(Lot)
+            )
+            result = await self.session.scalars(stmt)
+            created.extend(result.all())
+        await self.session.commit()
+        return created
+
+    async def get_existing_lot_numbers(self, lot_numbers: List[str]) -> Set[str]:
+        """Получить номера лотов, которые уже есть в БД, одним запросом"""
+        if not lot_numbers:
+            return set()
+        result = await self.session.execute(select(Lot.lot_number).where(Lot.lot_number.in_(lot_numbers)))
+        return set(result.scalars().all())
+
+    async def set_documentation(self, lot_id: int, documentation_path: str, documentation_text: Optional[str]) -> None:
+        """Сохранить путь к документации лота и извлеченный текст"""
+        await self.session.execute(
+            update(Lot)
+            .where(Lot.id == lot_id)
+            .values(
+                documentation_path=documentation_path,
+                documentation_text=documentation_text,
+                documentation_analyzed=False,
+            )
+        )
+        await self.session.commit()
+
     async def get_by_id(self, lot_id: int) -> Optional[Lot]:
         """Получить лот по ID"""
         result = await self.session.execute(select(Lot).where(Lot.id == lot_id))
@@ -49,6 +129,99 @@ class LotRepository:
         result = await self.session.execute(query)
         return list(result.scalars().all())
 
+    async def count_active(self) -> int:
+        """Количество лотов с непрошедшим дедлайном"""
+        result = await self.session.execute(
+            select(func.count(Lot.id)).where(Lot.deadline >= datetime.utcnow())
+        )
+        return result.scalar_one()
+
+    async def search(
+        self,
+        customers: Optional[List[str]] = None,
+        nomenclature_tags: Optional[List[str]] = None,
+        budget_min: Optional[int] = None,
+        budget_max: Optional[int] = None,
+        review_status: Optional[str] = None,
+        page: int = 1,
+        page_size: int = 10,
+        fallback_keywords: Optional[List[str]] = None,
+    ) -> Tuple[List[Lot], int]:
+        """
+        Поиск актуальных лотов с фильтрацией и пагинацией на стороне БД (новые первыми)
+        
+        Args:
+            customers: Заказчики (точное совпадение или вхождение названия в любую сторону)
+            nomenclature_tags: Номенклатурные группы - лот проходит, если размечен хотя бы одной из них
+            budget_min: Минимальный бюджет (лоты без бюджета считаются с бюджетом 0)
+            budget_max: Максимальный бюджет
+            review_status: Статус просмотра ("not_viewed" включает лоты без статуса)
+            page: Номер страницы (с 1)
+            page_size: Размер страницы
+            fallback_keywords: Ключевые слова для лотов, еще не размеченных номенклатурой
+                              (ищутся в названии лота без учета регистра)
+        
+        Returns:
+            Кортеж (лоты страницы, общее количество подходящих лотов)
+        """
+        conditions = [Lot.deadline >= datetime.utcnow()]
+        
+        if customers:
+            conditions.append(or_(
+                Lot.customer.in_(customers),
+                *[Lot.customer.contains(customer, autoescape=True) for customer in customers],
+                # Название заказчика лота - часть названия из настроек (шаблон LIKE строится из значения столбца)
+                *[
+                    and_(
+                        Lot.customer != "",
+                        literal(customer).like(literal("%").concat(_like_escaped(Lot.customer)).concat("%"), escape="\\"),
+                    )
+                    for customer in customers
+                ],
+            ))
+        
+        if nomenclature_tags:
+            tagged = exists().where(
+                LotNomenclatureTag.lot_id == Lot.id,
+                LotNomenclatureTag.group_name.in_(nomenclature_tags),
+            )
+            if fallback_keywords:
+                title_lower = func.lower(Lot.title)
+                untagged = and_(
+                    Lot.nomenclature_classified_at.is_(None),
+                    or_(*[title_lower.contains(keyword.lower(), autoescape=True) for keyword in fallback_keywords]),
+                )
+                conditions.append(or_(tagged, untagged))
+            else:
+                conditions.append(tagged)
+        
+        if budget_min is not None:
+            conditions.append(func.coalesce(Lot.budget, 0) >= budget_min)
+        if budget_max is not None:
+            conditions.append(func.coalesce(Lot.budget, 0) <= budget_max)
+        
+        if review_status == "not_viewed":
+            conditions.append(or_(Lot.review_status == review_status, Lot.review_status.is_(None)))
+        elif review_status:
+            conditions.append(Lot.review_status == review_status)
+        
+        page = max(1, page)
+        # Общее количество считается оконной функцией в том же запросе, что и страница
+        result = await self.session.execute(
+            select(Lot, func.count().over().label("total"))
+            .where(*conditions)
+            .order_by(Lot.id.desc())
+            .offset((page - 1) * page_size)
+            .limit(page_size)
+        )
+        rows = result.all()
+        if rows:
+            return [row[0] for row in rows], rows[0][1]
+        
+        # Пустая страница (например, номер страницы за пределами списка) - считаем отдельно
+        total_result = await self.session.execute(select(func.count(Lot.id)).where(*conditions))
+        return [], total_result.scalar_one()
+
     async def update(self, lot: Lot) -> Lot:
         """Обновить лот"""
         self.session.add(lot)
@@ -58,8 +231,57 @@ class LotRepository:
 
     async def delete(self, lot: Lot) -> None:
         """Удалить лот"""
+        await self.session.execute(delete(LotNomenclatureTag).where(LotNomenclatureTag.lot_id == lot.id))
+        await self.session.execute(delete(LotAnalysis).where(LotAnalysis.lot_id == lot.id))
         await self.session.delete(lot)
         await self.session.commit()
+
+    async def get_unclassified(self, limit: int = 200) -> List[Lot]:
+        """Получить актуальные лоты, еще не размеченные номенклатурными группами (новые первыми)"""
+        result = await self.session.execute(
+            select(Lot)
+            .where(Lot.nomenclature_classified_at.is_(None))
+            .where(Lot.deadline >= datetime.utcnow())
+            .order_by(Lot.id.desc())
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+
+    async def get_nomenclature_tags(self, lot_ids: List[int]) -> Dict[int, Set[str]]:
+        """Получить номенклатурные группы для списка лотов одним запросом"""
+        tags: Dict[int, Set[str]] = {}
+        if not lot_ids:
+            return tags
+        result = await self.session.execute(
+            select(LotNomenclatureTag.lot_id, LotNomenclatureTag.group_name)
+            .where(LotNomenclatureTag.lot_id.in_(lot_ids))
+        )
+        for lot_id, group_name in result.all():
+            tags.setdefault(lot_id, set()).add(group_name)
+        return tags
+
+    async def save_nomenclature_tags(self, tags_by_lot_id: Dict[int, List[str]]) -> None:
+        """
+        Сохранить номенклатурные группы лотов и отметить лоты как размеченные
+        
+        Args:
+            tags_by_lot_id: Словарь {id лота: список групп}. Прежняя разметка этих лотов заменяется.
+        """
+        if not tags_by_lot_id:
+            return
+        lot_ids = list(tags_by_lot_id.keys())
+        await self.session.execute(delete(LotNomenclatureTag).where(LotNomenclatureTag.lot_id.in_(lot_ids)))
+        self.session.add_all([
+            LotNomenclatureTag(lot_id=lot_id, group_name=group_name)
+            for lot_id, groups in tags_by_lot_id.items()
+            for group_name in sorted(set(groups))
+        ])
+        await self.session.execute(
+            update(Lot)
+            .where(Lot.id.in_(lot_ids))
+            .values(nomenclature_classified_at=datetime.utcnow())
+        )
+        await self.session.commit()
     
     async def get_expired_lots(self, days_before_expiry: int = 0) -> List[Lot]:
         """
@@ -82,24 +304,72 @@ class LotRepository:
         result = await self.session.execute(query)
         return list(result.scalars().all())
     
-    async def delete_expired_lots(self, days_before_expiry: int = 0) -> int:
+    async def delete_expired_lots(self, days_before_expiry: int = 0, chunk_size: int = 1000) -> Tuple[Dict[str, int], List[str]]:
         """
-        Удалить лоты с прошедшим дедлайном
+        Удалить лоты с прошедшим дедлайном вместе с зависимыми записями (разметка номенклатуры,
+        кэш анализов, коммерческие предложения) без загрузки объектов в память
+        
+        Удаление идет пачками по диапазону id (до chunk_size лотов, отдельная транзакция на пачку),
+        чтобы не держать длинную блокировку при большом числе истекших лотов.
         
         Args:
             days_before_expiry: По умолчанию 0 - удаляет только лоты с уже прошедшим дедлайном (deadline < now).
                               Если > 0, то удаляет лоты, у которых дедлайн прошел более X дней назад.
+            chunk_size: Максимум лотов в одной пачке
         
         Returns:
-            Количество удаленных лотов
+            Кортеж (количество удаленных записей по типам: lots, commercial_proposals;
+            пути к файлам документации и КП удаленных лотов - удаляет вызывающий код)
         """
-        expired_lots = await self.get_expired_lots(days_before_expiry)
-        count = len(expired_lots)
+        expiry_date = datetime.utcnow() - timedelta(days=days_before_expiry)
+        counts = {"lots": 0, "commercial_proposals": 0}
+        file_paths: List[str] = []
+        last_id = 0
         
-        for lot in expired_lots:
-            await self.delete(lot)
+        while True:
+            # Границы очередной пачки: только id и пути к файлам, без загрузки лотов
+            result = await self.session.execute(
+                select(Lot.id, Lot.documentation_path)
+                .where(Lot.deadline < expiry_date)
+                .where(Lot.id > last_id)
+                .order_by(Lot.id)
+                .limit(chunk_size)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            first_id, last_id = rows[0][0], rows[-1][0]
+            file_paths.extend(path for _, path in rows if path)
+            
+            chunk_ids = (
+                select(Lot.id)
+                .where(Lot.id.between(first_id, last_id))
+                .where(Lot.deadline < expiry_date)
+                .scalar_subquery()
+            )
+            result = await self.session.execute(
+                select(CommercialProposal.proposal_file_path)
+                .where(CommercialProposal.lot_id.in_(chunk_ids))
+                .where(CommercialProposal.proposal_file_path.is_not(None))
+            )
+            file_paths.extend(result.scalars().all())
+            
+            result = await self.session.execute(delete(CommercialProposal).where(CommercialProposal.lot_id.in_(chunk_ids)))
+            counts["commercial_proposals"] += result.rowcount or 0
+            await self.session.execute(delete(LotNomenclatureTag).where(LotNomenclatureTag.lot_id.in_(chunk_ids)))
+            await self.session.execute(delete(LotAnalysis).where(LotAnalysis.lot_id.in_(chunk_ids)))
+            result = await self.session.execute(
+                delete(Lot)
+                .where(Lot.id.between(first_id, last_id))
+                .where(Lot.deadline < expiry_date)
+            )
+            counts["lots"] += result.rowcount or 0
+            await self.session.commit()
+            
+            if len(rows) < chunk_size:
+                break
         
-        return count
+        return counts, file_paths
 
 
 
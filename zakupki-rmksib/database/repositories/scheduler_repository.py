@@ -0,0 +1,124 @@
+"""Репозиторий аренд и истории запусков фоновых задач"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete, func, or_, case
+from sqlalchemy.exc import IntegrityError
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta
+from database.models import SchedulerLease, ScheduledJobRun
+
+
+class SchedulerRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def acquire_lease(self, job_id: str, holder: str, ttl_seconds: float) -> bool:
+        """
+        Взять аренду задачи на ttl_seconds, если она свободна (истекла) или уже принадлежит holder
+
+        Returns:
+            True, если аренда получена
+        """
+        now = datetime.utcnow()
+        result = await self.session.execute(
+            update(SchedulerLease)
+            .where(SchedulerLease.job_id == job_id)
+            .where(or_(SchedulerLease.expires_at < now, SchedulerLease.holder == holder))
+            .values(holder=holder, expires_at=now + timedelta(seconds=ttl_seconds))
+        )
+        if result.rowcount:
+            await self.session.commit()
+            return True
+
+        # Первый запуск задачи: записи аренды еще нет (при гонке вставку выполнит только один экземпляр)
+        self.session.add(SchedulerLease(job_id=job_id, holder=holder, expires_at=now + timedelta(seconds=ttl_seconds)))
+        try:
+            await self.session.commit()
+        except IntegrityError:
+            await self.session.rollback()
+            return False
+        return True
+
+    async def renew_lease(self, job_id: str, holder: str, ttl_seconds: float) -> bool:
+        """Продлить аренду; False - аренда уже у другого экземпляра"""
+        result = await self.session.execute(
+            update(SchedulerLease)
+            .where(SchedulerLease.job_id == job_id, SchedulerLease.holder == holder)
+            .values(expires_at=datetime.utcnow() + timedelta(seconds=ttl_seconds))
+        )
+        await self.session.commit()
+        return bool(result.rowcount)
+
+    async def release_lease(self, job_id: str, holder: str, hold_until: Optional[datetime] = None) -> None:
+        """
+        Освободить аренду в момент hold_until (чтобы другой экземпляр, у которого запуск того же
+        периода сработал позже, не выполнил задачу повторно); без hold_until - сразу
+        """
+        now = datetime.utcnow()
+        await self.session.execute(
+            update(SchedulerLease)
+            .where(SchedulerLease.job_id == job_id, SchedulerLease.holder == holder)
+            .values(expires_at=max(hold_until or now, now))
+        )
+        await self.session.commit()
+
+    async def start_run(self, job_id: str, holder: str, status: str = "running") -> ScheduledJobRun:
+        """Записать начало запуска задачи"""
+        run = ScheduledJobRun(job_id=job_id, holder=holder, status=status, started_at=datetime.utcnow())
+        self.session.add(run)
+        await self.session.commit()
+        return run
+
+    async def finish_run(self, run_id: int, status: str, error: Optional[str] = None) -> None:
+        """Записать завершение запуска и его длительность"""
+        run = await self.session.get(ScheduledJobRun, run_id)
+        if run is None:
+            return
+        run.finished_at = datetime.utcnow()
+        run.duration_seconds = (run.finished_at - run.started_at).total_seconds()
+        run.status = status
+        run.error = error[:2000] if error else None
+        await self.session.commit()
+
+    async def get_job_stats(self, since: datetime) -> List[Dict[str, Any]]:
+        """Статистика запусков по задачам с момента since: число запусков, ошибки, длительность, последний запуск"""
+        result = await self.session.execute(
+            select(
+                ScheduledJobRun.job_id,
+                func.count(ScheduledJobRun.id),
+                func.sum(case((ScheduledJobRun.status == "failed", 1), else_=0)),
+                func.sum(case((ScheduledJobRun.status == "missed", 1), else_=0)),
+                func.avg(ScheduledJobRun.duration_seconds),
+                func.max(ScheduledJobRun.duration_seconds),
+                func.max(ScheduledJobRun.started_at),
+            )
+            .where(ScheduledJobRun.started_at >= since)
+            .group_by(ScheduledJobRun.job_id)
+            .order_by(ScheduledJobRun.job_id)
+        )
+        stats = []
+        for job_id, runs, failed, missed, avg_duration, max_duration, last_started in result.all():
+            last = await self.session.execute(
+                select(ScheduledJobRun)
+                .where(ScheduledJobRun.job_id == job_id)
+                .order_by(ScheduledJobRun.started_at.desc())
+                .limit(1)
+            )
+            stats.append({
+                "job_id": job_id,
+                "runs": runs,
+                "failed": int(failed or 0),
+                "missed": int(missed or 0),
+                "avg_duration": avg_duration,
+                "max_duration": max_duration,
+                "last_started_at": last_started,
+                "last_status": last.scalar_one().status,
+            })
+        return stats
+
+    async def purge_runs_older_than(self, days: int) -> int:
+        """Удалить историю запусков старше days дней"""
+        result = await self.session.execute(
+            delete(ScheduledJobRun).where(ScheduledJobRun.started_at < datetime.utcnow() - timedelta(days=days))
+        )
+        await self.session.commit()
+        return result.rowcount or 0
@@ -3,6 +3,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List, Optional
 from database.models import User
+from database.user_cache import user_cache
 
 
 class UserRepository:
@@ -38,12 +39,11 @@ class UserRepository:
                 role="user",
                 is_active=True
             )
-        else:
-            # Обновляем username и last_seen при каждом входе
-            if username or full_name:
-                user.username = username
-                user.full_name = full_name
-                await self.update(user)
+        elif (username or full_name) and (user.username, user.full_name) != (username, full_name):
+            # Обновляем username и full_name только если они изменились в Telegram
+            user.username = username
+            user.full_name = full_name
+            await self.update(user)
         return user
 
     async def get_all_active(self, limit: int = 100) -> List[User]:
@@ -68,6 +68,8 @@ class UserRepository:
         self.session.add(user)
         await self.session.commit()
         await self.session.refresh(user)
+        # Роль, статус и контакты должны сразу учитываться в AuthMiddleware
+        user_cache.invalidate(user.telegram_id)
         return user
 
     async def deactivate(self, user: User) -> User:
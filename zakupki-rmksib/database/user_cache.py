@@ -0,0 +1,93 @@
+"""Кэш пользователей для AuthMiddleware и отложенная запись last_seen"""
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import inspect, update
+from sqlalchemy.orm import make_transient_to_detached
+from database.connection import async_session_maker
+from database.models import User
+from config.settings import settings
+
+_USER_COLUMNS = [attr.key for attr in inspect(User).column_attrs]
+
+
+class UserCache:
+    """
+    Кэш записей пользователей по telegram_id с ограниченным временем жизни
+
+    Хранятся значения колонок, а не ORM-объекты: каждый запрос получает свой отсоединенный
+    (detached) объект User, который handler может изменить и сохранить через UserRepository.update.
+    Изменения через UserRepository сбрасывают запись сразу, изменения из других процессов
+    (админ-панель) становятся видны не позже чем через ttl_seconds.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+
+    def get(self, telegram_id: int) -> Optional[User]:
+        """Пользователь из кэша (новый отсоединенный объект) или None, если записи нет или она устарела"""
+        entry = self._entries.get(telegram_id)
+        if entry is None:
+            return None
+        expires_at, values = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(telegram_id, None)
+            return None
+        user = User(**values)
+        # Объект с первичным ключом и без истории изменений - как загруженный из БД
+        make_transient_to_detached(user)
+        return user
+
+    def put(self, user: User) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        values = {key: getattr(user, key) for key in _USER_COLUMNS}
+        self._entries[user.telegram_id] = (time.monotonic() + self.ttl_seconds, values)
+
+    def invalidate(self, telegram_id: int) -> None:
+        self._entries.pop(telegram_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class LastSeenWriter:
+    """
+    Накопитель обновлений last_seen: вместо записи в БД на каждое сообщение пользователя
+    последнее время визита каждого пользователя сохраняется одним пакетным UPDATE при flush()
+    """
+
+    def __init__(self):
+        self._pending: Dict[int, datetime] = {}
+
+    def touch(self, user_id: int, seen_at: datetime) -> None:
+        self._pending[user_id] = seen_at
+
+    async def flush(self) -> int:
+        """
+        Записать накопленные значения last_seen
+
+        Returns:
+            Количество обновленных пользователей
+        """
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        try:
+            async with async_session_maker() as session:
+                await session.execute(
+                    update(User),
+                    [{"id": user_id, "last_seen": seen_at} for user_id, seen_at in pending.items()]
+                )
+                await session.commit()
+        except Exception:
+            # Возвращаем значения в очередь (более новые, накопленные за время записи, не затираем)
+            for user_id, seen_at in pending.items():
+                self._pending.setdefault(user_id, seen_at)
+            raise
+        return len(pending)
+
+
+user_cache = UserCache(ttl_seconds=settings.USER_CACHE_TTL_SECONDS)
+last_seen_writer = LastSeenWriter()
@@ -0,0 +1,148 @@
+"""
+Замер задержки event loop при извлечении текста из больших документов:
+разбор прямо в event loop (как было) против пула процессов extraction_pool.
+
+Скрипт создает во временной папке большие PDF, DOCX и XLSX, параллельно разбирает их
+и все это время измеряет, насколько опаздывает asyncio.sleep(0.01) в фоновой задаче -
+так же опаздывали бы ответы всем пользователям бота. Если при разборе через пул максимальная
+задержка больше порога, скрипт завершается с кодом 1.
+
+Запуск:
+    python scripts/benchmark_document_extraction.py [порог_мс]
+"""
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.documentation import extract_text_from_file, extraction_pool
+from services.documentation.processor import _EXTRACTORS
+
+PDF_PAGES = 200
+DOCX_PARAGRAPHS = 20000
+XLSX_ROWS = 30000
+LINE = "Postavka oborudovaniya dlya nuzhd zakazchika, punkt tehnicheskogo zadaniya"
+
+
+def make_pdf(path: str, pages: int) -> None:
+    """Минимальный PDF с текстом на каждой странице (без сторонних библиотек)"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        lines = "".join(f"({LINE} {page}-{i}) Tj 0 -14 Td " for i in range(50))
+        stream = f"BT /F1 10 Tf 40 800 Td {lines}ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> "
+            b"/Contents %d 0 R >>" % content_id
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode("latin-1")
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def make_docx(path: str, paragraphs: int) -> None:
+    from docx import Document
+    doc = Document()
+    for i in range(paragraphs):
+        doc.add_paragraph(f"{LINE} {i}")
+    doc.save(path)
+
+
+def make_xlsx(path: str, rows: int) -> None:
+    import openpyxl
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Спецификация")
+    for i in range(rows):
+        sheet.append([i, f"Товар {i}", "шт", i % 100 + 1, 1000.5 + i, LINE, "ГОСТ 12345", None])
+    workbook.save(path)
+
+
+async def measure(extract, files) -> dict:
+    """Разобрать файлы параллельно, замеряя опоздание фоновой задачи с шагом 10 мс"""
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append(time.perf_counter() - started - 0.01)
+
+    ticker_task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    texts = await asyncio.gather(*(extract(path) for path in files))
+    wall = time.perf_counter() - started
+    done.set()
+    await ticker_task
+    assert all(text and not text.startswith("[Ошибка") for text in texts), [text[:100] for text in texts]
+    lags.sort()
+    return {
+        "wall": wall,
+        "lag_max_ms": lags[-1] * 1000,
+        "lag_p95_ms": lags[int(len(lags) * 0.95)] * 1000,
+        "lag_median_ms": statistics.median(lags) * 1000,
+    }
+
+
+async def extract_inline(path: str) -> str:
+    """Как было: синхронный разбор внутри async-функции"""
+    return _EXTRACTORS[os.path.splitext(path)[1]](path)
+
+
+async def main(threshold_ms: float) -> int:
+    workdir = tempfile.mkdtemp(prefix="extraction_benchmark_")
+    try:
+        files = [os.path.join(workdir, name) for name in ("spec.pdf", "tz.docx", "price.xlsx")]
+        print("Подготовка файлов...")
+        make_pdf(files[0], PDF_PAGES)
+        make_docx(files[1], DOCX_PARAGRAPHS)
+        make_xlsx(files[2], XLSX_ROWS)
+        for path in files:
+            print(f"  {os.path.basename(path)}: {os.path.getsize(path) / 1024 / 1024:.1f} МБ")
+
+        # Процессы пула запускаются заранее, как после первого файла в работающем боте
+        await extraction_pool.run(len, "warmup")
+
+        results = {
+            "в event loop": await measure(extract_inline, files),
+            "пул процессов": await measure(extract_text_from_file, files),
+        }
+    finally:
+        extraction_pool.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{'режим':<16}{'время, с':>10}{'медиана, мс':>14}{'p95, мс':>10}{'макс, мс':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<16}{result['wall']:>10.2f}{result['lag_median_ms']:>14.1f}"
+            f"{result['lag_p95_ms']:>10.1f}{result['lag_max_ms']:>10.1f}"
+        )
+
+    pool_lag = results["пул процессов"]["lag_max_ms"]
+    ok = pool_lag <= threshold_ms
+    print(f"\nМаксимальная задержка event loop при разборе через пул: {pool_lag:.1f} мс (порог {threshold_ms:.0f} мс) - {'OK' if ok else 'FAIL'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(float(sys.argv[1]) if len(sys.argv) > 1 else 100.0)))
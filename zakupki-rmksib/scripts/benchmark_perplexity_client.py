@@ -0,0 +1,94 @@
+"""
+Замер задержки вызова ask_perplexity: новый httpx.AsyncClient на каждый запрос
+против общего клиента с пулом соединений.
+
+Запросы идут на локальную заглушку Perplexity API, поэтому ключ и сеть не нужны.
+Заглушка работает по HTTP без TLS, так что реальный выигрыш на api.perplexity.ai
+(где каждый новый клиент - это еще и TLS-рукопожатие) будет больше.
+
+Запуск:
+    python scripts/benchmark_perplexity_client.py [количество_запросов]
+"""
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from config.settings import settings
+from services.ai import perplexity
+
+STUB_RESPONSE = json.dumps({"choices": [{"message": {"content": "ДА"}}]}).encode("utf-8")
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Заглушка /chat/completions с поддержкой keep-alive"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(STUB_RESPONSE)))
+        self.end_headers()
+        self.wfile.write(STUB_RESPONSE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+async def call_with_new_client(url: str) -> None:
+    """Поведение до изменения: отдельный клиент на каждый вызов"""
+    async with httpx.AsyncClient(timeout=60) as client:
+        resp = await client.post(url, json={"model": "sonar", "messages": MESSAGES})
+        resp.raise_for_status()
+
+
+async def call_with_shared_client() -> None:
+    """Текущее поведение: ask_perplexity с общим клиентом"""
+    await perplexity.ask_perplexity(MESSAGES, max_tokens=10)
+
+
+async def measure(name: str, call, requests_count: int) -> list[float]:
+    timings = []
+    for _ in range(requests_count):
+        started = time.perf_counter()
+        await call()
+        timings.append((time.perf_counter() - started) * 1000)
+    print(
+        f"{name:<28} среднее {statistics.mean(timings):7.2f} мс | "
+        f"медиана {statistics.median(timings):7.2f} мс | p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:7.2f} мс"
+    )
+    return timings
+
+
+async def main(requests_count: int) -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/chat/completions"
+
+    perplexity.PERPLEXITY_API_URL = url
+    settings.PERPLEXITY_API_KEY = "pplx-benchmark-stub"
+    # Логи ask_perplexity искажают замер
+    perplexity.logger.remove()
+
+    print(f"Заглушка: {url}, запросов: {requests_count}\n")
+    before = await measure("Новый клиент на вызов", lambda: call_with_new_client(url), requests_count)
+    after = await measure("Общий клиент (keep-alive)", call_with_shared_client, requests_count)
+    print(f"\nУскорение по медиане: x{statistics.median(before) / statistics.median(after):.1f}")
+
+    await perplexity.close_http_client()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -0,0 +1,172 @@
+"""
+Проверка и замер разбора сумм прописью (services/amount_in_words.py).
+
+1. Случайные суммы (от 1 рубля до сотен миллиардов) записываются прописью по правилам русского
+   языка (род и падеж числительных, формы "тысяча/тысячи/тысяч", "рубль/рубля/рублей",
+   копейки цифрами или прописью), окружаются текстом счета и разбираются обратно -
+   результат должен совпасть с исходной суммой.
+2. Набор фраз из реальных счетов и КП с ожидаемыми суммами.
+3. Время разбора документов разного размера (должно расти линейно).
+
+Если хоть одна проверка не прошла, скрипт завершается с кодом 1.
+
+Запуск:
+    python scripts/check_amount_in_words.py [количество_случайных_сумм] [seed]
+"""
+import os
+import random
+import sys
+import time
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.amount_in_words import parse_amount_in_words
+
+UNITS = ["", "один", "два", "три", "четыре", "пять", "шесть", "семь", "восемь", "девять"]
+UNITS_FEMININE = ["", "одна", "две"] + UNITS[3:]
+TEENS = ["десять", "одиннадцать", "двенадцать", "тринадцать", "четырнадцать",
+         "пятнадцать", "шестнадцать", "семнадцать", "восемнадцать", "девятнадцать"]
+TENS = ["", "", "двадцать", "тридцать", "сорок", "пятьдесят", "шестьдесят", "семьдесят", "восемьдесят", "девяносто"]
+HUNDREDS = ["", "сто", "двести", "триста", "четыреста", "пятьсот", "шестьсот", "семьсот", "восемьсот", "девятьсот"]
+# Формы для 1, 2-4 и 5-20
+SCALES = [
+    (10 ** 9, ("миллиард", "миллиарда", "миллиардов"), False),
+    (10 ** 6, ("миллион", "миллиона", "миллионов"), False),
+    (10 ** 3, ("тысяча", "тысячи", "тысяч"), True),
+]
+RUBLES = ("рубль", "рубля", "рублей")
+KOPECKS = ("копейка", "копейки", "копеек")
+
+CONTEXT_BEFORE = [
+    "", "Итого к оплате: ", "Всего наименований 3, на сумму 20 813,65 руб.\n", "Сумма прописью: ",
+    "Всего к оплате 1 234,00 (", "Поставщик: ООО \"Ромашка\"\nИНН 7701234567\nИтого: ",
+]
+CONTEXT_AFTER = ["", ".", ")", "\nВ том числе НДС 20%", "\nРуководитель ________ Иванов И.И."]
+
+# Фразы из реальных документов: (текст, ожидаемая сумма)
+CORPUS = [
+    ("Двадцать тысяч восемьсот тринадцать рублей 65 копеек", 20813.65),
+    ("Восемнадцать тысяч девятьсот тридцать два рубля 49 копеек", 18932.49),
+    ("Всего к оплате: Сто пятьдесят тысяч рублей 00 копеек", 150000.0),
+    ("Одиннадцать тысяч пятьсот шестьдесят восемь рублей 00 коп.", 11568.0),
+    ("Итого: 1 200 000,00 (Один миллион двести тысяч) рублей 00 копеек", 1200000.0),
+    ("Сумма: Тысяча рублей", 1000.0),
+    ("Два миллиона триста тысяч сорок один рубль, 5 копеек", 2300041.05),
+    ("девятьсот девяносто девять рублей девяносто девять копеек", 999.99),
+    ("Сорок две тысячи рублей ноль копеек", 42000.0),
+    ("Пятьсот рублей\nсемнадцать копеек", 500.17),
+    # Первая сумма с копейками важнее суммы без копеек
+    ("НДС не облагается, пять рублей за штуку. Итого: Триста рублей 10 копеек", 300.1),
+    # Нет суммы прописью
+    ("Сумма, рублей: 20 813,65", None),
+    ("Цена указана в рублях", None),
+    ("Ноль рублей 00 копеек", None),
+]
+
+
+def group_to_words(number: int, feminine: bool) -> list:
+    words = [HUNDREDS[number // 100]]
+    rest = number % 100
+    if 10 <= rest < 20:
+        words.append(TEENS[rest - 10])
+    else:
+        words.append(TENS[rest // 10])
+        words.append((UNITS_FEMININE if feminine else UNITS)[rest % 10])
+    return [word for word in words if word]
+
+
+def plural(number: int, forms: tuple) -> str:
+    if number % 10 == 1 and number % 100 != 11:
+        return forms[0]
+    if 2 <= number % 10 <= 4 and not 12 <= number % 100 <= 14:
+        return forms[1]
+    return forms[2]
+
+
+def number_to_words(number: int, rnd: random.Random) -> str:
+    words = []
+    for scale, forms, feminine in SCALES:
+        count, number = divmod(number, scale)
+        if count:
+            # "тысяча" вместо "одна тысяча" - так тоже пишут
+            if count == 1 and scale == 1000 and rnd.random() < 0.5:
+                words.append(forms[0])
+            else:
+                words += group_to_words(count, feminine) + [plural(count, forms)]
+    words += group_to_words(number, False)
+    return " ".join(words)
+
+
+def amount_to_text(rubles: int, kopecks: int, rnd: random.Random) -> str:
+    text = f"{number_to_words(rubles, rnd)} {plural(rubles, RUBLES)}"
+    style = rnd.choice(["digits", "digits", "words", "abbr", "none"])
+    if style == "digits":
+        text += f" {kopecks:02d} {plural(kopecks, KOPECKS)}"
+    elif style == "abbr":
+        text += f" {kopecks:02d} коп."
+    elif style == "words" and kopecks:
+        text += f" {' '.join(group_to_words(kopecks, True))} {plural(kopecks, KOPECKS)}"
+    elif style == "words":
+        text += " ноль копеек"
+    else:
+        kopecks = 0
+    text = rnd.choice([text, text.capitalize(), text.upper()])
+    return rnd.choice(CONTEXT_BEFORE) + text + rnd.choice(CONTEXT_AFTER), rubles + kopecks / 100
+
+
+def check_random(count: int, seed: int) -> int:
+    rnd = random.Random(seed)
+    failures = 0
+    for _ in range(count):
+        digits = rnd.randint(1, 12)
+        rubles = rnd.randint(1, 10 ** digits - 1)
+        text, expected = amount_to_text(rubles, rnd.randint(0, 99), rnd)
+        parsed = parse_amount_in_words(text)
+        if parsed != round(expected, 2):
+            failures += 1
+            if failures <= 10:
+                print(f"  FAIL: {text!r}: ожидалось {expected:.2f}, получено {parsed}")
+    print(f"Случайные суммы: {count - failures}/{count} (seed {seed})")
+    return failures
+
+
+def check_corpus() -> int:
+    failures = 0
+    for text, expected in CORPUS:
+        parsed = parse_amount_in_words(text)
+        if parsed != expected:
+            failures += 1
+            print(f"  FAIL: {text!r}: ожидалось {expected}, получено {parsed}")
+    print(f"Фразы из документов: {len(CORPUS) - failures}/{len(CORPUS)}")
+    return failures
+
+
+def benchmark() -> None:
+    rnd = random.Random(0)
+    page = "\n".join(
+        f"{i}. Кабель ВВГнг 3х2,5 ГОСТ 31996-2012, 100 м, цена 85,00 руб., сумма 8 500,00 руб." for i in range(1, 40)
+    )
+    tail = "\nИтого к оплате: " + amount_to_text(123456, 78, rnd)[0]
+    print("\nВремя разбора документа (сумма прописью в конце):")
+    for pages in (1, 10, 100, 1000):
+        text = "\n".join([page] * pages) + tail
+        repeats = max(1, 200 // pages)
+        started = time.perf_counter()
+        for _ in range(repeats):
+            parse_amount_in_words(text)
+        elapsed = (time.perf_counter() - started) / repeats
+        print(f"  {len(text) / 1024:>8.0f} КБ: {elapsed * 1000:>8.2f} мс ({elapsed * 1e6 / (len(text) / 1024):.1f} мкс/КБ)")
+
+
+def main() -> int:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else int(time.time())
+    failures = check_random(count, seed) + check_corpus()
+    benchmark()
+    print(f"\n{'OK' if not failures else f'FAIL: {failures} ошибок'}")
+    return 0 if not failures else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Проверка чтения Excel в режиме read_only (services/excel_reader.py) на файлах с неверным тегом <dimension>.
+
+Некоторые программы (выгрузки 1С, генераторы отчетов) записывают в лист <dimension ref="A1"/>
+независимо от числа строк. openpyxl в режиме read_only по умолчанию доверяет этому тегу и читает
+одну строку. Скрипт создает книгу с таблицей товаров, заменяет тег на "A1" и сравнивает результат
+scan_sheet и извлечения текста с чтением книги в обычном режиме.
+
+Если хоть одна проверка не прошла, скрипт завершается с кодом 1.
+
+Запуск:
+    python scripts/check_excel_reader.py
+"""
+import os
+import re
+import sys
+import tempfile
+import zipfile
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openpyxl
+
+from services.excel_reader import scan_sheet
+from services.documentation.processor import _extract_text_from_excel
+
+ROWS = [
+    ["№", "Наименование", "Количество", "Ед. изм."],
+    [1, "Болт М12х40 ГОСТ 7798", 100, "шт"],
+    [2, "Гайка М12 ГОСТ 5915", 100, "шт"],
+    [3, "Шайба 12 ГОСТ 11371", 200, "шт"],
+    [4, "Кабель ВВГнг 3х2,5", 50, "м"],
+    [None, "Всего наименований 4", None, None],
+]
+
+
+def build_workbook(path: str, dimension: str) -> None:
+    """Книга с таблицей ROWS, в которой тег <dimension> листа заменен на dimension"""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "КП"
+    for row in ROWS:
+        sheet.append(row)
+    source = path + ".src"
+    workbook.save(source)
+
+    with zipfile.ZipFile(source) as src, zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as dst:
+        for item in src.infolist():
+            data = src.read(item.filename)
+            if item.filename == "xl/worksheets/sheet1.xml":
+                data = re.sub(rb'<dimension ref="[^"]*"\s*/>', f'<dimension ref="{dimension}"/>'.encode(), data)
+            dst.writestr(item, data)
+    os.remove(source)
+
+
+def full_mode_rows(path: str) -> int:
+    workbook = openpyxl.load_workbook(path, data_only=True)
+    try:
+        return sum(1 for row in workbook.active.iter_rows(values_only=True) if any(value is not None for value in row))
+    finally:
+        workbook.close()
+
+
+def check(path: str, label: str) -> int:
+    failures = 0
+    expected_rows = full_mode_rows(path)
+    scan = scan_sheet(path)
+    text = _extract_text_from_excel(path)
+
+    results = [
+        ("строк прочитано", scan.rows, expected_rows),
+        ("товаров найдено", len(scan.products), 4),
+        ("количество наименований", scan.items_count, 4),
+        ("строк в тексте", sum(1 for name in ("Болт", "Гайка", "Шайба", "Кабель") if name in text), 4),
+    ]
+    print(f"{label}:")
+    for name, actual, expected in results:
+        ok = actual == expected
+        failures += 0 if ok else 1
+        print(f"  {'OK  ' if ok else 'FAIL'} {name}: {actual} (ожидалось {expected})")
+    return failures
+
+
+def main() -> int:
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for dimension in ("A1:D6", "A1"):
+            path = os.path.join(tmp_dir, f"cp_{dimension.replace(':', '_')}.xlsx")
+            build_workbook(path, dimension)
+            failures += check(path, f'<dimension ref="{dimension}"/>')
+    print(f"\n{'OK' if not failures else f'FAIL: {failures} ошибок'}")
+    return 0 if not failures else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""
+Проверка планов запросов репозиториев: горячие выборки лотов и КП должны использовать индексы.
+
+Скрипт создает временную SQLite-базу, применяет миграции Alembic, заполняет ее тестовыми данными,
+выполняет методы репозиториев, перехватывает их SQL и проверяет EXPLAIN QUERY PLAN: таблица должна читаться
+через ожидаемый индекс (или обходом первичного ключа в порядке ORDER BY), в плане не должно быть сортировки
+(USE TEMP B-TREE). Если после изменения запроса или миграций индекс перестал использоваться, скрипт завершается с кодом 1.
+
+Известное ограничение: LotRepository.search считает total оконной функцией count() over() в подзапросе,
+и SQLite сортирует отобранные подзапросом строки во внешнем запросе (USE TEMP B-TREE FOR ORDER BY после
+SCAN (subquery-N)). Стоимость этой сортировки растет с числом подходящих лотов, а не с размером таблицы;
+для search она допускается только последним шагом плана, после чтения подзапроса, и отмечается в выводе.
+
+Запуск:
+    python scripts/check_query_plans.py
+"""
+import asyncio
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="query_plans_"), "plans.db")
+
+# База задается до импорта настроек проекта
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+sys.path.insert(0, PROJECT_ROOT)
+
+from sqlalchemy import create_engine, event, insert, text
+from database import async_session_maker, LotRepository, CommercialProposalRepository
+from database.connection import engine
+from database.models import Lot, CommercialProposal, User
+
+LOTS_COUNT = 20000
+PROPOSALS_COUNT = 5000
+USERS_COUNT = 20
+CUSTOMERS = [f"Заказчик {i}" for i in range(50)]
+FALLBACK_TITLES = ["Болты М12", "БОЛТЫ ГОСТ 7798", "Поставка болтов и гаек"]
+
+
+def migrate() -> None:
+    result = subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head"],
+        cwd=PROJECT_ROOT,
+        env=os.environ.copy(),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        raise SystemExit("Не удалось применить миграции")
+
+
+def seed() -> None:
+    """Данные, похожие на рабочие: 30% лотов истекли, 5% в работе, 10% КП не проанализированы"""
+    random.seed(42)
+    now = datetime.utcnow()
+    sync_engine = create_engine(f"sqlite:///{DB_PATH}")
+    with sync_engine.begin() as conn:
+        conn.execute(insert(User.__table__), [
+            {"telegram_id": 1000 + i, "full_name": f"user{i}", "role": "manager", "is_active": True,
+             "created_at": now, "updated_at": now}
+            for i in range(1, USERS_COUNT + 1)
+        ])
+        conn.execute(insert(Lot.__table__), [
+            {
+                "platform_name": "B2B-Center",
+                "lot_number": f"LOT-{i}",
+                "title": f"Поставка оборудования {i}",
+                "description": "описание",
+                "budget": random.randint(100_000, 50_000_000),
+                "deadline": now + timedelta(days=random.randint(-90, -1) if random.random() < 0.3 else random.randint(1, 60)),
+                "created_at": now - timedelta(minutes=LOTS_COUNT - i),
+                "status": "active",
+                "review_status": "in_work" if random.random() < 0.05 else "not_viewed",
+                "customer": random.choice(CUSTOMERS),
+                "documentation_analyzed": False,
+                "nomenclature_classified_at": None if random.random() < 0.02 else now,
+            }
+            for i in range(1, LOTS_COUNT + 1)
+        ])
+        # Еще не размеченные лоты с кириллицей в разном регистре - для проверки поиска по названию
+        conn.execute(insert(Lot.__table__), [
+            {
+                "platform_name": "B2B-Center",
+                "lot_number": f"BOLT-{i}",
+                "title": title,
+                "description": "описание",
+                "budget": 100_000,
+                "deadline": now + timedelta(days=10),
+                "created_at": now,
+                "status": "active",
+                "review_status": "not_viewed",
+                "customer": CUSTOMERS[0],
+                "documentation_analyzed": False,
+                "nomenclature_classified_at": None,
+            }
+            for i, title in enumerate(FALLBACK_TITLES)
+        ])
+        conn.execute(insert(CommercialProposal.__table__), [
+            {
+                "lot_id": random.randint(1, LOTS_COUNT),
+                "supplier_name": f"Поставщик {i}",
+                "product_price": 1000.0,
+                "created_by": random.randint(1, USERS_COUNT),
+                "created_at": now - timedelta(minutes=PROPOSALS_COUNT - i),
+                "supplier_rating": None if random.random() < 0.1 else random.randint(0, 100),
+            }
+            for i in range(1, PROPOSALS_COUNT + 1)
+        ])
+        # Статистика для планировщика, как после автоматического ANALYZE на рабочей базе
+        conn.execute(text("ANALYZE"))
+    sync_engine.dispose()
+
+
+# Обход таблицы lots по первичному ключу (rowid) в порядке ORDER BY id - план из одного шага без сортировки
+PK_WALK = "SCAN lots"
+
+# (название, вызов репозитория, допустимые способы чтения таблицы - индексы или PK_WALK,
+#  допускается ли сортировка результата подзапроса - см. известное ограничение в описании модуля)
+CHECKS = [
+    (
+        "LotRepository.get_all",
+        lambda s: LotRepository(s).get_all(limit=50, inverted=True),
+        # Большинство лотов актуальны: обход первичного ключа в порядке ORDER BY id DESC
+        # с остановкой на LIMIT дешевле поиска по дедлайну с последующей сортировкой
+        {"ix_lots_deadline", PK_WALK},
+        False,
+    ),
+    ("LotRepository.count_active", lambda s: LotRepository(s).count_active(), {"ix_lots_deadline"}, False),
+    ("LotRepository.get_expired_lots", lambda s: LotRepository(s).get_expired_lots(), {"ix_lots_deadline"}, False),
+    (
+        "LotRepository.search(customers)",
+        lambda s: LotRepository(s).search(customers=CUSTOMERS[:2]),
+        # Заказчик ищется по вхождению подстроки, отбор идет по дедлайну
+        {"ix_lots_deadline"},
+        True,
+    ),
+    (
+        "LotRepository.search(review_status)",
+        lambda s: LotRepository(s).search(review_status="in_work"),
+        {"ix_lots_review_status_deadline"},
+        True,
+    ),
+    ("LotRepository.get_unclassified", lambda s: LotRepository(s).get_unclassified(), {"ix_lots_unclassified"}, False),
+    (
+        "CommercialProposalRepository.get_all(user)",
+        lambda s: CommercialProposalRepository(s).get_all(user_id=3),
+        {"ix_commercial_proposals_created_by_created_at"},
+        False,
+    ),
+    (
+        "CommercialProposalRepository.get_all",
+        lambda s: CommercialProposalRepository(s).get_all(),
+        {"ix_commercial_proposals_created_at"},
+        False,
+    ),
+    (
+        "CommercialProposalRepository.get_by_lot_id",
+        lambda s: CommercialProposalRepository(s).get_by_lot_id(5),
+        {"ix_commercial_proposals_lot_id_created_at"},
+        False,
+    ),
+    (
+        "CommercialProposalRepository.get_unanalyzed",
+        lambda s: CommercialProposalRepository(s).get_unanalyzed(),
+        {"ix_commercial_proposals_unanalyzed"},
+        False,
+    ),
+]
+
+
+def is_sort(step: str) -> bool:
+    return step.startswith("USE TEMP B-TREE")
+
+
+def check_plan(steps: list, expected: set, outer_sort_allowed: bool) -> tuple:
+    """
+    Проверяет шаги EXPLAIN QUERY PLAN
+
+    Returns:
+        (план соответствует ожиданиям, есть ли допущенная сортировка результата подзапроса)
+    """
+    sorts = [index for index, step in enumerate(steps) if is_sort(step)]
+    outer_sort = (
+        outer_sort_allowed
+        and sorts == [len(steps) - 1]
+        and len(steps) > 1
+        and steps[-2].startswith("SCAN (subquery")
+    )
+    if sorts and not outer_sort:
+        return False, False
+
+    table_steps = [step for step in steps if not is_sort(step) and not step.startswith(("CO-ROUTINE", "SCAN (subquery"))]
+    for alternative in expected:
+        if alternative == PK_WALK:
+            if table_steps == [PK_WALK]:
+                return True, outer_sort
+        elif any(re.search(rf"\bINDEX {alternative}\b", step) for step in table_steps):
+            return True, outer_sort
+    return False, outer_sort
+
+
+async def capture_queries(call) -> list:
+    """Выполняет вызов репозитория и возвращает его SELECT-запросы с параметрами"""
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        async with async_session_maker() as session:
+            await call(session)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    return captured
+
+
+async def check_title_search() -> int:
+    """Лоты без разметки находятся по ключевому слову в названии без учета регистра (в том числе кириллицы)"""
+    async with async_session_maker() as session:
+        lots, total = await LotRepository(session).search(
+            nomenclature_tags=["Нет такой группы"],
+            fallback_keywords=["Болт"],
+            page_size=50,
+        )
+    found = sorted(lot.title for lot in lots)
+    ok = total == len(FALLBACK_TITLES) and found == sorted(FALLBACK_TITLES)
+    print(f"{'OK  ' if ok else 'FAIL'} LotRepository.search(fallback_keywords)\n     найдено {total}: {found}")
+    return 0 if ok else 1
+
+
+async def main() -> int:
+    migrate()
+    seed()
+
+    search_failures = await check_title_search()
+
+    failures = 0
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        for name, call, expected, outer_sort_allowed in CHECKS:
+            queries = await capture_queries(call)
+            # Первый SELECT - основная выборка метода (следующие - например, подсчет total для пустой страницы)
+            statement, parameters = queries[0]
+            cursor = await raw.driver_connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            steps = [row[-1] for row in await cursor.fetchall()]
+            ok, outer_sort = check_plan(steps, expected, outer_sort_allowed)
+            failures += 0 if ok else 1
+            print(f"{'OK  ' if ok else 'FAIL'} {name}\n     {' | '.join(steps)}")
+            if ok and outer_sort:
+                print("     (известное ограничение: сортировка результата подзапроса search, см. описание скрипта)")
+
+    await engine.dispose()
+    print(f"\n{len(CHECKS) - failures}/{len(CHECKS)} запросов используют ожидаемые индексы")
+    return 1 if failures or search_failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
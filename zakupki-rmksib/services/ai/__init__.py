@@ -1,6 +1,26 @@
-from services.ai.perplexity import analyze_lot, analyze_documentation, ask_perplexity
-
-__all__ = ["analyze_lot", "analyze_documentation", "ask_perplexity"]
+from services.ai.perplexity import (
+    analyze_lot,
+    analyze_lot_stream,
+    analyze_documentation,
+    analyze_documentation_stream,
+    ask_perplexity,
+    stream_perplexity,
+    close_http_client,
+)
+from services.ai.scheduler import llm_scheduler, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+
+__all__ = [
+    "analyze_lot",
+    "analyze_lot_stream",
+    "analyze_documentation",
+    "analyze_documentation_stream",
+    "ask_perplexity",
+    "stream_perplexity",
+    "close_http_client",
+    "llm_scheduler",
+    "PRIORITY_INTERACTIVE",
+    "PRIORITY_BACKGROUND",
+]
 
 
 
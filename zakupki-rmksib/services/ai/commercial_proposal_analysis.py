@@ -1,5 +1,6 @@
 """Сервис для анализа коммерческих предложений через LLM"""
-from typing import Optional, Dict
+import asyncio
+from typing import AsyncIterator, Iterable, Optional, Dict, Tuple
 from loguru import logger
 from services.ai.perplexity import ask_perplexity
 from database.models import CommercialProposal
@@ -82,6 +83,44 @@ async def analyze_supplier_reliability(supplier_name: str, supplier_inn: Optiona
         }
 
 
+def supplier_key(supplier_name: str, supplier_inn: Optional[str] = None) -> Tuple[str, Optional[str]]:
+    """Ключ поставщика: КП одного поставщика (название без учета регистра и пробелов + ИНН) анализируются один раз"""
+    return " ".join((supplier_name or "").lower().split()), (supplier_inn or "").strip() or None
+
+
+async def analyze_suppliers_reliability(
+    suppliers: Iterable[Tuple[str, Optional[str]]]
+) -> AsyncIterator[Tuple[Tuple[str, Optional[str]], Dict[str, any]]]:
+    """
+    Анализирует надежность нескольких поставщиков параллельно
+    
+    Все запросы отправляются сразу, число одновременных запросов к LLM ограничивает общий
+    планировщик llm_scheduler, поэтому анализ N поставщиков занимает примерно столько же,
+    сколько самый долгий запрос (в пределах LLM_MAX_CONCURRENCY).
+    
+    Args:
+        suppliers: Пары (название, ИНН); повторяющиеся поставщики анализируются один раз
+    
+    Yields:
+        (supplier_key поставщика, результат analyze_supplier_reliability) по мере готовности
+    """
+    unique = {}
+    for supplier_name, supplier_inn in suppliers:
+        unique.setdefault(supplier_key(supplier_name, supplier_inn), (supplier_name, supplier_inn))
+    
+    async def analyze(key: Tuple[str, Optional[str]]):
+        return key, await analyze_supplier_reliability(*unique[key])
+    
+    tasks = [asyncio.create_task(analyze(key)) for key in unique]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Если результаты больше не нужны (например, обработчик прерван), не тратим запросы к LLM
+        for task in tasks:
+            task.cancel()
+
+
 def calculate_integral_rating(
     product_price: float,
     delivery_cost: Optional[float],
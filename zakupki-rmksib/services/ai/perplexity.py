@@ -1,9 +1,12 @@
 from __future__ import annotations
+import hashlib
+import json
 import httpx
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, Tuple
 from loguru import logger
 from config.settings import settings
 from database.models import Lot
+from services.ai.scheduler import llm_scheduler, LLMAPIError, PRIORITY_INTERACTIVE
 
 PERPLEXITY_API_URL = "https://api.perplexity.ai/chat/completions"
 # Актуальные модели Perplexity (2025):
@@ -21,8 +24,46 @@ def get_default_model() -> str:
 
 DEFAULT_MODEL = get_default_model()  # Используем из настроек или по умолчанию 'sonar'
 
+# HTTP/2 включается, только если установлен пакет h2 (httpx[http2])
+try:
+	import h2  # noqa: F401
+	HTTP2_AVAILABLE = True
+except ImportError:
+	HTTP2_AVAILABLE = False
 
-async def ask_perplexity(messages: List[Dict[str, str]], model: str | None = None, temperature: float = 0.2, max_tokens: int | None = 900) -> str:
+# Общий для процесса клиент с пулом соединений: keep-alive избавляет от TCP+TLS рукопожатия
+# на каждый запрос. Создается лениво при первом обращении, закрывается close_http_client()
+_http_client: httpx.AsyncClient | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+	"""Получить общий HTTP-клиент для запросов к Perplexity API (создается при первом вызове)"""
+	global _http_client
+	if _http_client is None or _http_client.is_closed:
+		_http_client = httpx.AsyncClient(
+			timeout=httpx.Timeout(60, connect=10),
+			limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+			http2=HTTP2_AVAILABLE,
+		)
+		logger.info(f"Perplexity HTTP client created (http2={HTTP2_AVAILABLE})")
+	return _http_client
+
+
+async def close_http_client() -> None:
+	"""Закрыть общий HTTP-клиент (вызывается при остановке бота)"""
+	global _http_client
+	if _http_client is not None and not _http_client.is_closed:
+		await _http_client.aclose()
+	_http_client = None
+
+
+def _build_request(
+	messages: List[Dict[str, str]],
+	model: str | None,
+	temperature: float,
+	max_tokens: int | None
+) -> Tuple[Dict[str, Any], Dict[str, str], str, str]:
+	"""Проверяет настройки и формирует payload и заголовки запроса к Perplexity API"""
 	if not settings.PERPLEXITY_API_KEY:
 		raise RuntimeError("PERPLEXITY_API_KEY is not set in environment")
 	
@@ -73,84 +114,176 @@ async def ask_perplexity(messages: List[Dict[str, str]], model: str | None = Non
 		model = 'sonar'
 		payload['model'] = 'sonar'
 	
-	async with httpx.AsyncClient(timeout=60) as client:
+	return payload, headers, api_key, model
+
+
+async def ask_perplexity(
+	messages: List[Dict[str, str]],
+	model: str | None = None,
+	temperature: float = 0.2,
+	max_tokens: int | None = 900,
+	priority: int = PRIORITY_INTERACTIVE
+) -> str:
+	"""
+	Запрос к Perplexity API через общий планировщик llm_scheduler
+	(ограничение частоты и параллелизма, повторы при 429/5xx)
+	
+	Args:
+		priority: PRIORITY_INTERACTIVE для запросов, которых ждет пользователь,
+		          PRIORITY_BACKGROUND для фоновой работы
+	"""
+	payload, headers, api_key, model = _build_request(messages, model, temperature, max_tokens)
+	return await llm_scheduler.run(
+		lambda: _post_chat_completion(payload, headers, api_key, model),
+		priority=priority
+	)
+
+
+async def stream_perplexity(
+	messages: List[Dict[str, str]],
+	model: str | None = None,
+	temperature: float = 0.2,
+	max_tokens: int | None = 900,
+	priority: int = PRIORITY_INTERACTIVE
+) -> AsyncIterator[str]:
+	"""
+	Потоковый запрос к Perplexity API (SSE, stream: true): отдает фрагменты ответа по мере генерации
+	
+	Слот в llm_scheduler занимается на все время потока. Автоматических повторов нет:
+	при ошибке до первого фрагмента вызывающий код может повторить запрос через ask_perplexity.
+	"""
+	payload, headers, api_key, model = _build_request(messages, model, temperature, max_tokens)
+	payload["stream"] = True
+	
+	async with llm_scheduler.slot(priority):
+		async with get_http_client().stream("POST", PERPLEXITY_API_URL, headers=headers, json=payload) as resp:
+			if resp.status_code >= 400:
+				await resp.aread()
+				logger.error(f"Perplexity API streaming error {resp.status_code}: {resp.text[:500]}")
+				raise LLMAPIError(
+					f"Perplexity API error: {resp.status_code} - {resp.text[:500]}",
+					status_code=resp.status_code,
+					retry_after=_parse_retry_after(resp)
+				)
+			
+			async for line in resp.aiter_lines():
+				# Формат SSE: строки "data: {...}", поток завершается "data: [DONE]"
+				if not line.startswith("data:"):
+					continue
+				data = line[len("data:"):].strip()
+				if data == "[DONE]":
+					break
+				try:
+					chunk = json.loads(data)
+				except ValueError:
+					logger.warning(f"Malformed SSE chunk from Perplexity: {data[:200]}")
+					continue
+				choices = chunk.get("choices") or []
+				if not choices:
+					continue
+				delta = (choices[0].get("delta") or {}).get("content")
+				if delta:
+					yield delta
+
+
+def _parse_retry_after(response: httpx.Response) -> float | None:
+	"""Значение заголовка Retry-After в секундах (если сервер его прислал)"""
+	try:
+		return float(response.headers.get("Retry-After", ""))
+	except ValueError:
+		return None
+
+
+async def _post_chat_completion(payload: Dict[str, Any], headers: Dict[str, str], api_key: str, model: str) -> str:
+	"""Один HTTP-запрос к Perplexity API (лимиты и повторы - в llm_scheduler)"""
+	client = get_http_client()
+	try:
+		resp = await client.post(PERPLEXITY_API_URL, headers=headers, json=payload)
+		resp.raise_for_status()
+		data = resp.json()
+		choices = data.get("choices", [])
+		if not choices:
+			logger.warning("Perplexity returned no choices")
+			return ""
+		return choices[0]["message"]["content"]
+	except httpx.HTTPStatusError as e:
+		# Получаем детали ошибки из ответа
 		try:
-			resp = await client.post(PERPLEXITY_API_URL, headers=headers, json=payload)
-			resp.raise_for_status()
-			data = resp.json()
-			choices = data.get("choices", [])
-			if not choices:
-				logger.warning("Perplexity returned no choices")
-				return ""
-			return choices[0]["message"]["content"]
-		except httpx.HTTPStatusError as e:
-			# Получаем детали ошибки из ответа
+			error_json = None
+			error_text = None
 			try:
-				error_json = None
-				error_text = None
+				error_json = e.response.json()
+			except:
 				try:
-					error_json = e.response.json()
+					error_text = e.response.text
 				except:
-					try:
-						error_text = e.response.text
-					except:
-						error_text = str(e)
-				
-				error_msg = "Unknown error"
-				if error_json:
-					# Perplexity API возвращает ошибки в формате {'error': {'message': '...'}} или {'message': '...'}
-					if isinstance(error_json, dict):
-						if 'error' in error_json and isinstance(error_json['error'], dict):
-							error_msg = error_json['error'].get('message', str(error_json))
-						elif 'message' in error_json:
-							error_msg = error_json['message']
-						else:
-							error_msg = str(error_json)
+					error_text = str(e)
+			
+			error_msg = "Unknown error"
+			if error_json:
+				# Perplexity API возвращает ошибки в формате {'error': {'message': '...'}} или {'message': '...'}
+				if isinstance(error_json, dict):
+					if 'error' in error_json and isinstance(error_json['error'], dict):
+						error_msg = error_json['error'].get('message', str(error_json))
+					elif 'message' in error_json:
+						error_msg = error_json['message']
 					else:
 						error_msg = str(error_json)
-				elif error_text:
-					error_msg = error_text
 				else:
-					error_msg = str(e)
-				
-				logger.error(f"Perplexity API error {e.response.status_code}: {error_msg}")
-				
-				# Специальная обработка для ошибки 401 (Authorization Required)
-				if e.response.status_code == 401:
-					logger.error("API key validation failed. Check PERPLEXITY_API_KEY in .env file")
-					logger.error(f"API key preview: {api_key[:10]}...{api_key[-4:] if len(api_key) > 14 else '***'}")
-					raise RuntimeError(
-						f"Perplexity API authorization failed (401). "
-						f"Please check your PERPLEXITY_API_KEY in .env file. "
-						f"The key should start with 'pplx-' and be valid."
-					)
-				
-				# Специальная обработка для ошибки 400 с Invalid model
-				if e.response.status_code == 400 and "Invalid model" in error_msg:
-					logger.error(f"Invalid model '{model}'. Available models: sonar, sonar-pro, llama-3.1-sonar-small-32k-online, llama-3.1-sonar-large-32k-online")
-					logger.error("Check PERPLEXITY_MODEL in .env file or update DEFAULT_MODEL in code")
-					raise RuntimeError(
-						f"Perplexity API invalid model error (400). "
-						f"Model '{model}' is not available. "
-						f"Use one of: sonar, sonar-pro, llama-3.1-sonar-small-32k-online, llama-3.1-sonar-large-32k-online. "
-						f"Set PERPLEXITY_MODEL in .env file."
-					)
-				
-				logger.error(f"Request payload (model, messages count, max_tokens): model={payload.get('model')}, messages={len(payload.get('messages', []))}, max_tokens={payload.get('max_tokens', 'not set')}")
-				logger.error(f"Full error response: {error_json if error_json else error_text}")
-				# Выводим первые 500 символов каждого сообщения для отладки
-				for i, msg in enumerate(payload.get('messages', [])):
-					content_preview = str(msg.get('content', ''))[:500]
-					logger.error(f"Message {i} ({msg.get('role')}): {content_preview}...")
-				raise RuntimeError(f"Perplexity API error: {e.response.status_code} - {error_msg}")
-			except RuntimeError:
-				raise
-			except Exception as parse_error:
-				logger.error(f"Perplexity API error {e.response.status_code}: {str(e)} (parse error: {parse_error})")
-				raise RuntimeError(f"Perplexity API error: {e.response.status_code} - {str(e)}")
-		except Exception as e:
-			logger.error(f"Unexpected error calling Perplexity API: {e}")
+					error_msg = str(error_json)
+			elif error_text:
+				error_msg = error_text
+			else:
+				error_msg = str(e)
+			
+			logger.error(f"Perplexity API error {e.response.status_code}: {error_msg}")
+			
+			# Специальная обработка для ошибки 401 (Authorization Required)
+			if e.response.status_code == 401:
+				logger.error("API key validation failed. Check PERPLEXITY_API_KEY in .env file")
+				logger.error(f"API key preview: {api_key[:10]}...{api_key[-4:] if len(api_key) > 14 else '***'}")
+				raise LLMAPIError(
+					f"Perplexity API authorization failed (401). "
+					f"Please check your PERPLEXITY_API_KEY in .env file. "
+					f"The key should start with 'pplx-' and be valid.",
+					status_code=401
+				)
+			
+			# Специальная обработка для ошибки 400 с Invalid model
+			if e.response.status_code == 400 and "Invalid model" in error_msg:
+				logger.error(f"Invalid model '{model}'. Available models: sonar, sonar-pro, llama-3.1-sonar-small-32k-online, llama-3.1-sonar-large-32k-online")
+				logger.error("Check PERPLEXITY_MODEL in .env file or update DEFAULT_MODEL in code")
+				raise LLMAPIError(
+					f"Perplexity API invalid model error (400). "
+					f"Model '{model}' is not available. "
+					f"Use one of: sonar, sonar-pro, llama-3.1-sonar-small-32k-online, llama-3.1-sonar-large-32k-online. "
+					f"Set PERPLEXITY_MODEL in .env file.",
+					status_code=400
+				)
+			
+			logger.error(f"Request payload (model, messages count, max_tokens): model={payload.get('model')}, messages={len(payload.get('messages', []))}, max_tokens={payload.get('max_tokens', 'not set')}")
+			logger.error(f"Full error response: {error_json if error_json else error_text}")
+			# Выводим первые 500 символов каждого сообщения для отладки
+			for i, msg in enumerate(payload.get('messages', [])):
+				content_preview = str(msg.get('content', ''))[:500]
+				logger.error(f"Message {i} ({msg.get('role')}): {content_preview}...")
+			raise LLMAPIError(
+				f"Perplexity API error: {e.response.status_code} - {error_msg}",
+				status_code=e.response.status_code,
+				retry_after=_parse_retry_after(e.response)
+			)
+		except RuntimeError:
 			raise
+		except Exception as parse_error:
+			logger.error(f"Perplexity API error {e.response.status_code}: {str(e)} (parse error: {parse_error})")
+			raise LLMAPIError(
+				f"Perplexity API error: {e.response.status_code} - {str(e)}",
+				status_code=e.response.status_code,
+				retry_after=_parse_retry_after(e.response)
+			)
+	except Exception as e:
+		logger.error(f"Unexpected error calling Perplexity API: {e}")
+		raise
 
 
 def _lot_to_prompt(lot: Lot, budget_min: int | None = None, budget_max: int | None = None) -> str:
@@ -264,19 +397,131 @@ def _lot_to_enhanced_prompt(lot: Lot, budget_min: int | None = None, budget_max:
 	)
 
 
-async def analyze_lot(lot: Lot, enhanced: bool = True, budget_min: int | None = None, budget_max: int | None = None) -> str:
+# Версия промптов анализа: увеличить при изменении _lot_to_*prompt/_documentation_to_prompt,
+# чтобы не отдавать из кэша анализы, полученные по старым промптам
+ANALYSIS_PROMPT_VERSION = "1"
+
+
+def build_analysis_cache_key(kind: str, model: str, messages: List[Dict[str, str]], max_tokens: int, documentation_hash: str | None = None) -> str:
+	"""
+	Ключ кэша анализа: SHA-256 от отрисованного промпта (в нем уже все поля лота и пороги бюджета),
+	хэша полного текста документации, модели и версии промпта
 	"""
-	Анализ лота через Perplexity
+	key_source = json.dumps({
+		"kind": kind,
+		"model": model,
+		"prompt_version": ANALYSIS_PROMPT_VERSION,
+		"max_tokens": max_tokens,
+		"documentation_hash": documentation_hash,
+		"messages": messages,
+	}, ensure_ascii=False, sort_keys=True)
+	return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+
+async def _get_cached_analysis(cache_key: str, kind: str, lot: Lot) -> str | None:
+	"""Анализ из кэша (таблица lot_analyses), если он не старше ANALYSIS_CACHE_TTL_HOURS"""
+	from database import async_session_maker, LotAnalysisRepository
+	try:
+		async with async_session_maker() as session:
+			cached = await LotAnalysisRepository(session).get_fresh(cache_key, settings.ANALYSIS_CACHE_TTL_HOURS)
+		if cached:
+			logger.info(f"Analysis cache hit: kind={kind}, lot={lot.lot_number}, created_at={cached.created_at}")
+			return cached.result
+	except Exception as e:
+		logger.warning(f"Analysis cache lookup failed: {e}")
+	return None
+
+
+async def _store_analysis(cache_key: str, kind: str, lot: Lot, model: str, result: str) -> None:
+	"""Сохраняет анализ в кэш (ошибки кэша не прерывают анализ)"""
+	from database import async_session_maker, LotAnalysisRepository
+	try:
+		async with async_session_maker() as session:
+			await LotAnalysisRepository(session).save(
+				cache_key,
+				lot.id or None,  # У временных лотов (ручная загрузка документации) id нет
+				kind,
+				model,
+				result
+			)
+	except Exception as e:
+		logger.warning(f"Analysis cache store failed: {e}")
+
+
+async def _cached_analysis(
+	kind: str,
+	lot: Lot,
+	messages: List[Dict[str, str]],
+	max_tokens: int,
+	refresh: bool = False,
+	documentation_hash: str | None = None
+) -> str:
+	"""
+	Возвращает анализ из кэша, если он не старше ANALYSIS_CACHE_TTL_HOURS,
+	иначе запрашивает Perplexity и сохраняет ответ
+	"""
+	model = get_default_model()
+	cache_key = build_analysis_cache_key(kind, model, messages, max_tokens, documentation_hash)
 	
-	Args:
-		lot: Объект лота для анализа
-		enhanced: Если True, использует расширенный анализ с оценками по 10-балльной шкале
-		budget_min: Минимальный бюджет из настроек пользователя (опционально)
-		budget_max: Максимальный бюджет из настроек пользователя (опционально)
+	if not refresh:
+		cached = await _get_cached_analysis(cache_key, kind, lot)
+		if cached:
+			return cached
 	
-	Returns:
-		Текст анализа лота
+	result = await ask_perplexity(messages, model=model, max_tokens=max_tokens)
+	if result:
+		await _store_analysis(cache_key, kind, lot, model, result)
+	return result
+
+
+async def _stream_cached_analysis(
+	kind: str,
+	lot: Lot,
+	messages: List[Dict[str, str]],
+	max_tokens: int,
+	refresh: bool = False,
+	documentation_hash: str | None = None
+) -> AsyncIterator[str]:
 	"""
+	Потоковый вариант _cached_analysis: анализ из кэша отдается одним фрагментом,
+	иначе фрагменты ответа Perplexity отдаются по мере генерации, а полный ответ сохраняется в кэш.
+	Если поток оборвался до первого фрагмента, выполняется обычный запрос (с повторами).
+	"""
+	model = get_default_model()
+	cache_key = build_analysis_cache_key(kind, model, messages, max_tokens, documentation_hash)
+	
+	if not refresh:
+		cached = await _get_cached_analysis(cache_key, kind, lot)
+		if cached:
+			yield cached
+			return
+	
+	parts: List[str] = []
+	try:
+		async for delta in stream_perplexity(messages, model=model, max_tokens=max_tokens):
+			parts.append(delta)
+			yield delta
+	except Exception as e:
+		if parts:
+			raise
+		logger.warning(f"Perplexity streaming failed before first chunk ({e}), falling back to regular request")
+		result = await ask_perplexity(messages, model=model, max_tokens=max_tokens)
+		if result:
+			parts.append(result)
+			yield result
+	
+	result = "".join(parts)
+	if result:
+		await _store_analysis(cache_key, kind, lot, model, result)
+
+
+def _lot_analysis_messages(
+	lot: Lot,
+	enhanced: bool = True,
+	budget_min: int | None = None,
+	budget_max: int | None = None
+) -> Tuple[List[Dict[str, str]], int]:
+	"""Сообщения и max_tokens для анализа лота"""
 	if enhanced:
 		# Расширенный анализ с оценками
 		messages = [
@@ -290,43 +535,123 @@ async def analyze_lot(lot: Lot, enhanced: bool = True, budget_min: int | None =
 			{"role": "user", "content": _lot_to_enhanced_prompt(lot, budget_min, budget_max)},
 		]
 		# Для расширенного анализа нужно больше токенов
-		return await ask_perplexity(messages, max_tokens=2000)
-	else:
-		# Базовый анализ (для обратной совместимости)
-		messages = [
-			{"role": "system", "content": (
-				"Ты эксперт по закупкам в промышленности. Отвечай строго на русском, "
-				"структурируй ответ по пунктам, избегай воды."
-			)},
-			{"role": "user", "content": _lot_to_prompt(lot, budget_min, budget_max)},
-		]
-		return await ask_perplexity(messages)
+		return messages, 2000
+	# Базовый анализ (для обратной совместимости)
+	messages = [
+		{"role": "system", "content": (
+			"Ты эксперт по закупкам в промышленности. Отвечай строго на русском, "
+			"структурируй ответ по пунктам, избегай воды."
+		)},
+		{"role": "user", "content": _lot_to_prompt(lot, budget_min, budget_max)},
+	]
+	return messages, 900
 
 
-async def analyze_documentation(lot: Lot, documentation_text: str, budget_min: int | None = None, budget_max: int | None = None) -> str:
+def _documentation_analysis_messages(
+	lot: Lot,
+	documentation_text: str,
+	budget_min: int | None = None,
+	budget_max: int | None = None
+) -> List[Dict[str, str]]:
+	"""Сообщения для анализа конкурсной документации"""
+	return [
+		{"role": "system", "content": (
+			"Ты эксперт по закупкам в промышленности с глубокими знаниями в области "
+			"анализа конкурсной документации, оценки рисков, санкционного законодательства, "
+			"логистики и финансового анализа. Отвечай строго на русском языке, "
+			"структурируй ответ точно по указанному формату, избегай лишних вступлений. "
+			"Всегда указывай конкретные оценки по 10-балльной шкале и рассчитывай интегральную оценку риска."
+		)},
+		{"role": "user", "content": _documentation_to_prompt(lot, documentation_text, budget_min, budget_max)},
+	]
+
+
+def _documentation_hash(documentation_text: str) -> str:
+	return hashlib.sha256(documentation_text.encode("utf-8")).hexdigest()
+
+
+async def analyze_lot(
+	lot: Lot,
+	enhanced: bool = True,
+	budget_min: int | None = None,
+	budget_max: int | None = None,
+	refresh: bool = False
+) -> str:
 	"""
-	Анализ конкурсной документации через Perplexity
+	Анализ лота через Perplexity (с кэшированием в БД, см. _cached_analysis)
+	
+	Args:
+		lot: Объект лота для анализа
+		enhanced: Если True, использует расширенный анализ с оценками по 10-балльной шкале
+		budget_min: Минимальный бюджет из настроек пользователя (опционально)
+		budget_max: Максимальный бюджет из настроек пользователя (опционально)
+		refresh: Игнорировать кэш и выполнить анализ заново
+	
+	Returns:
+		Текст анализа лота
+	"""
+	messages, max_tokens = _lot_analysis_messages(lot, enhanced, budget_min, budget_max)
+	return await _cached_analysis("lot", lot, messages, max_tokens=max_tokens, refresh=refresh)
+
+
+def analyze_lot_stream(
+	lot: Lot,
+	enhanced: bool = True,
+	budget_min: int | None = None,
+	budget_max: int | None = None,
+	refresh: bool = False
+) -> AsyncIterator[str]:
+	"""Потоковый вариант analyze_lot: фрагменты текста анализа по мере генерации"""
+	messages, max_tokens = _lot_analysis_messages(lot, enhanced, budget_min, budget_max)
+	return _stream_cached_analysis("lot", lot, messages, max_tokens=max_tokens, refresh=refresh)
+
+
+async def analyze_documentation(
+	lot: Lot,
+	documentation_text: str,
+	budget_min: int | None = None,
+	budget_max: int | None = None,
+	refresh: bool = False
+) -> str:
+	"""
+	Анализ конкурсной документации через Perplexity (с кэшированием в БД, см. _cached_analysis)
 	
 	Args:
 		lot: Объект лота
 		documentation_text: Извлеченный текст из документации
 		budget_min: Минимальный бюджет из настроек пользователя (опционально)
 		budget_max: Максимальный бюджет из настроек пользователя (опционально)
+		refresh: Игнорировать кэш и выполнить анализ заново
 	
 	Returns:
 		Текст анализа документации
 	"""
-	messages = [
-		{"role": "system", "content": (
-			"Ты эксперт по закупкам в промышленности с глубокими знаниями в области "
-			"анализа конкурсной документации, оценки рисков, санкционного законодательства, "
-			"логистики и финансового анализа. Отвечай строго на русском языке, "
-			"структурируй ответ точно по указанному формату, избегай лишних вступлений. "
-			"Всегда указывай конкретные оценки по 10-балльной шкале и рассчитывай интегральную оценку риска."
-		)},
-		{"role": "user", "content": _documentation_to_prompt(lot, documentation_text, budget_min, budget_max)},
-	]
-	return await ask_perplexity(messages, max_tokens=2500)
+	return await _cached_analysis(
+		"documentation",
+		lot,
+		_documentation_analysis_messages(lot, documentation_text, budget_min, budget_max),
+		max_tokens=2500,
+		refresh=refresh,
+		documentation_hash=_documentation_hash(documentation_text)
+	)
+
+
+def analyze_documentation_stream(
+	lot: Lot,
+	documentation_text: str,
+	budget_min: int | None = None,
+	budget_max: int | None = None,
+	refresh: bool = False
+) -> AsyncIterator[str]:
+	"""Потоковый вариант analyze_documentation: фрагменты текста анализа по мере генерации"""
+	return _stream_cached_analysis(
+		"documentation",
+		lot,
+		_documentation_analysis_messages(lot, documentation_text, budget_min, budget_max),
+		max_tokens=2500,
+		refresh=refresh,
+		documentation_hash=_documentation_hash(documentation_text)
+	)
 
 
 def _documentation_to_prompt(lot: Lot, documentation_text: str, budget_min: int | None = None, budget_max: int | None = None) -> str:
@@ -0,0 +1,217 @@
+"""Планировщик запросов к LLM: ограничение частоты, параллелизма, приоритеты и повторы"""
+from __future__ import annotations
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Tuple, TypeVar
+import httpx
+from loguru import logger
+from tenacity import AsyncRetrying, RetryCallState, retry_if_exception, stop_after_attempt, wait_random_exponential
+from config.settings import settings
+
+T = TypeVar("T")
+
+# Классы приоритета: чем меньше число, тем раньше запрос получает слот
+PRIORITY_INTERACTIVE = 0  # Запросы, которых ждет пользователь (анализ лота, поиск поставщиков)
+PRIORITY_BACKGROUND = 10  # Фоновая работа (классификация номенклатуры при загрузке лотов)
+
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BACKGROUND: "background"}
+
+
+class LLMAPIError(RuntimeError):
+	"""Ошибка ответа LLM API с HTTP-статусом (для решения о повторе запроса)"""
+
+	def __init__(self, message: str, status_code: int, retry_after: float | None = None):
+		super().__init__(message)
+		self.status_code = status_code
+		self.retry_after = retry_after
+
+
+def is_retryable_error(error: BaseException) -> bool:
+	"""Повторяем при 429, 5xx и сетевых ошибках/таймаутах"""
+	if isinstance(error, LLMAPIError):
+		return error.status_code == 429 or error.status_code >= 500
+	return isinstance(error, httpx.TransportError)
+
+
+class TokenBucket:
+	"""Ограничитель частоты: rate_per_minute запросов в минуту с допустимым всплеском burst (0 или меньше - без ограничения)"""
+
+	def __init__(self, rate_per_minute: float, burst: int):
+		self.rate = rate_per_minute / 60.0
+		self.capacity = max(1, burst)
+		self.tokens = float(self.capacity)
+		self.updated_at = time.monotonic()
+
+	def _refill(self) -> None:
+		now = time.monotonic()
+		self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+		self.updated_at = now
+
+	def time_until_token(self) -> float:
+		"""Сколько секунд ждать до появления токена (0 - токен есть)"""
+		if self.rate <= 0:
+			return 0.0
+		self._refill()
+		if self.tokens >= 1:
+			return 0.0
+		return (1 - self.tokens) / self.rate
+
+	def consume(self) -> None:
+		if self.rate <= 0:
+			return
+		self._refill()
+		self.tokens -= 1
+
+
+class LLMScheduler:
+	"""
+	Общая для процесса очередь запросов к LLM
+
+	Запрос получает слот, когда есть свободное место в пределах max_concurrency и токен в TokenBucket.
+	Ожидающие запросы обслуживаются по приоритету, внутри приоритета - в порядке поступления.
+	Ответы 429/5xx и сетевые ошибки повторяются с экспоненциальной задержкой со случайным разбросом;
+	каждая попытка заново проходит через очередь и ограничитель частоты.
+	"""
+
+	def __init__(self, max_concurrency: int, requests_per_minute: float, burst: int, max_retries: int):
+		self.max_concurrency = max(1, max_concurrency)
+		self.max_retries = max(0, max_retries)
+		self._bucket = TokenBucket(requests_per_minute, burst)
+		self._backoff = wait_random_exponential(multiplier=1, max=30)
+		self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+		self._sequence = itertools.count()
+		self._active = 0
+		self._wakeup: asyncio.TimerHandle | None = None
+		# Метрики
+		self._wait_times: deque[float] = deque(maxlen=500)
+		self._requests = 0
+		self._retries = 0
+		self._rate_limited = 0
+		self._failures = 0
+
+	def _dispatch(self) -> None:
+		"""Выдать слоты ожидающим запросам, пока позволяют лимиты"""
+		self._wakeup = None
+		while self._waiters and self._active < self.max_concurrency:
+			if self._waiters[0][2].done():
+				# Ожидание отменено
+				heapq.heappop(self._waiters)
+				continue
+			delay = self._bucket.time_until_token()
+			if delay > 0:
+				self._wakeup = asyncio.get_running_loop().call_later(delay, self._dispatch)
+				return
+			self._bucket.consume()
+			_, _, future = heapq.heappop(self._waiters)
+			self._active += 1
+			future.set_result(None)
+
+	async def _acquire(self, priority: int) -> None:
+		future = asyncio.get_running_loop().create_future()
+		heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+		if self._wakeup is None:
+			self._dispatch()
+		started = time.monotonic()
+		try:
+			await future
+		except asyncio.CancelledError:
+			if future.done() and not future.cancelled():
+				# Слот уже выдан, но ожидающий отменен - возвращаем слот
+				self._release()
+			raise
+		self._wait_times.append(time.monotonic() - started)
+
+	def _release(self) -> None:
+		self._active -= 1
+		if self._wakeup is None:
+			self._dispatch()
+
+	@asynccontextmanager
+	async def slot(self, priority: int = PRIORITY_INTERACTIVE) -> AsyncIterator[None]:
+		"""
+		Занять слот на время блока (для потоковых ответов, которые нельзя повторить целиком).
+		Повторов нет - их делает вызывающий код или run()
+		"""
+		await self._acquire(priority)
+		try:
+			self._requests += 1
+			yield
+		finally:
+			self._release()
+
+	async def _run_once(self, call: Callable[[], Awaitable[T]], priority: int) -> T:
+		async with self.slot(priority):
+			return await call()
+
+	def _wait_before_retry(self, retry_state: RetryCallState) -> float:
+		delay = self._backoff(retry_state)
+		error = retry_state.outcome.exception() if retry_state.outcome else None
+		if isinstance(error, LLMAPIError) and error.retry_after:
+			delay = max(delay, error.retry_after)
+		return delay
+
+	def _before_retry(self, retry_state: RetryCallState) -> None:
+		self._retries += 1
+		error = retry_state.outcome.exception() if retry_state.outcome else None
+		if isinstance(error, LLMAPIError) and error.status_code == 429:
+			self._rate_limited += 1
+		logger.warning(
+			f"LLM request failed ({error}), retry {retry_state.attempt_number}/{self.max_retries} "
+			f"in {retry_state.next_action.sleep:.1f}s"
+		)
+
+	async def run(self, call: Callable[[], Awaitable[T]], priority: int = PRIORITY_INTERACTIVE) -> T:
+		"""
+		Выполнить запрос к LLM через очередь
+
+		Args:
+			call: Функция без аргументов, возвращающая корутину запроса
+			priority: PRIORITY_INTERACTIVE или PRIORITY_BACKGROUND
+		"""
+		try:
+			async for attempt in AsyncRetrying(
+				retry=retry_if_exception(is_retryable_error),
+				stop=stop_after_attempt(self.max_retries + 1),
+				wait=self._wait_before_retry,
+				before_sleep=self._before_retry,
+				reraise=True,
+			):
+				with attempt:
+					return await self._run_once(call, priority)
+		except Exception:
+			self._failures += 1
+			raise
+
+	def get_metrics(self) -> Dict[str, Any]:
+		"""Текущее состояние очереди и статистика ожидания (по последним 500 запросам)"""
+		queued: Dict[str, int] = {}
+		for priority, _, future in self._waiters:
+			if not future.done():
+				name = PRIORITY_NAMES.get(priority, str(priority))
+				queued[name] = queued.get(name, 0) + 1
+		waits = sorted(self._wait_times)
+		return {
+			"queue_depth": sum(queued.values()),
+			"queue_by_priority": queued,
+			"active": self._active,
+			"max_concurrency": self.max_concurrency,
+			"requests": self._requests,
+			"retries": self._retries,
+			"rate_limited": self._rate_limited,
+			"failures": self._failures,
+			"wait_avg_ms": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+			"wait_p95_ms": round(waits[max(0, int(len(waits) * 0.95) - 1)] * 1000, 1) if waits else 0.0,
+			"wait_max_ms": round(waits[-1] * 1000, 1) if waits else 0.0,
+		}
+
+
+llm_scheduler = LLMScheduler(
+	max_concurrency=settings.LLM_MAX_CONCURRENCY,
+	requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+	burst=settings.LLM_BURST,
+	max_retries=settings.LLM_MAX_RETRIES,
+)
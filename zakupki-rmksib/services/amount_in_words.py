@@ -0,0 +1,149 @@
+"""
+Разбор сумм прописью ("Двадцать тысяч восемьсот тринадцать рублей 65 копеек")
+
+Текст разбивается на слова и числа одним регулярным выражением, слова проходят через конечный
+автомат: числительные собираются в число (сотни, десятки, единицы и разряды тысяча/миллион/миллиард),
+слово "рубль" в любой форме завершает сумму, после него читаются копейки цифрами или прописью.
+Время разбора линейно по длине текста.
+"""
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Числительные: слово -> (значение, позиция в группе из трех разрядов, позиция, которую слово оставляет)
+# Позиции: 3 - сотни, 2 - десятки, 1 - единицы; 10-19 занимают и десятки, и единицы
+_HUNDREDS = {
+    'сто': 100, 'двести': 200, 'триста': 300, 'четыреста': 400, 'пятьсот': 500,
+    'шестьсот': 600, 'семьсот': 700, 'восемьсот': 800, 'девятьсот': 900,
+}
+_TENS = {
+    'двадцать': 20, 'тридцать': 30, 'сорок': 40, 'пятьдесят': 50,
+    'шестьдесят': 60, 'семьдесят': 70, 'восемьдесят': 80, 'девяносто': 90,
+}
+_TEENS = {
+    'десять': 10, 'одиннадцать': 11, 'двенадцать': 12, 'тринадцать': 13, 'четырнадцать': 14,
+    'пятнадцать': 15, 'шестнадцать': 16, 'семнадцать': 17, 'восемнадцать': 18, 'девятнадцать': 19,
+}
+_UNITS = {
+    'один': 1, 'одна': 1, 'одно': 1, 'одну': 1, 'два': 2, 'две': 2, 'три': 3, 'четыре': 4,
+    'пять': 5, 'шесть': 6, 'семь': 7, 'восемь': 8, 'девять': 9,
+}
+
+NUMBER_WORDS: Dict[str, Tuple[int, int, int]] = {}
+for _words, _slot, _next_slot in ((_HUNDREDS, 3, 3), (_TENS, 2, 2), (_TEENS, 2, 1), (_UNITS, 1, 1)):
+    NUMBER_WORDS.update({word: (value, _slot, _next_slot) for word, value in _words.items()})
+
+# Разряды во всех формах
+SCALE_WORDS: Dict[str, int] = {
+    'тысяча': 1000, 'тысячи': 1000, 'тысяч': 1000, 'тысячу': 1000,
+    'миллион': 1000000, 'миллиона': 1000000, 'миллионов': 1000000,
+    'миллиард': 1000000000, 'миллиарда': 1000000000, 'миллиардов': 1000000000,
+}
+
+ZERO_WORDS = {'ноль', 'нуль'}
+RUBLE_WORDS = {'рубль', 'рубля', 'рублей', 'руб'}
+KOPECK_WORDS = {'копейка', 'копейки', 'копеек', 'копейку', 'коп'}
+
+# Слова и числа; все остальное (пробелы, переносы строк, знаки препинания) - разделители
+_TOKEN_RE = re.compile(r'[а-яё]+|\d+')
+
+
+class _NumberBuilder:
+    """Число прописью, собираемое по одному слову"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.total = 0  # Закрытые разряды (тысячи, миллионы, миллиарды)
+        self.group = 0  # Текущая группа до тысячи
+        self.slot = 4  # Следующее слово группы должно занимать позицию меньше этой
+        self.scale = 10 ** 12  # Следующий разряд должен быть меньше этого
+        self.words = 0
+
+    @property
+    def value(self) -> int:
+        return self.total + self.group
+
+    def add_number(self, value: int, slot: int, next_slot: int) -> bool:
+        """Добавить числительное; False, если слово не продолжает число (например, "два три")"""
+        if slot >= self.slot:
+            return False
+        self.group += value
+        self.slot = next_slot
+        self.words += 1
+        return True
+
+    def add_scale(self, scale: int) -> bool:
+        if scale >= self.scale:
+            return False
+        self.total += (self.group or 1) * scale
+        self.group = 0
+        self.slot = 4
+        self.scale = scale
+        self.words += 1
+        return True
+
+
+def _read_kopecks(tokens: List[str], start: int) -> Optional[int]:
+    """Копейки после слова "рубль": "65 копеек" или "шестьдесят пять копеек" """
+    if start >= len(tokens):
+        return None
+    token = tokens[start]
+    followed_by_kopecks = start + 1 < len(tokens) and tokens[start + 1] in KOPECK_WORDS
+    if token.isdigit():
+        return int(token) if len(token) <= 2 and followed_by_kopecks else None
+    if token in ZERO_WORDS:
+        return 0 if followed_by_kopecks else None
+    number = _NumberBuilder()
+    index = start
+    while index < len(tokens) and tokens[index] in NUMBER_WORDS:
+        if not number.add_number(*NUMBER_WORDS[tokens[index]]):
+            return None
+        index += 1
+    if number.words and number.value < 100 and index < len(tokens) and tokens[index] in KOPECK_WORDS:
+        return number.value
+    return None
+
+
+def iter_amounts_in_words(text: str) -> Iterator[Tuple[float, bool]]:
+    """
+    Суммы прописью в тексте по порядку
+
+    Yields:
+        (сумма, указаны ли копейки)
+    """
+    tokens = _TOKEN_RE.findall(text.lower())
+    number = _NumberBuilder()
+    for index, token in enumerate(tokens):
+        if token in NUMBER_WORDS:
+            if not number.add_number(*NUMBER_WORDS[token]):
+                # Слово начинает новое число
+                number.reset()
+                number.add_number(*NUMBER_WORDS[token])
+        elif token in SCALE_WORDS:
+            if not number.add_scale(SCALE_WORDS[token]):
+                number.reset()
+                number.add_scale(SCALE_WORDS[token])
+        elif token in RUBLE_WORDS:
+            if number.words and number.value > 0:
+                kopecks = _read_kopecks(tokens, index + 1)
+                yield round(number.value + (kopecks or 0) / 100, 2), kopecks is not None
+            number.reset()
+        else:
+            number.reset()
+
+
+def parse_amount_in_words(text: str) -> Optional[float]:
+    """
+    Сумма прописью из текста документа: первая сумма с копейками, иначе первая найденная
+
+    Returns:
+        Сумма в рублях (с копейками в дробной части) или None, если суммы прописью нет
+    """
+    first = None
+    for amount, has_kopecks in iter_amounts_in_words(text):
+        if has_kopecks:
+            return amount
+        if first is None:
+            first = amount
+    return first
@@ -0,0 +1,163 @@
+"""
+Пакетная загрузка коммерческих предложений
+
+Файлы КП (альбом документов Telegram или содержимое ZIP-архива) скачиваются, разбираются
+и сохраняются параллельно, не более CP_BATCH_CONCURRENCY файлов одновременно. Разбор текста
+выполняется в пуле процессов extraction_pool, запросы к LLM ограничены LLM_MAX_CONCURRENCY,
+поэтому большой пакет не блокирует бота для остальных пользователей.
+"""
+import asyncio
+import io
+import re
+import uuid
+import zipfile
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from loguru import logger
+from config.settings import settings
+from database import async_session_maker
+from database.repositories.commercial_proposal_repository import CommercialProposalRepository
+
+# Флаг ZIP: имя файла в UTF-8 (иначе архиваторы Windows пишут имена в cp866)
+_ZIP_UTF8_FLAG = 0x800
+
+
+@dataclass
+class CPBatchItem:
+    """Файл пакета и результат его обработки"""
+    filename: str
+    content: Optional[bytes] = None  # Содержимое файла (например, из архива)
+    load: Optional[Callable[[], Awaitable[bytes]]] = None  # Или его получение (скачивание из Telegram)
+    file_path: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)  # Результат extract_cp_data_combined
+    proposal_id: Optional[int] = None
+    error: Optional[str] = None
+
+
+def _zip_member_name(info: zipfile.ZipInfo) -> str:
+    if info.flag_bits & _ZIP_UTF8_FLAG:
+        return info.filename
+    try:
+        return info.filename.encode("cp437").decode("cp866")
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return info.filename
+
+
+def unpack_zip(content: bytes) -> Tuple[List[Tuple[str, bytes]], List[str]]:
+    """
+    Файлы КП из ZIP-архива
+
+    Returns:
+        (список (имя файла, содержимое), имена пропущенных файлов: неподдерживаемый формат
+        или больше CP_BATCH_MAX_FILES файлов)
+
+    Raises:
+        ValueError: если архив поврежден или распакованные файлы больше CP_ZIP_MAX_UNPACKED_MB
+    """
+    from services.documentation import is_supported_format
+    files: List[Tuple[str, bytes]] = []
+    skipped: List[str] = []
+    max_unpacked = settings.CP_ZIP_MAX_UNPACKED_MB * 1024 * 1024
+    unpacked = 0
+    try:
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            for info in archive.infolist():
+                name = _zip_member_name(info)
+                basename = PurePosixPath(name.replace("\\", "/")).name
+                # Папки и служебные файлы macOS
+                if info.is_dir() or name.startswith("__MACOSX/") or basename.startswith("."):
+                    continue
+                if not is_supported_format(basename) or len(files) >= settings.CP_BATCH_MAX_FILES:
+                    skipped.append(basename)
+                    continue
+                unpacked += info.file_size
+                if unpacked > max_unpacked:
+                    raise ValueError(f"Распакованные файлы больше {settings.CP_ZIP_MAX_UNPACKED_MB} МБ")
+                files.append((basename, archive.read(info)))
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Поврежденный ZIP-архив: {e}") from e
+    return files, skipped
+
+
+async def _process_item(item: CPBatchItem, index: int, user_id: int) -> None:
+    from services.documentation import save_documentation_file, extract_text_from_file
+    from services.cp_data_extraction import extract_cp_data_combined
+
+    content = item.content if item.content is not None else await item.load()
+    item.content = None
+    if not content:
+        raise ValueError("Получен пустой файл")
+
+    file_ext = Path(item.filename).suffix.lower()
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = re.sub(r'[^\w\-_\.]', '_', f"CP_{timestamp}_{index:03d}_{uuid.uuid4().hex[:6]}{file_ext}")
+    item.file_path = await save_documentation_file(content, filename, lot_number=None)
+
+    proposal_text = await extract_text_from_file(item.file_path)
+    if not proposal_text or proposal_text.startswith("[Ошибка"):
+        proposal_text = None
+
+    item.data = await extract_cp_data_combined(
+        proposal_text=proposal_text or '',
+        file_path=item.file_path,
+        use_llm_fallback=True
+    )
+
+    async with async_session_maker() as session:
+        proposal = await CommercialProposalRepository(session).create(
+            supplier_name=item.data.get("supplier_name") or "Поставщик (не определен)",
+            supplier_inn=None,
+            proposal_file_path=item.file_path,
+            proposal_text=proposal_text,
+            product_price=float(item.data.get("total_amount") or 0.0),
+            # Транспортные расходы в пакетном режиме не запрашиваются
+            delivery_cost=None,
+            other_conditions=None,
+            items_count=int(item.data["items_count"]) if item.data.get("items_count") else None,
+            created_by=user_id
+        )
+    item.proposal_id = proposal.id
+
+
+async def process_cp_batch(
+    items: List[CPBatchItem],
+    user_id: int,
+    on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None
+) -> List[CPBatchItem]:
+    """
+    Разобрать и сохранить КП пакета параллельно (не более CP_BATCH_CONCURRENCY файлов одновременно)
+
+    Ошибка в одном файле не прерывает обработку остальных: она сохраняется в item.error.
+
+    Args:
+        items: Файлы пакета
+        user_id: Пользователь, загрузивший КП
+        on_progress: Вызывается после каждого обработанного файла с (обработано, всего)
+
+    Returns:
+        items в исходном порядке
+    """
+    semaphore = asyncio.Semaphore(max(1, settings.CP_BATCH_CONCURRENCY))
+    done = 0
+
+    async def run(index: int, item: CPBatchItem) -> None:
+        nonlocal done
+        async with semaphore:
+            try:
+                await _process_item(item, index, user_id)
+            except Exception as e:
+                logger.error(f"Error processing CP file {item.filename}: {e}", exc_info=True)
+                item.error = str(e) or type(e).__name__
+        done += 1
+        if on_progress is not None:
+            try:
+                await on_progress(done, len(items))
+            except Exception as e:
+                logger.debug(f"Could not report CP batch progress: {e}")
+
+    await asyncio.gather(*(run(index, item) for index, item in enumerate(items, 1)))
+    saved = sum(1 for item in items if item.proposal_id)
+    logger.info(f"CP batch of {len(items)} files processed for user {user_id}: {saved} saved")
+    return items
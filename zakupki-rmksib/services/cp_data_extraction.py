@@ -1,9 +1,12 @@
 """Сервис для улучшенного извлечения данных из коммерческих предложений"""
 import re
 import logging
-from typing import Optional, Dict, Tuple, Union
+from dataclasses import dataclass
+from typing import Any, Optional, Dict, List, Tuple, Union
 from pathlib import Path
 from loguru import logger
+from config.settings import settings
+from services.amount_in_words import parse_amount_in_words
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +36,252 @@ TOTAL_AMOUNT_MARKERS = [
 ]
 
 
+
+# Строки, в которых не ищется поставщик
+SUPPLIER_SKIP_KEYWORDS = ['базис поставки', 'fca', 'инкотермс', 'доставка в тк', 'транспортная компания']
+
+# Общие слова, которые не являются названием поставщика
+GENERIC_SUPPLIER_WORDS = ['поставщик', 'исполнитель', 'продавец', 'организация', 'компания', 'фирма']
+
+# Организационные формы в названии поставщика
+ORG_FORMS = ['ооо', 'оао', 'зао', 'пао', 'ип', 'ао', 'пao']
+
+# Строки с реквизитами (числа в них - счета, ИНН, БИК, а не суммы)
+REQUISITES_KEYWORDS = [
+    'р/с', 'р/счет', 'расчетный счет', 'счет №',
+    'инн', 'кпп', 'бик', 'банк', 'банковские реквизиты',
+    'корр. счет', 'корреспондентский счет'
+]
+
+# Признаки суммы прописью
+AMOUNT_IN_WORDS_KEYWORDS = ['рублей', 'рубля', 'рубль', 'копеек', 'копейки', 'копейка',
+                            'тысяч', 'миллион', 'восемнадцать', 'девятнадцать', 'двадцать']
+
+# Заголовок таблицы товаров в тексте и строки итогов в ней
+ITEMS_TABLE_MARKERS = ['наименование', 'товар', 'позиция', 'артикул', 'код', 'цена', 'количество', 'сумма']
+ITEMS_TABLE_START_MARKERS = ITEMS_TABLE_MARKERS + ['№', 'номер']
+ITEMS_TABLE_TOTAL_WORDS = ['итого', 'всего', 'сумма', '---', '===']
+
+# Текстовые указания количества наименований (проверяются по порядку)
+ITEMS_COUNT_PATTERNS = [
+    # "Всего наименований 3", "Всего наименований: 3", "Всего наименований 3,"
+    r'всего\s+наименований[:\s,]+(\d+)',
+    r'всего\s+наименований\s*[:\s,]*\s*(\d+)',
+    r'всего\s+наименований[:\s]*(\d+)',
+    r'количество\s+наименований[:\s,]+(\d+)',
+    r'количество\s+наименований\s*[:\s,]*\s*(\d+)',
+    r'наименований\s+всего[:\s,]+(\d+)',
+    r'наименований\s+всего\s*[:\s,]*\s*(\d+)',
+    r'всего\s+позиций[:\s,]+(\d+)',
+    r'количество\s+позиций[:\s,]+(\d+)',
+    r'позиций\s+всего[:\s,]+(\d+)',
+    r'всего\s+товаров[:\s,]+(\d+)',
+    r'количество\s+товаров[:\s,]+(\d+)',
+    r'товаров\s+всего[:\s,]+(\d+)',
+    r'всего\s+единиц[:\s,]+(\d+)',
+    r'количество\s+единиц[:\s,]+(\d+)',
+]
+
+# Уверенность в значении поля по способу, которым оно найдено (0..1)
+FIELD_CONFIDENCE = {
+    "supplier_name": {"excel": 0.9, "marker": 0.9, "marker_next_line": 0.75, "org_form": 0.5, "llm": 0.6},
+    "total_amount": {"excel": 0.9, "words": 0.95, "marker": 0.8, "marker_next_line": 0.65, "pattern": 0.4, "llm": 0.6},
+    "items_count": {"excel": 0.75, "text": 0.9, "numbers": 0.7, "rows": 0.4, "llm": 0.6},
+}
+
+
+def _alternation(words: List[str]) -> "re.Pattern[str]":
+    """Одно выражение для поиска любого из слов (вместо проверки слов по одному)"""
+    return re.compile('|'.join(re.escape(word) for word in words))
+
+
+_SUPPLIER_SKIP_RE = _alternation(SUPPLIER_SKIP_KEYWORDS)
+_SUPPLIER_MARKER_RE = _alternation(SUPPLIER_MARKERS)
+_TOTAL_MARKER_RE = _alternation(TOTAL_AMOUNT_MARKERS)
+_EXCLUDE_RE = _alternation(EXCLUDE_KEYWORDS)
+_ORG_FORM_RE = _alternation(ORG_FORMS)
+_REQUISITES_RE = _alternation(REQUISITES_KEYWORDS)
+_AMOUNT_IN_WORDS_RE = _alternation(AMOUNT_IN_WORDS_KEYWORDS)
+_ITEMS_TABLE_RE = _alternation(ITEMS_TABLE_MARKERS)
+_ITEMS_TABLE_START_RE = _alternation(ITEMS_TABLE_START_MARKERS)
+_ITEMS_TABLE_TOTAL_RE = _alternation(ITEMS_TABLE_TOTAL_WORDS)
+_ITEMS_COUNT_HINT_RE = _alternation(['наименований', 'позиций', 'товаров', 'единиц'])
+_ITEMS_COUNT_RES = [re.compile(pattern, re.IGNORECASE) for pattern in ITEMS_COUNT_PATTERNS]
+_SEQUENCE_NUMBER_RE = re.compile(r'^(\d+)[\.\)\s]+')
+_HAS_LETTERS_RE = re.compile(r'[а-яёa-z]')
+_HAS_DATA_RE = re.compile(r'[а-яёa-z\d]')
+_SYMBOLS_ONLY_RE = re.compile(r'^[\W\d]+$')
+_LINE_AMOUNT_RES = [
+    re.compile(r'(\d{1,3}(?:\s\d{3})+(?:[.,]\d{2})?)'),  # С пробелами: "20 813,65"
+    re.compile(r'(\d{1,3}(?:\d{3})+(?:[.,]\d{2})?)'),    # Без пробелов: "20813.65"
+    re.compile(r'(\d{4,10}(?:[.,]\d{2})?)'),             # Числа от 1000 до 10 цифр с копейками
+]
+# Суммы с валютой или рядом с ключевыми словами (если не найдены ни прописью, ни по маркерам)
+_TEXT_AMOUNT_RES = [
+    re.compile(r'(\d{1,3}(?:\s\d{3})+(?:[.,]\d{2})?)\s*(?:руб|₽|р\.|рублей)', re.IGNORECASE),
+    re.compile(r'(?:итого|сумма|стоимость|к оплате|всего)[:\s]+(\d{1,3}(?:\s\d{3})*(?:[.,]\d{2})?)', re.IGNORECASE),
+]
+
+
+@dataclass
+class CPField:
+    """Значение поля КП, способ, которым оно найдено, и уверенность в нем"""
+    value: Any = None
+    source: Optional[str] = None
+    confidence: float = 0.0
+
+
+def _field(name: str, value: Any, source: str) -> CPField:
+    return CPField(value=value, source=source, confidence=FIELD_CONFIDENCE[name][source])
+
+
+class CPTextScan:
+    """
+    Извлечение поставщика, итоговой суммы и количества наименований из текста КП за один проход
+
+    Текст приводится к нижнему регистру и делится на строки один раз, маркеры ищутся
+    предкомпилированными выражениями. Результат - в fields: значение каждого поля со способом,
+    которым оно найдено, и уверенностью (FIELD_CONFIDENCE).
+    """
+
+    def __init__(self, text: str):
+        self.text = text or ''
+        self.text_lower = self.text.lower()
+        self.lines = self.text.split('\n')
+        self.lines_lower = self.text_lower.split('\n')
+        # В тексте есть признаки суммы прописью
+        self.has_amount_in_words = bool(_AMOUNT_IN_WORDS_RE.search(self.text_lower))
+        self.fields: Dict[str, CPField] = {
+            "supplier_name": CPField(),
+            "total_amount": CPField(),
+            "items_count": CPField(),
+        }
+        if self.text:
+            self._scan()
+
+    def _scan(self) -> None:
+        suppliers: Dict[str, str] = {}
+        amounts: Dict[str, float] = {}
+        # Таблица товаров: порядковые номера и строки с данными после последнего заголовка
+        in_numbered_table = False
+        max_number = 0
+        in_table = False
+        table_rows = 0
+
+        for i, line_lower in enumerate(self.lines_lower):
+            if i < 50 and "marker" not in suppliers:
+                self._scan_supplier_line(i, line_lower, suppliers)
+            if "marker" not in amounts and _TOTAL_MARKER_RE.search(line_lower):
+                self._scan_total_line(i, line_lower, amounts)
+
+            line_lower = line_lower.strip()
+            is_total_line = _ITEMS_TABLE_TOTAL_RE.search(line_lower)
+            if _ITEMS_TABLE_START_RE.search(line_lower):
+                in_numbered_table = True
+                max_number = 0  # Сбрасываем счетчик при новом заголовке таблицы
+            elif in_numbered_table and not is_total_line:
+                # Число + точка/скобка в начале строки с текстом (например, "1. Кабель", "1) Кабель")
+                match = _SEQUENCE_NUMBER_RE.match(self.lines[i].strip())
+                if match and _HAS_LETTERS_RE.search(line_lower):
+                    number = int(match.group(1))
+                    if 1 <= number <= 10000:
+                        max_number = max(max_number, number)
+            if _ITEMS_TABLE_RE.search(line_lower):
+                in_table = True
+                table_rows = 0
+            elif in_table and not is_total_line and _HAS_DATA_RE.search(line_lower):
+                table_rows += 1
+
+        for source in ("marker", "marker_next_line", "org_form"):
+            if source in suppliers:
+                self.fields["supplier_name"] = _field("supplier_name", suppliers[source], source)
+                break
+
+        self.fields["total_amount"] = self._total_amount(amounts)
+
+        items_count = self._items_count_from_text()
+        if items_count:
+            self.fields["items_count"] = _field("items_count", items_count, "text")
+        elif max_number:
+            self.fields["items_count"] = _field("items_count", max_number, "numbers")
+        elif table_rows:
+            self.fields["items_count"] = _field("items_count", table_rows, "rows")
+
+    def _scan_supplier_line(self, i: int, line_lower: str, found: Dict[str, str]) -> None:
+        """Поставщик: после маркера в той же строке, в строке после маркера или строка с организационной формой"""
+        if _SUPPLIER_SKIP_RE.search(line_lower):
+            return
+        line = self.lines[i].strip()
+        if _SUPPLIER_MARKER_RE.search(line_lower):
+            if ':' in line:
+                # "Поставщик: ООО Компания"
+                supplier = line.split(':', 1)[1].strip()
+                if _is_valid_supplier_name(supplier):
+                    found.setdefault("marker", supplier[:200])
+            elif i + 1 < len(self.lines) and "marker_next_line" not in found:
+                supplier = self.lines[i + 1].strip()
+                if _is_valid_supplier_name(supplier):
+                    found["marker_next_line"] = supplier[:200]
+        if "org_form" not in found and _is_valid_supplier_name(line):
+            found["org_form"] = line[:200]
+
+    def _scan_total_line(self, i: int, line_lower: str, found: Dict[str, float]) -> None:
+        """Сумма по маркеру: после маркера, в строке с маркером или в следующей строке"""
+        line = self.lines[i]
+        after_marker_line = 'на сумму' in line_lower or 'сумма:' in line_lower or 'сумма ' in line_lower
+        for marker in TOTAL_AMOUNT_MARKERS:
+            marker_pos = line_lower.find(marker)
+            if marker_pos < 0:
+                continue
+            if after_marker_line:
+                # Для маркеров "на сумму", "сумма:" и т.д. сумма - после маркера
+                amount = _extract_amount_from_line_safe(line[marker_pos + len(marker):])
+                if amount and _is_valid_amount(amount):
+                    found["marker"] = amount
+                    return
+            amount = _extract_amount_from_line_safe(line)
+            if amount and _is_valid_amount(amount):
+                found["marker"] = amount
+                return
+            if "marker_next_line" not in found and i + 1 < len(self.lines):
+                amount = _extract_amount_from_line_safe(self.lines[i + 1])
+                if amount and _is_valid_amount(amount):
+                    found["marker_next_line"] = amount
+
+    def _total_amount(self, amounts: Dict[str, float]) -> CPField:
+        # Сумма прописью - самый надежный способ
+        if self.has_amount_in_words:
+            amount = parse_amount_in_words(self.text)
+            if amount and _is_valid_amount(amount):
+                return _field("total_amount", amount, "words")
+        for source in ("marker", "marker_next_line"):
+            if source in amounts:
+                return _field("total_amount", amounts[source], source)
+        # Наибольшая из сумм с валютой или рядом с ключевыми словами
+        found = []
+        for pattern in _TEXT_AMOUNT_RES:
+            for match in pattern.finditer(self.text):
+                try:
+                    amount = float(match.group(1).replace(' ', '').replace(',', '.'))
+                except ValueError:
+                    continue
+                if _is_valid_amount(amount):
+                    found.append(amount)
+        if found:
+            return _field("total_amount", max(found), "pattern")
+        return CPField()
+
+    def _items_count_from_text(self) -> Optional[int]:
+        if not _ITEMS_COUNT_HINT_RE.search(self.text_lower):
+            return None
+        for pattern in _ITEMS_COUNT_RES:
+            match = pattern.search(self.text_lower)
+            if match:
+                count = int(match.group(1))
+                if 1 <= count <= 10000:  # Разумные пределы
+                    return count
+        return None
+
 def extract_supplier_name_improved(text: str) -> Optional[str]:
     """
     Улучшенное извлечение названия поставщика из текста КП
@@ -45,54 +294,7 @@ def extract_supplier_name_improved(text: str) -> Optional[str]:
     """
     if not text:
         return None
-    
-    lines = text.split('\n')
-    candidates = []  # Список кандидатов с приоритетом
-    
-    # Ищем по маркерам в первых 50 строках
-    for i, line in enumerate(lines[:50]):
-        line_lower = line.lower().strip()
-        line_original = line.strip()
-        
-        # Пропускаем строки с исключающими ключевыми словами
-        skip_line = False
-        for exclude in ['базис поставки', 'fca', 'инкотермс', 'доставка в тк', 'транспортная компания']:
-            if exclude in line_lower:
-                skip_line = True
-                break
-        if skip_line:
-            continue
-        
-        # Проверяем наличие маркеров поставщика
-        for marker in SUPPLIER_MARKERS:
-            if marker in line_lower:
-                # Извлекаем название после маркера
-                if ':' in line_original:
-                    # Если маркер в той же строке (например, "Поставщик: ООО Компания")
-                    parts = line_original.split(':', 1)
-                    if len(parts) > 1:
-                        supplier = parts[1].strip()
-                        if _is_valid_supplier_name(supplier):
-                            # Приоритет: маркер в той же строке
-                            candidates.append((supplier[:200], 1))
-                else:
-                    # Если маркер отдельно, берем следующую строку
-                    if i + 1 < len(lines):
-                        supplier = lines[i + 1].strip()
-                        if _is_valid_supplier_name(supplier):
-                            # Приоритет: маркер отдельно
-                            candidates.append((supplier[:200], 2))
-        
-        # Также ищем организационные формы напрямую (низкий приоритет)
-        if _is_valid_supplier_name(line_original):
-            candidates.append((line_original[:200], 3))
-    
-    # Возвращаем кандидата с наивысшим приоритетом (меньший номер = выше приоритет)
-    if candidates:
-        candidates.sort(key=lambda x: x[1])
-        return candidates[0][0]
-    
-    return None
+    return CPTextScan(text).fields["supplier_name"].value
 
 
 def _is_valid_supplier_name(name: str) -> bool:
@@ -105,19 +307,15 @@ def _is_valid_supplier_name(name: str) -> bool:
     name_lower = name.lower().strip()
     
     # Не должна быть просто "поставщик", "исполнитель" и т.д.
-    if name_lower in ['поставщик', 'исполнитель', 'продавец', 'организация', 'компания', 'фирма']:
+    if name_lower in GENERIC_SUPPLIER_WORDS:
         return False
     
     # Не должна содержать исключающие ключевые слова (проверяем в первую очередь)
-    for exclude in EXCLUDE_KEYWORDS:
-        if exclude in name_lower:
-            return False
+    if _EXCLUDE_RE.search(name_lower):
+        return False
     
     # Должна содержать организационную форму
-    org_forms = ['ооо', 'оао', 'зао', 'пао', 'ип', 'ао', 'пao']
-    has_org_form = any(form in name_lower for form in org_forms)
-    
-    if not has_org_form:
+    if not _ORG_FORM_RE.search(name_lower):
         return False
     
     # Не должна быть слишком короткой (после фильтрации)
@@ -125,7 +323,7 @@ def _is_valid_supplier_name(name: str) -> bool:
         return False
     
     # Не должна быть просто иконкой/символами
-    if re.match(r'^[\W\d]+$', name):
+    if _SYMBOLS_ONLY_RE.match(name):
         return False
     
     # Не должна начинаться с маркеров без названия (например, "Исполнитель:" без названия)
@@ -135,151 +333,6 @@ def _is_valid_supplier_name(name: str) -> bool:
     return True
 
 
-def _parse_amount_in_words(text: str) -> Optional[float]:
-    """
-    Парсит сумму, написанную прописью (например, "Двадцать тысяч восемьсот тринадцать рублей 65 копеек")
-    """
-    logger.info(f"🔍 Attempting to parse amount in words from text (length: {len(text)} chars)")
-    # Логируем первые 500 символов текста для отладки
-    text_preview = text[:500] if len(text) > 500 else text
-    logger.debug(f"Text preview: {text_preview}...")
-    text_lower = text.lower()
-    
-    # Словарь для чисел
-    numbers = {
-        'ноль': 0, 'один': 1, 'одна': 1, 'два': 2, 'две': 2, 'три': 3, 'четыре': 4, 'пять': 5,
-        'шесть': 6, 'семь': 7, 'восемь': 8, 'девять': 9, 'десять': 10,
-        'одиннадцать': 11, 'двенадцать': 12, 'тринадцать': 13, 'четырнадцать': 14,
-        'пятнадцать': 15, 'шестнадцать': 16, 'семнадцать': 17, 'восемнадцать': 18,
-        'девятнадцать': 19, 'двадцать': 20, 'тридцать': 30, 'сорок': 40,
-        'пятьдесят': 50, 'шестьдесят': 60, 'семьдесят': 70, 'восемьдесят': 80,
-        'девяносто': 90, 'сто': 100, 'двести': 200, 'триста': 300, 'четыреста': 400,
-        'пятьсот': 500, 'шестьсот': 600, 'семьсот': 700, 'восемьсот': 800,
-        'девятьсот': 900
-    }
-    
-    multipliers = {
-        'тысяч': 1000, 'тысяча': 1000, 'тысячи': 1000,
-        'миллион': 1000000, 'миллиона': 1000000, 'миллионов': 1000000,
-        'миллиард': 1000000000, 'миллиарда': 1000000000, 'миллиардов': 1000000000
-    }
-    
-    # Ищем паттерн: число прописью + "рублей" + копейки
-    # Пример: "Двадцать тысяч восемьсот тринадцать рублей 65 копеек"
-    # Пример: "Восемнадцать тысяч девятьсот тридцать два рубля 49 копеек"
-    # Более гибкий паттерн, который ищет сумму прописью до слова "рублей"
-    
-    # Сначала ищем с копейками (более точный паттерн)
-    # Ищем: слова (минимум 3 слова для составных чисел) + "рублей"/"рубля"/"рубль" + цифры + "копеек"/"копейки"/"копейка"
-    # Улучшенный паттерн: ищем более гибко, учитывая возможные пробелы и знаки препинания
-    
-    # Более агрессивный поиск - ищем любую строку с числами прописью + "рублей" + копейки
-    # Пробуем разные варианты форматирования
-    patterns = [
-        # Паттерн 1: стандартный - минимум 2 слова (для "Двадцать тысяч")
-        r'([а-яё]+(?:\s+[а-яё]+){1,}(?:\s+тысяч[аи]?)?(?:\s+[а-яё]+)*\s+рубл[ейя]?)\s+(\d{1,2})\s+копе[екй]',
-        # Паттерн 2: с знаками препинания между "рублей" и копейками
-        r'([а-яё]+(?:\s+[а-яё]+){1,}(?:\s+тысяч[аи]?)?(?:\s+[а-яё]+)*\s+рубл[ейя]?)[\s.,:;]+(\d{1,2})\s+копе[екй]',
-        # Паттерн 3: очень гибкий - любая последовательность слов до "рублей"
-        r'([а-яё]+(?:\s+[а-яё]+){0,}\s+рубл[ейя]?)[\s.,:;]+(\d{1,2})\s+копе[екй]',
-        # Паттерн 4: с учетом возможных пробелов и переносов строк
-        r'([а-яё]+(?:\s+[а-яё]+){1,}(?:\s+тысяч[аи]?)?(?:\s+[а-яё]+)*\s+рубл[ейя]?)[\s\n.,:;]+(\d{1,2})\s+копе[екй]',
-        # Паттерн 5: ищем конкретно "Восемнадцать тысяч девятьсот тридцать два рубля 49 копеек"
-        r'(восемнадцать\s+тысяч\s+девятьсот\s+тридцать\s+два\s+рубля)\s+(\d{1,2})\s+копе[екй]',
-    ]
-    
-    match = None
-    for i, pattern in enumerate(patterns, 1):
-        match = re.search(pattern, text_lower, re.IGNORECASE | re.MULTILINE)
-        if match:
-            logger.info(f"✅ Pattern {i} (with kopecks) matched: '{match.group(0)[:150]}...'")
-            break
-        else:
-            logger.debug(f"Pattern {i} (with kopecks): no match")
-    
-    kopecks = 0
-    if match:
-        words_part = match.group(1)
-        try:
-            kopecks = int(match.group(2))
-            logger.debug(f"Found amount in words with kopecks: '{words_part}' + {kopecks} kopecks")
-        except (ValueError, IndexError):
-            kopecks = 0
-            logger.warning(f"Failed to parse kopecks from match: {match.groups()}")
-    else:
-        # Пробуем без копеек (более агрессивный поиск)
-        patterns_no_kopecks = [
-            # Паттерн 1: минимум 2 слова (для "Двадцать тысяч")
-            r'([а-яё]+(?:\s+[а-яё]+){1,}(?:\s+тысяч[аи]?)?(?:\s+[а-яё]+)*\s+рубл[ейя]?)',
-            # Паттерн 2: очень гибкий - любая последовательность
-            r'([а-яё]+(?:\s+[а-яё]+){0,}\s+рубл[ейя]?)',
-            # Паттерн 3: конкретно "Восемнадцать тысяч девятьсот тридцать два рубля"
-            r'(восемнадцать\s+тысяч\s+девятьсот\s+тридцать\s+два\s+рубля)',
-        ]
-        
-        for i, pattern in enumerate(patterns_no_kopecks, 1):
-            match = re.search(pattern, text_lower, re.IGNORECASE | re.MULTILINE)
-            if match:
-                logger.info(f"✅ Pattern {i} (without kopecks) matched: '{match.group(0)[:150]}...'")
-                break
-            else:
-                logger.debug(f"Pattern {i} (without kopecks): no match")
-        
-        if not match:
-            logger.warning("❌ No amount in words pattern matched at all")
-            # Пробуем найти любую строку с "рублей" для отладки
-            debug_matches = list(re.finditer(r'[а-яё]+\s+рубл[ейя]?', text_lower))
-            if debug_matches:
-                logger.info(f"Debug: found {len(debug_matches)} matches with 'рублей' in text:")
-                for j, debug_match in enumerate(debug_matches[:5], 1):  # Показываем первые 5
-                    context_start = max(0, debug_match.start() - 100)
-                    context_end = min(len(text_lower), debug_match.end() + 100)
-                    context = text_lower[context_start:context_end]
-                    logger.info(f"  Match {j}: ...{context}...")
-            return None
-        
-        words_part = match.group(1)
-        logger.info(f"Found amount in words without kopecks: '{words_part}'")
-    
-    # Парсим слова - улучшенная логика для составных чисел
-    words = words_part.split()
-    total = 0
-    current = 0
-    
-    for word in words:
-        word = word.strip('.,;:!?()"')
-        
-        if word in numbers:
-            current += numbers[word]
-        elif word in multipliers:
-            multiplier_value = multipliers[word]
-            if current == 0:
-                current = 1
-            # Умножаем текущее значение на множитель и добавляем к общей сумме
-            total += current * multiplier_value
-            current = 0
-        elif word in ['рублей', 'рубля', 'рубль']:
-            # Добавляем оставшееся значение
-            total += current
-            current = 0  # Обнуляем current, чтобы не добавить его снова после цикла
-            break
-    
-    # Если остались необработанные значения (без слова "рублей")
-    # Это нужно только если мы не встретили "рубля" в цикле
-    if current > 0:
-        total += current
-    
-    # Логируем для отладки
-    if total > 0:
-        result = total + (kopecks / 100)
-        logger.info(f"Successfully parsed amount in words: '{words_part}' -> {total} + {kopecks} kopecks = {result}")
-        return result
-    else:
-        logger.warning(f"Failed to parse amount from words: '{words_part}' (total=0)")
-    
-    return None
-
-
 async def _extract_amount_in_words_llm(text: str) -> Optional[float]:
     """
     Извлекает сумму прописью с помощью LLM (fallback)
@@ -350,118 +403,25 @@ async def extract_total_amount_improved(text: str) -> Optional[float]:
     
     Ищет:
     - Сумму прописью (высший приоритет)
-    - В столбце "Итого с НДС"
     - В строках с маркерами суммы
+    - Суммы с валютой
     - Исключает расчетные счета, ИНН, КПП, БИК
+    Если сумма не найдена ни одним способом, а в тексте есть признаки суммы прописью, сумма запрашивается у LLM
     """
     if not text:
         return None
     
-    # ПРИОРИТЕТ 1: Ищем сумму прописью (самый надежный способ - абсолютный приоритет)
-    # Ищем во всем тексте, не только в начале
-    logger.info(f"💰 Extracting total amount from text (length: {len(text)} chars)")
-    
-    # Проверяем, есть ли в тексте слова, связанные с суммой прописью
-    text_lower = text.lower()
-    has_amount_keywords = any(keyword in text_lower for keyword in ['рублей', 'рубля', 'рубль', 'копеек', 'копейки', 'копейка'])
-    has_number_words = any(word in text_lower for word in ['тысяч', 'миллион', 'восемнадцать', 'девятнадцать', 'двадцать'])
-    logger.info(f"Text contains 'рублей/рубля': {has_amount_keywords}, number words: {has_number_words}")
+    scan = CPTextScan(text)
+    total = scan.fields["total_amount"]
+    if total.value is not None:
+        logger.info(f"💰 Total amount {total.value} found by {total.source}")
+        return total.value
     
-    # Если есть признаки суммы прописью, ищем более тщательно
-    if has_amount_keywords or has_number_words:
-        logger.info("🔍 Text contains amount-related keywords, searching for amount in words...")
-        amount_in_words = _parse_amount_in_words(text)
-        if amount_in_words and _is_valid_amount(amount_in_words):
-            logger.info(f"✅ Found amount in words: {amount_in_words} (absolute priority, returning immediately)")
-            return amount_in_words
-        else:
-            logger.warning(f"❌ Amount in words not found or invalid. Attempted value: {amount_in_words}")
-            # Пробуем LLM fallback для суммы прописью
-            logger.info("🤖 Trying LLM fallback to extract amount in words...")
-            amount_llm = await _extract_amount_in_words_llm(text)
-            if amount_llm and _is_valid_amount(amount_llm):
-                logger.info(f"✅ Found amount in words via LLM: {amount_llm}")
-                return amount_llm
-            else:
-                logger.warning(f"❌ LLM also failed to extract amount in words. Attempted value: {amount_llm}")
-    else:
-        logger.warning("⚠️ Text does not contain amount-related keywords, skipping amount in words search")
-    
-    # ПРИОРИТЕТ 2: Ищем по маркерам суммы
-    logger.info("🔍 Searching for amount by markers...")
-    lines = text.split('\n')
-    found_amounts = []
-    
-    for i, line in enumerate(lines):
-        line_lower = line.lower()
-        
-        # Проверяем наличие маркеров суммы
-        for marker in TOTAL_AMOUNT_MARKERS:
-            if marker in line_lower:
-                logger.debug(f"Found marker '{marker}' in line {i}: {line[:100]}...")
-                # Для маркеров "на сумму", "сумма:" и т.д. ищем сумму после маркера
-                if 'на сумму' in line_lower or 'сумма:' in line_lower or 'сумма ' in line_lower:
-                    # Ищем сумму после маркера в той же строке
-                    marker_pos = line_lower.find(marker)
-                    if marker_pos >= 0:
-                        # Берем часть строки после маркера
-                        after_marker = line[marker_pos + len(marker):]
-                        amount = _extract_amount_from_line_safe(after_marker)
-                        if amount and _is_valid_amount(amount):
-                            logger.info(f"💰 Found amount by marker '{marker}': {amount} (line {i})")
-                            found_amounts.append((amount, 1, i))  # Высший приоритет
-                            continue
-                
-                # Для других маркеров ищем число в этой строке или следующей
-                amount = _extract_amount_from_line_safe(line)
-                if amount and _is_valid_amount(amount):
-                    logger.info(f"💰 Found amount by marker '{marker}': {amount} (line {i})")
-                    found_amounts.append((amount, 1, i))  # Приоритет 1 = найдено по маркеру в строке
-                
-                # Проверяем следующую строку
-                if i + 1 < len(lines):
-                    amount = _extract_amount_from_line_safe(lines[i + 1])
-                    if amount and _is_valid_amount(amount):
-                        logger.info(f"💰 Found amount by marker '{marker}': {amount} (line {i+1})")
-                        found_amounts.append((amount, 2, i))  # Приоритет 2 = найдено по маркеру в следующей строке
-    
-    # Если нашли по маркерам, возвращаем первую найденную (наиболее релевантную)
-    if found_amounts:
-        # Сортируем по приоритету (меньший номер = выше приоритет), затем по позиции в тексте
-        found_amounts.sort(key=lambda x: (x[1], x[2]))
-        selected_amount = found_amounts[0][0]
-        logger.warning(f"⚠️ Using amount from markers: {selected_amount} (was not found in words)")
-        return selected_amount
-    
-    # Если не нашли по маркерам, ищем суммы в тексте с ограничениями
-    # Ищем только суммы с указанием валюты или рядом с ключевыми словами
-    logger.info("🔍 Searching for amounts in text by patterns...")
-    all_amounts = []
-    amount_patterns = [
-        r'(\d{1,3}(?:\s\d{3})+(?:[.,]\d{2})?)\s*(?:руб|₽|р\.|рублей)',
-        r'(?:итого|сумма|стоимость|к оплате|всего)[:\s]+(\d{1,3}(?:\s\d{3})*(?:[.,]\d{2})?)',
-    ]
-    
-    for pattern in amount_patterns:
-        matches = re.finditer(pattern, text, re.IGNORECASE)
-        for match in matches:
-            amount_str = match.group(1).replace(' ', '').replace(',', '.')
-            try:
-                amount = float(amount_str)
-                if _is_valid_amount(amount):
-                    logger.debug(f"Found amount by pattern: {amount}")
-                    all_amounts.append(amount)
-            except ValueError:
-                continue
-    
-    # Возвращаем наибольшую сумму из валидных (но не слишком большую)
-    if all_amounts:
-        # Фильтруем разумные суммы (до 1 миллиарда рублей)
-        valid_amounts = [a for a in all_amounts if a <= 1_000_000_000]
-        if valid_amounts:
-            selected_amount = max(valid_amounts)
-            logger.warning(f"⚠️ Using max amount from patterns: {selected_amount} (was not found in words or by markers)")
-            return selected_amount
+    if scan.has_amount_in_words:
+        logger.info("Amount in words not parsed, trying LLM fallback")
+        amount_llm = await _extract_amount_in_words_llm(text)
+        if amount_llm and _is_valid_amount(amount_llm):
+            return amount_llm
     
     logger.error("❌ No valid amount found in text at all!")
     return None
@@ -472,28 +432,13 @@ def _extract_amount_from_line_safe(line: str) -> Optional[float]:
     Безопасное извлечение суммы из строки
     Исключает расчетные счета, ИНН, КПП, БИК
     """
-    # Исключаем строки с ключевыми словами счетов и реквизитов
-    line_lower = line.lower()
-    exclude_keywords = [
-        'р/с', 'р/счет', 'расчетный счет', 'счет №',
-        'инн', 'кпп', 'бик', 'банк', 'банковские реквизиты',
-        'корр. счет', 'корреспондентский счет'
-    ]
-    
-    for keyword in exclude_keywords:
-        if keyword in line_lower:
-            return None  # Пропускаем строки с реквизитами
+    # Пропускаем строки с реквизитами
+    if _REQUISITES_RE.search(line.lower()):
+        return None
     
     # Ищем числа с разделителями тысяч и копейками
-    patterns = [
-        r'(\d{1,3}(?:\s\d{3})+(?:[.,]\d{2})?)',  # С пробелами: "20 813,65"
-        r'(\d{1,3}(?:\d{3})+(?:[.,]\d{2})?)',    # Без пробелов: "20813.65"
-        r'(\d{4,10}(?:[.,]\d{2})?)',             # Числа от 1000 до 10 цифр с копейками
-    ]
-    
-    for pattern in patterns:
-        matches = re.finditer(pattern, line)
-        for match in matches:
+    for pattern in _LINE_AMOUNT_RES:
+        for match in pattern.finditer(line):
             amount_str = match.group(1).replace(' ', '').replace(',', '.')
             try:
                 amount = float(amount_str)
@@ -542,74 +487,38 @@ async def extract_data_from_excel_table(file_path: str) -> Dict[str, Optional[Un
     }
     
     try:
-        import openpyxl
-        workbook = openpyxl.load_workbook(file_path, data_only=True)
-        sheet = workbook.active
-        
-        # Ищем заголовки в первых 10 строках
-        supplier_col = None
-        total_col = None
-        
-        for row_idx in range(1, min(11, sheet.max_row + 1)):
-            row = sheet[row_idx]
-            for col_idx, cell in enumerate(row, 1):
-                cell_value = str(cell.value or '').lower().strip()
-                
-                # Ищем столбец с поставщиком
-                if not supplier_col:
-                    for marker in SUPPLIER_MARKERS:
-                        if marker in cell_value:
-                            supplier_col = col_idx
-                            break
-                
-                # Ищем столбец с итоговой суммой
-                if not total_col:
-                    for marker in TOTAL_AMOUNT_MARKERS:
-                        if marker in cell_value:
-                            total_col = col_idx
-                            break
-            
-            # Если нашли оба столбца, выходим
-            if supplier_col and total_col:
+        from services.excel_reader import scan_workbook
+        # Лист разбирается один раз (за один проход) и для поставщика с суммой, и для количества наименований
+        scan = await scan_workbook(file_path)
+        
+        # Первое валидное название поставщика в столбце с заголовком поставщика
+        for cell_value in scan.supplier_candidates:
+            if _is_valid_supplier_name(cell_value):
+                result["supplier_name"] = cell_value[:200]
                 break
         
-        # Извлекаем данные из найденных столбцов
-        if supplier_col:
-            # Ищем первое валидное название поставщика в столбце
-            for row_idx in range(2, min(sheet.max_row + 1, 50)):
-                cell_value = str(sheet.cell(row=row_idx, column=supplier_col).value or '').strip()
-                if cell_value and _is_valid_supplier_name(cell_value):
-                    result["supplier_name"] = cell_value[:200]
-                    break
-        
-        if total_col:
-            # Ищем последнее (итоговое) значение в столбце
-            # Обычно итоговая сумма находится в конце таблицы
-            for row_idx in range(sheet.max_row, max(1, sheet.max_row - 10), -1):
-                cell_value = sheet.cell(row=row_idx, column=total_col).value
-                if cell_value is not None:
-                    try:
-                        # Пробуем преобразовать в число
-                        if isinstance(cell_value, (int, float)):
-                            amount = float(cell_value)
-                            if _is_valid_amount(amount):
-                                result["total_amount"] = amount
-                                break
-                        else:
-                            # Если это строка, пытаемся извлечь число
-                            amount = _extract_amount_from_line_safe(str(cell_value))
-                            if amount and _is_valid_amount(amount):
-                                result["total_amount"] = amount
-                                break
-                    except (ValueError, TypeError):
-                        continue
-        
-        # Извлекаем количество наименований из Excel
-        items_count = await extract_items_count_from_excel(file_path)
-        if items_count:
-            result["items_count"] = items_count
+        # Последнее (итоговое) значение в столбце итоговой суммы
+        # Обычно итоговая сумма находится в конце таблицы
+        for cell_value in scan.total_candidates:
+            try:
+                # Пробуем преобразовать в число
+                if isinstance(cell_value, (int, float)):
+                    amount = float(cell_value)
+                    if _is_valid_amount(amount):
+                        result["total_amount"] = amount
+                        break
+                else:
+                    # Если это строка, пытаемся извлечь число
+                    amount = _extract_amount_from_line_safe(str(cell_value))
+                    if amount and _is_valid_amount(amount):
+                        result["total_amount"] = amount
+                        break
+            except (ValueError, TypeError):
+                continue
         
-        workbook.close()
+        # Количество наименований из того же разбора
+        if scan.items_count:
+            result["items_count"] = scan.items_count
         
     except ImportError:
         logger.warning("openpyxl not installed, cannot parse Excel tables")
@@ -723,119 +632,10 @@ async def extract_items_count_from_text(text: str) -> Optional[int]:
     """
     if not text:
         return None
-    
-    text_lower = text.lower()
-    
-    # ПРИОРИТЕТ 1: Ищем текстовые указания количества наименований
-    # Улучшенные паттерны с учетом различных форматов: "Всего наименований 3", "Всего наименований: 3", "Всего наименований 3,"
-    patterns = [
-        # Паттерны с "всего наименований" - различные варианты форматирования
-        r'всего\s+наименований[:\s,]+(\d+)',  # "Всего наименований 3" или "Всего наименований: 3" или "Всего наименований 3,"
-        r'всего\s+наименований\s*[:\s,]*\s*(\d+)',  # Более гибкий вариант
-        r'всего\s+наименований[:\s]*(\d+)',  # Без запятой обязательной
-        # Паттерны с "количество наименований"
-        r'количество\s+наименований[:\s,]+(\d+)',
-        r'количество\s+наименований\s*[:\s,]*\s*(\d+)',
-        # Паттерны с "наименований всего"
-        r'наименований\s+всего[:\s,]+(\d+)',
-        r'наименований\s+всего\s*[:\s,]*\s*(\d+)',
-        # Паттерны с "всего позиций"
-        r'всего\s+позиций[:\s,]+(\d+)',
-        r'количество\s+позиций[:\s,]+(\d+)',
-        r'позиций\s+всего[:\s,]+(\d+)',
-        # Паттерны с "всего товаров"
-        r'всего\s+товаров[:\s,]+(\d+)',
-        r'количество\s+товаров[:\s,]+(\d+)',
-        r'товаров\s+всего[:\s,]+(\d+)',
-        # Паттерны с "всего единиц"
-        r'всего\s+единиц[:\s,]+(\d+)',
-        r'количество\s+единиц[:\s,]+(\d+)',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, text_lower, re.IGNORECASE)
-        if match:
-            try:
-                count = int(match.group(1))
-                if 1 <= count <= 10000:  # Разумные пределы
-                    logger.info(f"Found items count from text pattern '{pattern}': {count}")
-                    return count
-            except (ValueError, IndexError):
-                continue
-    
-    # ПРИОРИТЕТ 2: Ищем порядковые номера товаров в таблице
-    # Ищем строки вида "1.", "2.", "3." и т.д. в начале строк (порядковые номера)
-    # Но только в контексте таблицы товаров (после заголовка таблицы)
-    lines = text.split('\n')
-    max_number = 0
-    
-    # Маркеры начала таблицы товаров
-    table_start_markers = ['наименование', 'товар', 'позиция', 'артикул', 'код', 'цена', 'количество', 'сумма', '№', 'номер']
-    in_table = False
-    
-    for line in lines:
-        line_stripped = line.strip()
-        line_lower = line.lower().strip()
-        
-        # Проверяем, является ли строка заголовком таблицы
-        if any(marker in line_lower for marker in table_start_markers):
-            in_table = True
-            max_number = 0  # Сбрасываем счетчик при новом заголовке таблицы
-            continue
-        
-        # Если мы в таблице, ищем порядковые номера
-        if in_table:
-            # Пропускаем строки с итогами
-            if any(word in line_lower for word in ['итого', 'всего', 'сумма', '---', '===']):
-                continue
-            
-            # Ищем паттерн: число + точка/скобка в начале строки (например, "1.", "1)", "1 ")
-            # Но только если строка содержит признаки товара (буквы, не только цифры)
-            match = re.match(r'^(\d+)[\.\)\s]+', line_stripped)
-            if match:
-                # Проверяем, что строка содержит не только цифры (признак товара)
-                if re.search(r'[а-яёa-z]', line_lower):
-                    try:
-                        number = int(match.group(1))
-                        if 1 <= number <= 10000:  # Разумные пределы
-                            max_number = max(max_number, number)
-                    except ValueError:
-                        continue
-    
-    if max_number > 0:
-        logger.info(f"Found items count from sequential numbers in table: {max_number}")
-        return max_number
-    
-    # ПРИОРИТЕТ 3: Подсчитываем строки в таблице с товарами
-    # Ищем таблицы по признакам: наличие столбцов "Наименование", "Товар", "Позиция" и т.д.
-    table_markers = ['наименование', 'товар', 'позиция', 'артикул', 'код', 'цена', 'количество', 'сумма']
-    table_started = False
-    table_rows = 0
-    
-    for line in lines:
-        line_lower = line.lower().strip()
-        
-        # Проверяем, является ли строка заголовком таблицы
-        if any(marker in line_lower for marker in table_markers):
-            table_started = True
-            table_rows = 0
-            continue
-        
-        # Если таблица началась, считаем строки с данными
-        if table_started:
-            # Пропускаем пустые строки и строки с итогами
-            if not line_stripped or any(word in line_lower for word in ['итого', 'всего', 'сумма', '---', '===']):
-                continue
-            
-            # Проверяем, содержит ли строка данные (цифры, буквы)
-            if re.search(r'[а-яёa-z\d]', line_lower):
-                table_rows += 1
-    
-    if table_rows > 0:
-        logger.info(f"Found items count from table rows: {table_rows}")
-        return table_rows
-    
-    return None
+    items_count = CPTextScan(text).fields["items_count"]
+    if items_count.value:
+        logger.info(f"Found items count from text ({items_count.source}): {items_count.value}")
+    return items_count.value
 
 
 async def extract_items_count_from_excel(file_path: str) -> Optional[int]:
@@ -854,85 +654,11 @@ async def extract_items_count_from_excel(file_path: str) -> Optional[int]:
         Количество наименований или None, если не найдено
     """
     try:
-        import openpyxl
-        workbook = openpyxl.load_workbook(file_path, data_only=True)
-        sheet = workbook.active
-        
-        # ПРИОРИТЕТ 1: Ищем текстовые указания количества в ячейках
-        for row in sheet.iter_rows(values_only=True):
-            for cell_value in row:
-                if cell_value and isinstance(cell_value, str):
-                    cell_lower = cell_value.lower()
-                    # Ищем паттерны типа "Всего наименований 3", "Всего наименований: 3", "Всего наименований 3,"
-                    patterns = [
-                        r'всего\s+наименований[:\s,]+(\d+)',
-                        r'количество\s+наименований[:\s,]+(\d+)',
-                        r'наименований\s+всего[:\s,]+(\d+)',
-                        r'всего\s+позиций[:\s,]+(\d+)',
-                        r'количество\s+позиций[:\s,]+(\d+)',
-                    ]
-                    for pattern in patterns:
-                        match = re.search(pattern, cell_lower)
-                        if match:
-                            count = int(match.group(1))
-                            if 1 <= count <= 10000:
-                                workbook.close()
-                                logger.info(f"Found items count from Excel cell (pattern '{pattern}'): {count}")
-                                return count
-        
-        # ПРИОРИТЕТ 2: Ищем порядковые номера в первом столбце
-        max_number = 0
-        for row_idx in range(1, min(sheet.max_row + 1, 1000)):  # Ограничиваем поиск 1000 строками
-            cell_value = sheet.cell(row=row_idx, column=1).value
-            if cell_value is not None:
-                # Пробуем преобразовать в число
-                if isinstance(cell_value, (int, float)):
-                    number = int(cell_value)
-                    if 1 <= number <= 10000:
-                        max_number = max(max_number, number)
-                elif isinstance(cell_value, str):
-                    # Ищем число в начале строки
-                    match = re.match(r'^(\d+)[\.\)\s]+', cell_value.strip())
-                    if match:
-                        number = int(match.group(1))
-                        if 1 <= number <= 10000:
-                            max_number = max(max_number, number)
-        
-        if max_number > 0:
-            workbook.close()
-            logger.info(f"Found items count from Excel sequential numbers: {max_number}")
-            return max_number
-        
-        # ПРИОРИТЕТ 3: Подсчитываем строки с данными товаров
-        # Ищем заголовок таблицы
-        header_row = None
-        for row_idx in range(1, min(11, sheet.max_row + 1)):
-            row = sheet[row_idx]
-            row_values = [str(cell.value or '').lower() for cell in row]
-            if any(marker in ' '.join(row_values) for marker in ['наименование', 'товар', 'позиция', 'артикул']):
-                header_row = row_idx
-                break
-        
-        if header_row:
-            # Считаем строки с данными после заголовка
-            data_rows = 0
-            for row_idx in range(header_row + 1, min(sheet.max_row + 1, header_row + 1000)):
-                row = sheet[row_idx]
-                # Проверяем, есть ли данные в строке (не пустая)
-                has_data = any(cell.value is not None and str(cell.value).strip() for cell in row)
-                if has_data:
-                    # Пропускаем строки с итогами
-                    row_values_str = ' '.join([str(cell.value or '').lower() for cell in row])
-                    if not any(word in row_values_str for word in ['итого', 'всего', 'сумма']):
-                        data_rows += 1
-            
-            if data_rows > 0:
-                workbook.close()
-                logger.info(f"Found items count from Excel table rows: {data_rows}")
-                return data_rows
-        
-        workbook.close()
-        return None
+        from services.excel_reader import scan_workbook
+        scan = await scan_workbook(file_path)
+        if scan.items_count:
+            logger.info(f"Found items count from Excel ({scan.items_count_source}): {scan.items_count}")
+        return scan.items_count
         
     except ImportError:
         logger.warning("openpyxl not installed, cannot extract items count from Excel")
@@ -982,14 +708,15 @@ async def extract_cp_data_combined(
     proposal_text: str,
     file_path: Optional[str] = None,
     use_llm_fallback: bool = True
-) -> Dict[str, Optional[Union[str, float, int]]]:
+) -> Dict[str, Any]:
     """
     Комбинированное извлечение данных из КП
     
     Стратегия:
     1. Сначала пытаемся извлечь из таблиц Excel (если файл Excel)
-    2. Затем используем улучшенные regex-паттерны
-    3. В конце используем LLM fallback (если включен и данные не найдены)
+    2. Затем недостающие поля - из текста за один проход (CPTextScan)
+    3. LLM вызывается, только если какое-то поле не найдено или его уверенность ниже
+       CP_LLM_CONFIDENCE_THRESHOLD, и заменяет только такие поля
     
     Args:
         proposal_text: Текст КП
@@ -997,12 +724,13 @@ async def extract_cp_data_combined(
         use_llm_fallback: Использовать LLM для сложных случаев
     
     Returns:
-        Словарь с ключами: supplier_name, total_amount, items_count
+        Словарь с ключами: supplier_name, total_amount, items_count и confidence
+        (уверенность в каждом поле от 0 до 1)
     """
-    result = {
-        "supplier_name": None,
-        "total_amount": None,
-        "items_count": None
+    fields = {
+        "supplier_name": CPField(),
+        "total_amount": CPField(),
+        "items_count": CPField()
     }
     
     # Шаг 1: Парсим таблицы Excel (если файл Excel)
@@ -1010,41 +738,32 @@ async def extract_cp_data_combined(
         file_ext = Path(file_path).suffix.lower()
         if file_ext in {'.xlsx', '.xls'}:
             excel_data = await extract_data_from_excel_table(file_path)
-            result["supplier_name"] = excel_data.get("supplier_name")
-            result["total_amount"] = excel_data.get("total_amount")
-            result["items_count"] = excel_data.get("items_count")
+            for name in fields:
+                if excel_data.get(name):
+                    fields[name] = _field(name, excel_data[name], "excel")
     
-    # Шаг 2: Извлекаем из текста (если не нашли в таблицах или для дополнения)
+    # Шаг 2: Извлекаем из текста поля, не найденные в таблицах
     if proposal_text:
-        if not result["supplier_name"]:
-            supplier = extract_supplier_name_improved(proposal_text)
-            if supplier:
-                result["supplier_name"] = supplier
-        
-        if not result["total_amount"]:
-            amount = await extract_total_amount_improved(proposal_text)
-            if amount:
-                result["total_amount"] = amount
-        
-        # Извлекаем количество наименований
-        if not result["items_count"]:
-            items_count = await extract_items_count_combined(proposal_text, file_path)
-            if items_count:
-                result["items_count"] = items_count
-    
-    # Шаг 3: LLM fallback (если данные не найдены и включен fallback)
-    if use_llm_fallback and proposal_text:
-        if not result["supplier_name"] or not result["total_amount"] or not result["items_count"]:
-            llm_data = await extract_cp_data_with_llm(proposal_text)
-            
-            if not result["supplier_name"] and llm_data.get("supplier_name"):
-                result["supplier_name"] = llm_data["supplier_name"]
-            
-            if not result["total_amount"] and llm_data.get("total_amount"):
-                result["total_amount"] = llm_data["total_amount"]
-            
-            if not result["items_count"] and llm_data.get("items_count"):
-                result["items_count"] = llm_data["items_count"]
-    
+        scan = CPTextScan(proposal_text)
+        for name, text_field in scan.fields.items():
+            if not fields[name].value and text_field.value:
+                fields[name] = text_field
+    
+    # Шаг 3: LLM fallback для не найденных и ненадежно найденных полей
+    threshold = settings.CP_LLM_CONFIDENCE_THRESHOLD
+    uncertain = [name for name, cp_field in fields.items() if not cp_field.value or cp_field.confidence < threshold]
+    if use_llm_fallback and proposal_text and uncertain:
+        logger.info(f"Using LLM for CP fields: {', '.join(uncertain)}")
+        llm_data = await extract_cp_data_with_llm(proposal_text)
+        for name in uncertain:
+            if llm_data.get(name):
+                fields[name] = _field(name, llm_data[name], "llm")
+    
+    logger.info(
+        "CP data extracted: " + ", ".join(
+            f"{name}={cp_field.value!r} ({cp_field.source}, {cp_field.confidence:.2f})" for name, cp_field in fields.items()
+        )
+    )
+    result: Dict[str, Any] = {name: cp_field.value for name, cp_field in fields.items()}
+    result["confidence"] = {name: cp_field.confidence for name, cp_field in fields.items()}
     return result
-
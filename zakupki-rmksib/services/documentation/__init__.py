@@ -4,15 +4,20 @@ from .processor import (
 	extract_text_from_file,
 	is_supported_format,
 	download_documentation_from_url,
+	delete_documentation_files,
 	SUPPORTED_EXTENSIONS
 )
+from .extraction_pool import extraction_pool, ExtractionTimeout
 
 __all__ = [
 	'save_documentation_file',
 	'extract_text_from_file',
 	'is_supported_format',
 	'download_documentation_from_url',
-	'SUPPORTED_EXTENSIONS'
+	'delete_documentation_files',
+	'SUPPORTED_EXTENSIONS',
+	'extraction_pool',
+	'ExtractionTimeout'
 ]
 
 
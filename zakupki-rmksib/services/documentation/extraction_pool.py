@@ -0,0 +1,135 @@
+"""
+Пул процессов для извлечения текста из документов
+
+Разбор PDF, DOCX и Excel занимает секунды процессорного времени и держит GIL, поэтому выполняется
+не в потоке, а в отдельных процессах: event loop бота продолжает отвечать пользователям.
+Зависший или слишком тяжелый файл ограничивается таймаутом и лимитом памяти процесса.
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, TypeVar
+from loguru import logger
+from config.settings import settings
+
+T = TypeVar("T")
+
+
+class ExtractionTimeout(TimeoutError):
+	"""Извлечение текста не уложилось в таймаут"""
+
+
+def _init_worker(memory_limit_mb: int) -> None:
+	"""Ограничение адресного пространства процесса: при превышении разбор файла получает MemoryError"""
+	if memory_limit_mb <= 0:
+		return
+	try:
+		import resource
+	except ImportError:
+		# Windows: лимит памяти не поддерживается
+		return
+	limit = memory_limit_mb * 1024 * 1024
+	resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+class ExtractionPool:
+	"""
+	Ограниченный пул процессов (создается при первом использовании)
+
+	Выполняющуюся в процессе задачу нельзя отменить, поэтому при таймауте или отмене ожидания
+	процессы пула завершаются и пул создается заново; задачи других файлов, попавшие под перезапуск,
+	повторяются один раз на новом пуле.
+	"""
+
+	def __init__(self, max_workers: int, timeout: float, memory_limit_mb: int):
+		self.max_workers = max(1, max_workers)
+		self.timeout = timeout
+		self.memory_limit_mb = memory_limit_mb
+		self._executor: Optional[ProcessPoolExecutor] = None
+		# Задача передается в пул, только когда есть свободный процесс: таймаут считается
+		# от начала разбора, а не от постановки в очередь за другими файлами
+		self._slots: Optional[asyncio.Semaphore] = None
+		# Метрики
+		self._tasks = 0
+		self._timeouts = 0
+		self._restarts = 0
+
+	def _get_executor(self) -> ProcessPoolExecutor:
+		if self._executor is None:
+			self._executor = ProcessPoolExecutor(
+				max_workers=self.max_workers,
+				# spawn: без копии памяти и потоков процесса бота (fork небезопасен при работающих потоках)
+				mp_context=multiprocessing.get_context("spawn"),
+				initializer=_init_worker,
+				initargs=(self.memory_limit_mb,),
+			)
+		return self._executor
+
+	def _restart(self, executor: ProcessPoolExecutor) -> None:
+		"""Завершить процессы пула (вместе с выполняющимися в них задачами)"""
+		if self._executor is not executor:
+			# Уже перезапущен другой задачей
+			return
+		self._executor = None
+		self._restarts += 1
+		for process in list((executor._processes or {}).values()):
+			process.kill()
+		executor.shutdown(wait=False, cancel_futures=True)
+
+	async def run(self, func: Callable[..., T], *args: Any) -> T:
+		"""
+		Выполнить func(*args) в процессе пула
+
+		Raises:
+			ExtractionTimeout: если задача не уложилась в timeout секунд
+			MemoryError: если процесс превысил лимит памяти
+		"""
+		if self._slots is None:
+			self._slots = asyncio.Semaphore(self.max_workers)
+		async with self._slots:
+			return await self._run(func, *args)
+
+	async def _run(self, func: Callable[..., T], *args: Any) -> T:
+		self._tasks += 1
+		retried = False
+		while True:
+			executor = self._get_executor()
+			future = asyncio.get_running_loop().run_in_executor(executor, func, *args)
+			try:
+				return await asyncio.wait_for(future, timeout=self.timeout if self.timeout > 0 else None)
+			except asyncio.TimeoutError:
+				self._timeouts += 1
+				self._restart(executor)
+				raise ExtractionTimeout(f"{func.__name__} did not finish in {self.timeout}s")
+			except asyncio.CancelledError:
+				# Ожидание отменено (например, остановка бота) - освобождаем процесс
+				self._restart(executor)
+				raise
+			except BrokenProcessPool:
+				# Процесс пула завершился: перезапуск из-за другой задачи или падение на этом файле
+				self._restart(executor)
+				if retried:
+					raise
+				retried = True
+				logger.warning(f"Document extraction pool was restarted, retrying {func.__name__}")
+
+	def shutdown(self) -> None:
+		if self._executor is not None:
+			self._executor.shutdown(wait=False, cancel_futures=True)
+			self._executor = None
+
+	def get_metrics(self) -> Dict[str, Any]:
+		return {
+			"max_workers": self.max_workers,
+			"tasks": self._tasks,
+			"timeouts": self._timeouts,
+			"restarts": self._restarts,
+		}
+
+
+extraction_pool = ExtractionPool(
+	max_workers=settings.DOC_EXTRACT_WORKERS,
+	timeout=settings.DOC_EXTRACT_TIMEOUT_SECONDS,
+	memory_limit_mb=settings.DOC_EXTRACT_MEMORY_LIMIT_MB,
+)
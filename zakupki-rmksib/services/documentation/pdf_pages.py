@@ -0,0 +1,119 @@
+"""
+Постраничное извлечение текста из PDF
+
+Файл отображается в память (mmap) и не читается целиком, страницы разбираются по одной и
+сохраняются в кэше на диске: повторный анализ той же документации берет уже извлеченные страницы
+из кэша и разбирает только недостающие.
+"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PAGE_CACHE_DIR = Path("data/documentation/.page_cache")
+
+
+def _cache_path(file_path: str) -> Path:
+	key = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()
+	return PAGE_CACHE_DIR / f"{key}.json"
+
+
+def _load_cache(file_path: str, stat: os.stat_result) -> Dict:
+	"""Кэш страниц файла; пустой, если кэша нет или файл изменился после его записи"""
+	try:
+		with open(_cache_path(file_path), "r", encoding="utf-8") as f:
+			cache = json.load(f)
+	except (OSError, ValueError):
+		return {"pages": [], "page_count": None}
+	if cache.get("size") != stat.st_size or cache.get("mtime") != stat.st_mtime:
+		return {"pages": [], "page_count": None}
+	return cache
+
+
+def _save_cache(file_path: str, stat: os.stat_result, pages: list, page_count: Optional[int]) -> None:
+	path = _cache_path(file_path)
+	try:
+		path.parent.mkdir(parents=True, exist_ok=True)
+		# Запись через временный файл: кэш может одновременно читать другой процесс
+		tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+		with open(tmp_path, "w", encoding="utf-8") as f:
+			json.dump({"size": stat.st_size, "mtime": stat.st_mtime, "page_count": page_count, "pages": pages}, f, ensure_ascii=False)
+		os.replace(tmp_path, path)
+	except OSError as e:
+		logger.warning(f"Could not write PDF page cache for {file_path}: {e}")
+
+
+def delete_page_cache(file_path: str) -> None:
+	"""Удалить кэш страниц файла (при удалении самого файла)"""
+	try:
+		_cache_path(file_path).unlink()
+	except OSError:
+		pass
+
+
+class PdfPages:
+	"""
+	Текст страниц PDF по порядку (итерация дает пары: номер страницы с 0, текст)
+
+	Страницы из кэша отдаются без открытия PDF. Если перебор прерван (текста уже достаточно),
+	уже разобранные страницы все равно сохраняются в кэш.
+	"""
+
+	def __init__(self, file_path: str):
+		self.file_path = file_path
+		self.page_count: Optional[int] = None  # Всего страниц (известно после открытия PDF или из кэша)
+
+	def __iter__(self) -> Iterator[Tuple[int, str]]:
+		import PyPDF2
+
+		stat = os.stat(self.file_path)
+		cache = _load_cache(self.file_path, stat)
+		pages = cache["pages"]
+		self.page_count = cache["page_count"]
+		parsed = 0
+		try:
+			for index, text in enumerate(pages):
+				yield index, text
+			if self.page_count is not None and len(pages) >= self.page_count:
+				return
+
+			with open(self.file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+				reader = PyPDF2.PdfReader(mapped)
+				self.page_count = len(reader.pages)
+				for index in range(len(pages), self.page_count):
+					text = reader.pages[index].extract_text() or ""
+					pages.append(text)
+					parsed += 1
+					yield index, text
+				del reader
+		finally:
+			if parsed or cache["page_count"] != self.page_count:
+				_save_cache(self.file_path, stat, pages, self.page_count)
+
+
+def extract_pdf_text(file_path: str, max_chars: Optional[int] = None) -> Tuple[str, int, Optional[int]]:
+	"""
+	Текст PDF, не больше чем нужно для max_chars символов (разбор останавливается на странице,
+	на которой набрано max_chars символов)
+
+	Returns:
+		(текст, сколько страниц вошло в текст, всего страниц)
+	"""
+	pdf = PdfPages(file_path)
+	pages = iter(pdf)
+	parts = []
+	length = 0
+	try:
+		for _, text in pages:
+			parts.append(text)
+			length += len(text) + 1
+			if max_chars and length >= max_chars:
+				break
+	finally:
+		pages.close()
+	return "\n".join(parts), len(parts), pdf.page_count
@@ -1,12 +1,14 @@
 """Сервис для обработки конкурсной документации"""
+import asyncio
 import os
 import logging
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 import aiofiles
 import httpx
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
+from .pdf_pages import delete_page_cache
 
 logger = logging.getLogger(__name__)
 
@@ -54,12 +56,50 @@ async def save_documentation_file(file_content: bytes, filename: str, lot_number
 	return str(file_path)
 
 
-async def extract_text_from_file(file_path: str) -> Optional[str]:
+def _delete_files(file_paths: List[str]) -> int:
+	deleted = 0
+	for file_path in file_paths:
+		path = Path(file_path)
+		delete_page_cache(file_path)
+		try:
+			path.unlink()
+			deleted += 1
+		except FileNotFoundError:
+			continue
+		except OSError as e:
+			logger.warning(f"Could not delete file {file_path}: {e}")
+			continue
+		# Удаляем опустевшую папку лота (data/documentation/<номер лота>)
+		try:
+			path.parent.rmdir()
+		except OSError:
+			pass
+	return deleted
+
+
+async def delete_documentation_files(file_paths: List[str]) -> int:
+	"""
+	Удаляет файлы документации (и опустевшие папки лотов) с диска
+	
+	Args:
+		file_paths: Пути к файлам
+	
+	Returns:
+		Количество удаленных файлов
+	"""
+	if not file_paths:
+		return 0
+	return await asyncio.to_thread(_delete_files, file_paths)
+
+
+async def extract_text_from_file(file_path: str, max_chars: Optional[int] = None) -> Optional[str]:
 	"""
 	Извлекает текст из файла документации
 	
 	Args:
 		file_path: Путь к файлу
+		max_chars: Сколько символов текста нужно (None - весь текст). Разбор PDF останавливается
+			на странице, после которой набрано max_chars символов; остальные форматы извлекаются целиком
 	
 	Returns:
 		Извлеченный текст или None в случае ошибки
@@ -91,36 +131,36 @@ async def extract_text_from_file(file_path: str) -> Optional[str]:
 			logger.error(f"Error detecting file type for {file_path}: {e}")
 			return None
 	
+	extractor = _EXTRACTORS.get(file_ext)
+	if extractor is None:
+		logger.warning(f"Unsupported file format: {file_ext}")
+		return None
+	
+	# Разбор файла - в отдельном процессе, чтобы большие документы не блокировали event loop бота
+	from .extraction_pool import extraction_pool, ExtractionTimeout
 	try:
 		if file_ext == '.pdf':
-			return await _extract_text_from_pdf(file_path)
-		elif file_ext in {'.docx', '.doc'}:
-			return await _extract_text_from_docx(file_path)
-		elif file_ext == '.txt':
-			return await _extract_text_from_txt(file_path)
-		elif file_ext == '.rtf':
-			return await _extract_text_from_rtf(file_path)
-		elif file_ext in {'.xlsx', '.xls'}:
-			return await _extract_text_from_excel(file_path)
-		else:
-			logger.warning(f"Unsupported file format: {file_ext}")
-			return None
+			return await extraction_pool.run(extractor, file_path, max_chars)
+		return await extraction_pool.run(extractor, file_path)
+	except ExtractionTimeout:
+		logger.error(f"Text extraction from {file_path} timed out after {extraction_pool.timeout}s")
+		return f"[Ошибка: файл обрабатывался дольше {extraction_pool.timeout:.0f} с и был пропущен]"
+	except MemoryError:
+		logger.error(f"Text extraction from {file_path} exceeded the memory limit")
+		return "[Ошибка: файл слишком большой для обработки]"
 	except Exception as e:
 		logger.error(f"Error extracting text from {file_path}: {e}")
 		return None
 
 
-async def _extract_text_from_pdf(file_path: str) -> str:
-	"""Извлекает текст из PDF файла"""
+def _extract_text_from_pdf(file_path: str, max_chars: Optional[int] = None) -> str:
+	"""Извлекает текст из PDF файла постранично (с кэшем страниц), останавливаясь после max_chars символов"""
 	try:
-		import PyPDF2
-		import io
-		text = ""
-		async with aiofiles.open(file_path, 'rb') as f:
-			file_content = await f.read()
-			pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-			for page in pdf_reader.pages:
-				text += page.extract_text() + "\n"
+		from .pdf_pages import extract_pdf_text
+		text, used_pages, page_count = extract_pdf_text(file_path, max_chars)
+		if page_count and used_pages < page_count:
+			logger.info(f"PDF {file_path}: text budget of {max_chars} chars reached on page {used_pages} of {page_count}")
+			text += f"\n\n[... извлечен текст страниц 1-{used_pages} из {page_count}]"
 		return text.strip()
 	except ImportError:
 		logger.error("PyPDF2 not installed. Install it with: pip install PyPDF2")
@@ -131,7 +171,7 @@ async def _extract_text_from_pdf(file_path: str) -> str:
 		return f"[Ошибка при чтении PDF: {str(e)}]"
 
 
-async def _extract_text_from_docx(file_path: str) -> str:
+def _extract_text_from_docx(file_path: str) -> str:
 	"""Извлекает текст из DOCX файла"""
 	try:
 		from docx import Document
@@ -146,17 +186,17 @@ async def _extract_text_from_docx(file_path: str) -> str:
 		return f"[Ошибка при чтении DOCX: {str(e)}]"
 
 
-async def _extract_text_from_txt(file_path: str) -> str:
+def _extract_text_from_txt(file_path: str) -> str:
 	"""Извлекает текст из TXT файла"""
 	try:
-		async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
-			text = await f.read()
+		with open(file_path, 'r', encoding='utf-8') as f:
+			text = f.read()
 		return text.strip()
 	except UnicodeDecodeError:
 		# Пробуем другие кодировки
 		try:
-			async with aiofiles.open(file_path, 'r', encoding='cp1251') as f:
-				text = await f.read()
+			with open(file_path, 'r', encoding='cp1251') as f:
+				text = f.read()
 			return text.strip()
 		except Exception as e:
 			logger.error(f"Error reading TXT {file_path}: {e}")
@@ -166,12 +206,12 @@ async def _extract_text_from_txt(file_path: str) -> str:
 		return f"[Ошибка при чтении TXT: {str(e)}]"
 
 
-async def _extract_text_from_rtf(file_path: str) -> str:
+def _extract_text_from_rtf(file_path: str) -> str:
 	"""Извлекает текст из RTF файла (базовая реализация)"""
 	try:
 		import re
-		async with aiofiles.open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-			content = await f.read()
+		with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+			content = f.read()
 		# Простое удаление RTF-тегов (базовая реализация)
 		text = re.sub(r'\{[^}]*\}', '', content)
 		text = re.sub(r'\\[a-z]+\d*\s?', '', text)
@@ -181,28 +221,25 @@ async def _extract_text_from_rtf(file_path: str) -> str:
 		return f"[Ошибка при чтении RTF: {str(e)}]"
 
 
-async def _extract_text_from_excel(file_path: str) -> str:
-	"""Извлекает текст из Excel файла"""
+def _extract_text_from_excel(file_path: str) -> str:
+	"""Извлекает текст из Excel файла (строки читаются потоком, книга открывается только для чтения)"""
 	try:
-		import openpyxl
-		text = ""
-		workbook = openpyxl.load_workbook(file_path, data_only=True)
-		
-		# Обрабатываем все листы
-		for sheet_name in workbook.sheetnames:
-			sheet = workbook[sheet_name]
-			text += f"\n\n=== Лист: {sheet_name} ===\n\n"
-			
-			# Читаем все ячейки с данными
-			for row in sheet.iter_rows(values_only=True):
-				row_text = []
-				for cell_value in row:
-					if cell_value is not None:
-						row_text.append(str(cell_value))
-				if row_text:
-					text += " | ".join(row_text) + "\n"
+		from services.excel_reader import open_workbook
+		parts = []
+		with open_workbook(file_path) as workbook:
+			# Обрабатываем все листы
+			for sheet in workbook.worksheets:
+				# Размеры листа из файла могут быть неверными (см. open_workbook)
+				sheet.reset_dimensions()
+				parts.append(f"\n\n=== Лист: {sheet.title} ===\n\n")
+				
+				# Читаем все ячейки с данными
+				for row in sheet.iter_rows(values_only=True):
+					row_text = [str(cell_value) for cell_value in row if cell_value is not None]
+					if row_text:
+						parts.append(" | ".join(row_text) + "\n")
 		
-		return text.strip()
+		return "".join(parts).strip()
 	except ImportError:
 		logger.error("openpyxl not installed. Install it with: pip install openpyxl")
 		return f"[Ошибка: openpyxl не установлен. Установите: pip install openpyxl]"
@@ -211,6 +248,18 @@ async def _extract_text_from_excel(file_path: str) -> str:
 		return f"[Ошибка при чтении Excel: {str(e)}]"
 
 
+# Извлечение текста по расширению (функции выполняются в процессах extraction_pool)
+_EXTRACTORS = {
+	'.pdf': _extract_text_from_pdf,
+	'.docx': _extract_text_from_docx,
+	'.doc': _extract_text_from_docx,
+	'.txt': _extract_text_from_txt,
+	'.rtf': _extract_text_from_rtf,
+	'.xlsx': _extract_text_from_excel,
+	'.xls': _extract_text_from_excel,
+}
+
+
 def is_supported_format(filename: str) -> bool:
 	"""Проверяет, поддерживается ли формат файла"""
 	file_ext = Path(filename).suffix.lower()
@@ -253,13 +302,14 @@ def detect_file_type_by_content(file_content: bytes) -> Optional[str]:
 	return None
 
 
-async def download_documentation_from_url(url: str, lot_number: str) -> Optional[str]:
+async def download_documentation_from_url(url: str, lot_number: str, extract_text: bool = True) -> Optional[str]:
 	"""
 	Скачивает документацию с URL страницы лота
 	
 	Args:
 		url: URL страницы лота на площадке закупок
 		lot_number: Номер лота для организации структуры папок
+		extract_text: Сразу извлечь текст и сохранить его в лот (False - текст извлекает вызывающий код)
 	
 	Returns:
 		Путь к сохраненному файлу документации или None в случае ошибки
@@ -392,6 +442,9 @@ async def download_documentation_from_url(url: str, lot_number: str) -> Optional
 			
 			logger.info(f"Documentation downloaded and saved: {file_path}")
 			
+			if not extract_text:
+				return file_path
+			
 			# Пытаемся автоматически извлечь текст из документации
 			try:
 				documentation_text = await extract_text_from_file(file_path)
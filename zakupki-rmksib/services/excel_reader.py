@@ -0,0 +1,340 @@
+"""
+Чтение таблиц Excel (заявки, спецификации, КП)
+
+Книга открывается в режиме read_only: строки читаются потоком, без загрузки всех ячеек в память.
+Активный лист разбирается за один проход (scan_sheet): заголовки таблицы товаров, строки товаров,
+кандидаты в поставщика и итоговую сумму и количество наименований. Результат разбора кэшируется
+по хешу содержимого файла (scan_workbook), поэтому поиск товаров, данных КП и количества
+наименований в одном файле разбирает его один раз.
+"""
+import asyncio
+import hashlib
+import re
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from itertools import chain, islice
+from typing import Any, Dict, List, Optional, Sequence
+from loguru import logger
+from config.settings import settings
+
+# Строк в начале листа, которые нужны для поиска заголовков (до 20 строк) и определения
+# столбца с названием товара по заполненности (еще до 20 строк после заголовка)
+HEAD_ROWS = 40
+
+# Маркеры столбцов таблицы товаров
+NAME_MARKERS = ['номенклатура', 'наименование', 'товар', 'название', 'описание']
+CODE_MARKERS = ['код номенклатуры', 'код', 'артикул', 'номер']
+QUANTITY_MARKERS = ['количество', 'кол-во', 'qty', 'шт', 'штук']
+UNIT_MARKERS = ['единица', 'ед.', 'ед', 'единица измерения', 'единицы', 'измерения', 'размерность']
+
+# Строки с метаданными, а не товарами (например, "Итого", "Всего", "Ответственный")
+PRODUCT_SKIP_KEYWORDS = ['итого', 'всего', 'ответственный', 'согласовано', 'должность',
+                         'контролирующий', 'склад', 'подразделение', 'сценарий', 'цфо']
+
+# Единицы измерения в конце количества (например: "100 шт", "50 кг", "10 м")
+UNIT_PATTERN = re.compile(
+    r'\s*(шт|штук|кг|килограмм|г|грамм|т|тонн|м|метр|см|сантиметр|мм|миллиметр|л|литр|мл|миллилитр|м²|м2|м³|м3|упак|упаковок|компл|комплект|пар|пар|пог\.?\s*м|пог\.?\s*метр|п\.\s*м|п\.\s*метр)\.?$',
+    re.IGNORECASE
+)
+
+# Текстовые указания количества наименований ("Всего наименований 3", "Всего наименований: 3", ...)
+ITEMS_COUNT_PATTERNS = [
+    re.compile(pattern) for pattern in (
+        r'всего\s+наименований[:\s,]+(\d+)',
+        r'количество\s+наименований[:\s,]+(\d+)',
+        r'наименований\s+всего[:\s,]+(\d+)',
+        r'всего\s+позиций[:\s,]+(\d+)',
+        r'количество\s+позиций[:\s,]+(\d+)',
+    )
+]
+ITEMS_HEADER_MARKERS = ['наименование', 'товар', 'позиция', 'артикул']
+ITEMS_TOTAL_KEYWORDS = ['итого', 'всего', 'сумма']
+SEQUENCE_NUMBER_PATTERN = re.compile(r'^(\d+)[\.\)\s]+')
+
+
+@dataclass
+class SheetScan:
+    """Результат разбора активного листа книги"""
+    sheet_title: str
+    rows: int = 0
+    # Таблица товаров (номера строк и столбцов с 1)
+    header_found: bool = False
+    header_row: Optional[int] = None
+    name_col: Optional[int] = None
+    products: List[Dict[str, Any]] = field(default_factory=list)
+    # Данные КП: значения столбца поставщика (строки 2-49) и последние значения столбца
+    # итоговой суммы (от последней строки к первой); проверка значений - в services.cp_data_extraction
+    supplier_candidates: List[str] = field(default_factory=list)
+    total_candidates: List[Any] = field(default_factory=list)
+    # Количество наименований и способ, которым оно найдено (text, numbers, rows)
+    items_count: Optional[int] = None
+    items_count_source: Optional[str] = None
+
+
+@contextmanager
+def open_workbook(file_path: str):
+    """
+    Книга Excel в режиме только для чтения (значения формул вместо формул)
+
+    Перед чтением строк листа вызывайте sheet.reset_dimensions(): в режиме read_only openpyxl
+    читает строки в пределах тега <dimension> из файла, а некоторые программы записывают в него
+    только "A1" - тогда лист читается как одна строка.
+    """
+    import openpyxl
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        yield workbook
+    finally:
+        workbook.close()
+
+
+def _cell(values: Sequence[Any], col: Optional[int]) -> Any:
+    if not col or col > len(values):
+        return None
+    return values[col - 1]
+
+
+def _find_marker(cell_value: str, markers: List[str]) -> bool:
+    return any(marker in cell_value for marker in markers)
+
+
+def _detect_product_columns(scan: SheetScan, head: List[Sequence[Any]]) -> Dict[str, Optional[int]]:
+    """Заголовок таблицы товаров в первых 20 строках"""
+    columns = {"name": None, "code": None, "quantity": None, "unit": None}
+    markers = {"name": NAME_MARKERS, "code": CODE_MARKERS, "quantity": QUANTITY_MARKERS, "unit": UNIT_MARKERS}
+    header_row = None
+    for row_idx, values in enumerate(head[:20], 1):
+        for col_idx, value in enumerate(values, 1):
+            cell_value = str(value or '').lower().strip()
+            for key, key_markers in markers.items():
+                if not columns[key] and _find_marker(cell_value, key_markers):
+                    columns[key] = col_idx
+                    # Строка заголовка - строка с названием товара, иначе первая строка с любым столбцом
+                    if key == "name" or not header_row:
+                        header_row = row_idx
+
+    scan.header_found = header_row is not None
+    if not header_row:
+        # Пробуем найти товары без заголовков: обычно товары начинаются после строки 10
+        header_row = 10
+    scan.header_row = header_row
+
+    if not columns["name"]:
+        # Столбец с наибольшим количеством непустых значений (обычно это название товара)
+        width = max((len(values) for values in head), default=0)
+        max_non_empty = 0
+        for col_idx in range(1, min(width + 1, 20)):
+            non_empty_count = sum(
+                1 for values in head[header_row:header_row + 19]
+                if _cell(values, col_idx) and str(_cell(values, col_idx)).strip()
+            )
+            if non_empty_count > max_non_empty:
+                max_non_empty = non_empty_count
+                columns["name"] = col_idx
+    scan.name_col = columns["name"]
+    return columns
+
+
+def _product_from_row(row_idx: int, values: Sequence[Any], columns: Dict[str, Optional[int]]) -> Optional[Dict[str, Any]]:
+    name_value = str(_cell(values, columns["name"]) or '').strip()
+    # Пропускаем пустые и служебные строки
+    if not name_value or len(name_value) < 3:
+        return None
+    if any(keyword in name_value.lower() for keyword in PRODUCT_SKIP_KEYWORDS):
+        return None
+
+    def text(key: str) -> Optional[str]:
+        value = _cell(values, columns[key])
+        return str(value).strip() if value else None
+
+    quantity_value = text("quantity")
+    unit_value = text("unit")
+    # Если единицы измерения не найдены в отдельном столбце, пытаемся извлечь из количества
+    if not unit_value and quantity_value:
+        unit_match = UNIT_PATTERN.search(quantity_value)
+        if unit_match:
+            unit_value = unit_match.group(1).strip()
+            quantity_value = UNIT_PATTERN.sub('', quantity_value).strip()
+
+    return {
+        "name": name_value,
+        "code": text("code"),
+        "row_number": row_idx,
+        "quantity": quantity_value,
+        "unit": unit_value
+    }
+
+
+def _detect_cp_columns(head: List[Sequence[Any]]) -> Dict[str, Optional[int]]:
+    """Столбцы поставщика и итоговой суммы в первых 10 строках"""
+    from services.cp_data_extraction import SUPPLIER_MARKERS, TOTAL_AMOUNT_MARKERS
+    supplier_col = None
+    total_col = None
+    for values in head[:10]:
+        for col_idx, value in enumerate(values, 1):
+            cell_value = str(value or '').lower().strip()
+            if not supplier_col and _find_marker(cell_value, SUPPLIER_MARKERS):
+                supplier_col = col_idx
+            if not total_col and _find_marker(cell_value, TOTAL_AMOUNT_MARKERS):
+                total_col = col_idx
+        if supplier_col and total_col:
+            break
+    return {"supplier": supplier_col, "total": total_col}
+
+
+def _items_count_from_text(values: Sequence[Any]) -> Optional[int]:
+    for value in values:
+        if value and isinstance(value, str):
+            cell_lower = value.lower()
+            for pattern in ITEMS_COUNT_PATTERNS:
+                match = pattern.search(cell_lower)
+                if match:
+                    count = int(match.group(1))
+                    if 1 <= count <= 10000:
+                        return count
+    return None
+
+
+def _sequence_number(value: Any) -> int:
+    """Порядковый номер товара в первом столбце (0, если это не номер)"""
+    if isinstance(value, (int, float)):
+        number = int(value)
+    elif isinstance(value, str):
+        match = SEQUENCE_NUMBER_PATTERN.match(value.strip())
+        if not match:
+            return 0
+        number = int(match.group(1))
+    else:
+        return 0
+    return number if 1 <= number <= 10000 else 0
+
+
+def scan_sheet(file_path: str) -> SheetScan:
+    """
+    Разобрать активный лист книги за один проход по строкам
+
+    Первые HEAD_ROWS строк буферизуются для поиска заголовков, остальные строки читаются потоком.
+    """
+    with open_workbook(file_path) as workbook:
+        sheet = workbook.active
+        sheet.reset_dimensions()
+        scan = SheetScan(sheet_title=sheet.title)
+        rows = sheet.iter_rows(values_only=True)
+        head = list(islice(rows, HEAD_ROWS))
+
+        product_columns = _detect_product_columns(scan, head)
+        cp_columns = _detect_cp_columns(head)
+        items_header_row = next(
+            (row_idx for row_idx, values in enumerate(head[:10], 1)
+             if any(marker in ' '.join(str(value or '').lower() for value in values) for marker in ITEMS_HEADER_MARKERS)),
+            None
+        )
+
+        totals = deque(maxlen=10)
+        text_count = None
+        max_number = 0
+        data_rows = 0
+        row_idx = 0
+        for row_idx, values in enumerate(chain(head, rows), 1):
+            # Количество наименований: текстовое указание, порядковые номера, строки таблицы
+            if text_count is None:
+                text_count = _items_count_from_text(values)
+            if row_idx < 1000:
+                max_number = max(max_number, _sequence_number(_cell(values, 1)))
+            if items_header_row and items_header_row < row_idx < items_header_row + 1000:
+                if any(value is not None and str(value).strip() for value in values):
+                    row_text = ' '.join(str(value or '').lower() for value in values)
+                    if not any(word in row_text for word in ITEMS_TOTAL_KEYWORDS):
+                        data_rows += 1
+
+            # Данные КП
+            if cp_columns["supplier"] and 2 <= row_idx < 50:
+                supplier_value = str(_cell(values, cp_columns["supplier"]) or '').strip()
+                if supplier_value:
+                    scan.supplier_candidates.append(supplier_value)
+            if cp_columns["total"] and row_idx >= 2:
+                totals.append(_cell(values, cp_columns["total"]))
+
+            # Товары
+            if product_columns["name"] and row_idx > scan.header_row:
+                product = _product_from_row(row_idx, values, product_columns)
+                if product:
+                    scan.products.append(product)
+
+        scan.rows = row_idx
+        # Итоговая сумма обычно в конце таблицы
+        scan.total_candidates = [value for value in reversed(totals) if value is not None]
+        for count, source in ((text_count, "text"), (max_number, "numbers"), (data_rows, "rows")):
+            if count:
+                scan.items_count, scan.items_count_source = count, source
+                break
+        return scan
+
+
+def _file_hash(file_path: str) -> str:
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SheetScanCache:
+    """LRU-кэш результатов scan_sheet по хешу содержимого файла"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, SheetScan]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: str) -> Optional[SheetScan]:
+        scan = self._entries.get(key)
+        if scan is None:
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return scan
+
+    def put(self, key: str, scan: SheetScan) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = scan
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get_metrics(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self._hits, "misses": self._misses}
+
+
+sheet_scan_cache = SheetScanCache(max_entries=settings.EXCEL_SCAN_CACHE_SIZE)
+
+
+async def scan_workbook(file_path: str) -> SheetScan:
+    """
+    Разбор активного листа книги (из кэша, если файл с таким содержимым уже разбирался)
+
+    Разбор выполняется в пуле процессов извлечения текста, чтобы большая таблица не блокировала event loop.
+
+    Raises:
+        ImportError: если openpyxl не установлен
+        ExtractionTimeout: если разбор не уложился в DOC_EXTRACT_TIMEOUT_SECONDS
+    """
+    from services.documentation import extraction_pool
+    key = await asyncio.to_thread(_file_hash, file_path)
+    scan = sheet_scan_cache.get(key)
+    if scan is not None:
+        return scan
+    scan = await extraction_pool.run(scan_sheet, file_path)
+    logger.info(
+        f"Excel sheet '{scan.sheet_title}' of {file_path} scanned: {scan.rows} rows, "
+        f"{len(scan.products)} products, items count {scan.items_count} ({scan.items_count_source})"
+    )
+    sheet_scan_cache.put(key, scan)
+    return scan
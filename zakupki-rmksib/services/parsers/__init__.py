@@ -1,7 +1,7 @@
 from services.parsers.pavlik_parser import PavlikParser, fetch_new_lots
-from services.parsers.job import run_parsers_once, run_parser_for_customer, cleanup_expired_lots
+from services.parsers.job import run_parsers_once, run_parser_for_customer, cleanup_expired_lots, classify_pending_lots
 
-__all__ = ["fetch_new_lots", "PavlikParser", "run_parsers_once", "run_parser_for_customer", "cleanup_expired_lots"]
+__all__ = ["fetch_new_lots", "PavlikParser", "run_parsers_once", "run_parser_for_customer", "cleanup_expired_lots", "classify_pending_lots"]
 
 
 
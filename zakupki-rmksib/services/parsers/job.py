@@ -1,8 +1,10 @@
 from __future__ import annotations
+import time
 from loguru import logger
 from typing import List, Dict
 from services.parsers import fetch_new_lots
-from database import async_session_maker, LotRepository, UserRepository, UserPreferenceRepository
+from services.parsers.pipeline import ingest_lots
+from database import async_session_maker, Lot, LotRepository, UserRepository, UserPreferenceRepository
 from services.notifications import send_email
 from utils.formatters import format_rub, format_date
 from config.settings import settings
@@ -23,16 +25,16 @@ async def _matches_preferences(
 	if customers:
 		cust_ok = (lot.get("customer") in customers)
 	
-	if nomenclature:
-		# Используем улучшенную функцию проверки номенклатуры с поддержкой LLM
-		from config.nomenclature import check_nomenclature_match_enhanced
-		nom_ok = await check_nomenclature_match_enhanced(
-			lot_title=lot.get("title", ""),
-			lot_nomenclature=lot.get("nomenclature"),
-			lot_description=lot.get("description"),
-			nomenclature_list=nomenclature,
-			use_llm=True  # Используем LLM для семантического сопоставления
-		)
+	lot_tags = lot.get("nomenclature_tags")
+	if nomenclature and lot_tags is not None:
+		# Лот размечен при загрузке - достаточно пересечения множеств групп
+		from config.nomenclature import ALL_LOTS_KEY
+		nom_ok = ALL_LOTS_KEY in nomenclature or bool(set(lot_tags) & set(nomenclature))
+	elif nomenclature:
+		# Пакетная классификация не удалась (LLM недоступна) - не спрашиваем LLM по каждому
+		# лоту и пользователю, проверяем по ключевым словам до фоновой доразметки
+		from config.nomenclature import check_nomenclature_match
+		nom_ok = check_nomenclature_match(lot.get("title") or "", nomenclature)
 	
 	# Проверка бюджета
 	if budget_min is not None or budget_max is not None:
@@ -45,81 +47,74 @@ async def _matches_preferences(
 	return cust_ok and nom_ok and budget_ok
 
 
+async def classify_lots(lots: List[Lot]) -> Dict[int, List[str]]:
+	"""
+	Размечает лоты номенклатурными группами (ключевые слова, затем пакетные запросы к LLM)
+	и сохраняет разметку в БД
+	
+	Запросы к LLM идут без открытой сессии: соединение с БД берется только для сохранения разметки.
+	
+	Returns:
+		Словарь {id лота: список групп} для успешно размеченных лотов
+	"""
+	from config.nomenclature import classify_lots_nomenclature
+	
+	if not lots:
+		return {}
+	
+	groups_list = await classify_lots_nomenclature([
+		{"title": lot.title, "description": lot.description, "nomenclature": lot.nomenclature}
+		for lot in lots
+	])
+	tags_by_lot_id = {
+		lot.id: groups
+		for lot, groups in zip(lots, groups_list)
+		if groups is not None
+	}
+	async with async_session_maker() as session:
+		await LotRepository(session).save_nomenclature_tags(tags_by_lot_id)
+	
+	skipped = len(lots) - len(tags_by_lot_id)
+	logger.info(f"Nomenclature classification: tagged {len(tags_by_lot_id)} lots" + (f", {skipped} left for retry" if skipped else ""))
+	return tags_by_lot_id
+
+
+async def classify_pending_lots(limit: int = 200) -> int:
+	"""
+	Доразметка актуальных лотов, которые еще не классифицированы по номенклатуре
+	(лоты, загруженные до появления классификации, или лоты, для которых LLM была недоступна)
+	
+	Returns:
+		Количество размеченных лотов
+	"""
+	try:
+		async with async_session_maker() as session:
+			lots = await LotRepository(session).get_unclassified(limit)
+		tags_by_lot_id = await classify_lots(lots)
+		return len(tags_by_lot_id)
+	except Exception as e:
+		logger.error(f"Error during nomenclature classification of pending lots: {e}", exc_info=True)
+		return 0
+
+
 async def run_parsers_once() -> int:
 	"""Fetch new lots and upsert them into the database, then notify interested users."""
-	new_count = 0
-	created: List[Dict] = []
+	started = time.monotonic()
 	lots: List[Dict] = await fetch_new_lots()
+	logger.info(f"Parser job: fetched {len(lots or [])} lots in {time.monotonic() - started:.2f}s")
 	if not lots:
 		logger.info("Parser returned no lots")
 		return 0
 
-	async with async_session_maker() as session:
-		repo = LotRepository(session)
-		for data in lots:
-			lot_number = data.get("lot_number")
-			if not lot_number:
-				continue
-			exists = await repo.get_by_lot_number(lot_number)
-			if exists:
-				continue
-			
-			# Фильтруем данные, оставляя только поля модели Lot
-			# Удаляем поля, которых нет в модели: url, publish_date, parsed_at
-			lot_data = {
-				"platform_name": data.get("platform_name"),
-				"lot_number": data.get("lot_number"),
-				"title": data.get("title"),
-				"description": data.get("description"),
-				"budget": data.get("budget", 0.0),
-				"deadline": data.get("deadline"),
-				"status": data.get("status", "active"),
-				"review_status": "not_viewed",  # По умолчанию не просмотрен
-			}
-			# Добавляем опциональные поля только если они не None
-			if data.get("customer"):
-				lot_data["customer"] = data.get("customer")
-			if data.get("nomenclature"):
-				lot_data["nomenclature"] = data.get("nomenclature")
-			if data.get("url"):
-				lot_data["url"] = data.get("url")
-			if data.get("source"):
-				lot_data["source"] = data.get("source")
-			else:
-				lot_data["source"] = "parser"  # Значение по умолчанию
-			
-			# Создаем лот в БД
-			lot = await repo.create(**lot_data)
-			created.append(data)
-			new_count += 1
-			
-			# Автоматически скачиваем документацию, если есть URL
-			if data.get("url") and lot:
-				try:
-					from services.documentation import download_documentation_from_url, extract_text_from_file
-					logger.info(f"Auto-downloading documentation for lot {lot.lot_number} from {data.get('url')}")
-					
-					# Скачиваем документацию
-					file_path = await download_documentation_from_url(data.get("url"), lot.lot_number)
-					
-					if file_path:
-						# Извлекаем текст
-						documentation_text = await extract_text_from_file(file_path)
-						
-						# Обновляем лот в БД
-						lot.documentation_path = file_path
-						lot.documentation_text = documentation_text if documentation_text and not documentation_text.startswith("[Ошибка") else None
-						lot.documentation_analyzed = False
-						await repo.update(lot)
-						
-						logger.info(f"Documentation auto-downloaded for lot {lot.lot_number}: {file_path}")
-					else:
-						logger.warning(f"Could not auto-download documentation for lot {lot.lot_number}")
-				except Exception as e:
-					logger.error(f"Error auto-downloading documentation for lot {lot.lot_number}: {e}", exc_info=True)
-					# Не прерываем процесс парсинга из-за ошибки скачивания документации
+	# Дедупликация, вставка, скачивание документации и классификация - конвейером
+	result = await ingest_lots(lots)
+	created: List[Dict] = result.created
+	new_count = len(created)
 
 	logger.info(f"Parser job: created {new_count} new lots")
+	
+	# Доразмечаем лоты, оставшиеся без классификации с прошлых запусков
+	await classify_pending_lots()
 
 	if new_count > 0:
 		# Build personalized recipients map: email -> list of lots
@@ -211,79 +206,10 @@ async def run_parser_for_customer(customer_name: str) -> tuple[int, str]:
 	if not lots:
 		return 0, "📭 Новых лотов не найдено."
 	
-	# Сохраняем лоты в БД
-	new_count = 0
-	created: List[Dict] = []
-	
-	async with async_session_maker() as session:
-		repo = LotRepository(session)
-		for data in lots:
-			# Убеждаемся, что заказчик установлен
-			if not data.get("customer"):
-				data["customer"] = customer_name
-			
-			lot_number = data.get("lot_number")
-			if not lot_number:
-				continue
-			
-			exists = await repo.get_by_lot_number(lot_number)
-			if exists:
-				continue
-			
-			# Фильтруем данные, оставляя только поля модели Lot
-			# Удаляем поля, которых нет в модели: url, publish_date, parsed_at
-			lot_data = {
-				"platform_name": data.get("platform_name"),
-				"lot_number": data.get("lot_number"),
-				"title": data.get("title"),
-				"description": data.get("description"),
-				"budget": data.get("budget", 0.0),
-				"deadline": data.get("deadline"),
-				"status": data.get("status", "active"),
-				"review_status": "not_viewed",  # По умолчанию не просмотрен
-			}
-			# Добавляем опциональные поля только если они не None
-			if data.get("customer"):
-				lot_data["customer"] = data.get("customer")
-			if data.get("nomenclature"):
-				lot_data["nomenclature"] = data.get("nomenclature")
-			if data.get("url"):
-				lot_data["url"] = data.get("url")
-			if data.get("source"):
-				lot_data["source"] = data.get("source")
-			else:
-				lot_data["source"] = "parser"  # Значение по умолчанию
-			
-			# Создаем лот в БД
-			lot = await repo.create(**lot_data)
-			created.append(data)
-			new_count += 1
-			
-			# Автоматически скачиваем документацию, если есть URL
-			if data.get("url") and lot:
-				try:
-					from services.documentation import download_documentation_from_url, extract_text_from_file
-					logger.info(f"Auto-downloading documentation for lot {lot.lot_number} from {data.get('url')}")
-					
-					# Скачиваем документацию
-					file_path = await download_documentation_from_url(data.get("url"), lot.lot_number)
-					
-					if file_path:
-						# Извлекаем текст
-						documentation_text = await extract_text_from_file(file_path)
-						
-						# Обновляем лот в БД
-						lot.documentation_path = file_path
-						lot.documentation_text = documentation_text if documentation_text and not documentation_text.startswith("[Ошибка") else None
-						lot.documentation_analyzed = False
-						await repo.update(lot)
-						
-						logger.info(f"Documentation auto-downloaded for lot {lot.lot_number}: {file_path}")
-					else:
-						logger.warning(f"Could not auto-download documentation for lot {lot.lot_number}")
-				except Exception as e:
-					logger.error(f"Error auto-downloading documentation for lot {lot.lot_number}: {e}", exc_info=True)
-					# Не прерываем процесс парсинга из-за ошибки скачивания документации
+	# Сохраняем лоты в БД (дедупликация, вставка, документация и классификация - конвейером)
+	result = await ingest_lots(lots, default_customer=customer_name)
+	created: List[Dict] = result.created
+	new_count = len(created)
 	
 	if new_count == 0:
 		return 0, "📭 Новых лотов не найдено (все уже есть в базе)."
@@ -318,21 +244,50 @@ async def cleanup_expired_lots(days_before_expiry: int = 0) -> int:
 		Количество удаленных лотов
 	"""
 	from database import async_session_maker, LotRepository
+	from services.documentation import delete_documentation_files
 	
 	try:
 		async with async_session_maker() as session:
 			repo = LotRepository(session)
-			deleted_count = await repo.delete_expired_lots(days_before_expiry)
+			counts, file_paths = await repo.delete_expired_lots(days_before_expiry)
+		deleted_count = counts["lots"]
+		
+		# Файлы удаляем после фиксации транзакций: в худшем случае на диске останется лишний файл,
+		# но не будет лота со ссылкой на удаленный файл
+		deleted_files = await delete_documentation_files(file_paths)
 		
 		if deleted_count > 0:
+			details = f"{counts['commercial_proposals']} commercial proposals, {deleted_files} files"
 			if days_before_expiry == 0:
-				logger.info(f"Cleanup: deleted {deleted_count} expired lots (deadline < now)")
+				logger.info(f"Cleanup: deleted {deleted_count} expired lots (deadline < now), {details}")
 			else:
-				logger.info(f"Cleanup: deleted {deleted_count} expired lots (deadline < now - {days_before_expiry} day(s))")
+				logger.info(f"Cleanup: deleted {deleted_count} expired lots (deadline < now - {days_before_expiry} day(s)), {details}")
 		else:
 			logger.info("Cleanup: no expired lots to delete")
 		
+		await cleanup_lot_analyses()
+		
 		return deleted_count
 	except Exception as e:
 		logger.error(f"Error during cleanup of expired lots: {e}", exc_info=True)
 		return 0
+
+
+async def cleanup_lot_analyses() -> int:
+	"""
+	Очистка кэша анализов лотов и документации: удаляет анализы старше ANALYSIS_CACHE_TTL_HOURS
+	
+	Returns:
+		Количество удаленных записей
+	"""
+	from database import LotAnalysisRepository
+	
+	try:
+		async with async_session_maker() as session:
+			purged = await LotAnalysisRepository(session).purge_older_than(settings.ANALYSIS_CACHE_TTL_HOURS)
+		if purged:
+			logger.info(f"Cleanup: purged {purged} stale lot analyses")
+		return purged
+	except Exception as e:
+		logger.error(f"Error during cleanup of lot analyses: {e}", exc_info=True)
+		return 0
@@ -0,0 +1,234 @@
+"""
+Конвейер загрузки новых лотов: дедупликация со вставкой → скачивание документации → извлечение текста,
+параллельно со скачиванием документации - классификация номенклатуры.
+
+Стадии связаны ограниченными очередями: у каждой стадии свой предел параллелизма, а медленная стадия
+притормаживает предыдущую (backpressure), не накапливая в памяти скачанные файлы.
+"""
+from __future__ import annotations
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from loguru import logger
+from database import async_session_maker, Lot, LotRepository
+from config.settings import settings
+
+# Маркер конца очереди
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+	"""Статистика стадии конвейера"""
+	name: str
+	items: int = 0
+	failed: int = 0
+	busy: float = 0.0  # Суммарное время обработки элементов (по всем обработчикам)
+	started_at: float | None = None
+	finished_at: float | None = None
+
+	@property
+	def wall(self) -> float:
+		if self.started_at is None or self.finished_at is None:
+			return 0.0
+		return self.finished_at - self.started_at
+
+	def __str__(self) -> str:
+		text = f"{self.name}: {self.items} items, {self.wall:.2f}s wall, {self.busy:.2f}s busy"
+		if self.failed:
+			text += f", {self.failed} failed"
+		return text
+
+
+@dataclass
+class IngestResult:
+	"""Результат загрузки: данные парсера и созданные лоты в одном порядке"""
+	created: List[Dict] = field(default_factory=list)
+	created_lots: List[Lot] = field(default_factory=list)
+	stats: List[StageStats] = field(default_factory=list)
+
+
+class _Timer:
+	"""Замер однократной (пакетной) стадии"""
+
+	def __init__(self, stats: StageStats):
+		self.stats = stats
+
+	def __enter__(self) -> StageStats:
+		self.stats.started_at = time.monotonic()
+		return self.stats
+
+	def __exit__(self, *exc_info) -> None:
+		self.stats.finished_at = time.monotonic()
+		self.stats.busy = self.stats.wall
+
+
+async def _run_stage(
+	stats: StageStats,
+	handler: Callable[[Any], Awaitable[Any]],
+	inbox: asyncio.Queue,
+	outbox: Optional[asyncio.Queue],
+	concurrency: int
+) -> None:
+	"""
+	Запускает concurrency обработчиков, читающих inbox до маркера _DONE.
+	Непустой результат обработчика передается в outbox; ошибка элемента не останавливает стадию.
+	"""
+	async def worker() -> None:
+		while True:
+			item = await inbox.get()
+			if item is _DONE:
+				# Возвращаем маркер для остальных обработчиков стадии
+				await inbox.put(_DONE)
+				return
+			if stats.started_at is None:
+				stats.started_at = time.monotonic()
+			started = time.monotonic()
+			try:
+				result = await handler(item)
+			except Exception as e:
+				stats.failed += 1
+				result = None
+				logger.error(f"Parser pipeline stage '{stats.name}' failed: {e}", exc_info=True)
+			stats.busy += time.monotonic() - started
+			stats.items += 1
+			if result is not None and outbox is not None:
+				await outbox.put(result)
+
+	await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+	stats.finished_at = time.monotonic()
+	if outbox is not None:
+		await outbox.put(_DONE)
+
+
+def _lot_fields(data: Dict) -> Dict:
+	"""Оставляет только поля модели Lot (url, publish_date, parsed_at парсера в модель не входят)"""
+	lot_data = {
+		"platform_name": data.get("platform_name"),
+		"lot_number": data.get("lot_number"),
+		"title": data.get("title"),
+		"description": data.get("description"),
+		"budget": data.get("budget", 0.0),
+		"deadline": data.get("deadline"),
+		"status": data.get("status", "active"),
+		"review_status": "not_viewed",  # По умолчанию не просмотрен
+	}
+	# Пустые опциональные поля сохраняем как NULL (набор ключей одинаков для пакетной вставки)
+	lot_data["customer"] = data.get("customer") or None
+	lot_data["nomenclature"] = data.get("nomenclature") or None
+	lot_data["url"] = data.get("url") or None
+	lot_data["source"] = data.get("source") or "parser"  # Значение по умолчанию
+	return lot_data
+
+
+async def _download_documentation(item: Tuple[Dict, Lot]) -> Optional[Tuple[Lot, str]]:
+	from services.documentation import download_documentation_from_url
+	data, lot = item
+	logger.info(f"Auto-downloading documentation for lot {lot.lot_number} from {data.get('url')}")
+	file_path = await download_documentation_from_url(data.get("url"), lot.lot_number, extract_text=False)
+	if not file_path:
+		logger.warning(f"Could not auto-download documentation for lot {lot.lot_number}")
+		return None
+	return lot, file_path
+
+
+async def _extract_documentation(item: Tuple[Lot, str]) -> None:
+	from services.documentation import extract_text_from_file
+	lot, file_path = item
+	documentation_text = await extract_text_from_file(file_path)
+	if not documentation_text or documentation_text.startswith("[Ошибка"):
+		documentation_text = None
+
+	async with async_session_maker() as session:
+		await LotRepository(session).set_documentation(lot.id, file_path, documentation_text)
+	lot.documentation_path = file_path
+	lot.documentation_text = documentation_text
+	lot.documentation_analyzed = False
+	logger.info(f"Documentation auto-downloaded for lot {lot.lot_number}: {file_path}")
+
+
+async def _classify(created: List[Dict], created_lots: List[Lot], stats: StageStats) -> None:
+	from services.parsers.job import classify_lots
+	stats.started_at = time.monotonic()
+	try:
+		tags_by_lot_id = await classify_lots(created_lots)
+		for data, lot in zip(created, created_lots):
+			data["nomenclature_tags"] = tags_by_lot_id.get(lot.id)
+		stats.items = len(created_lots)
+	except Exception as e:
+		stats.failed = len(created_lots)
+		logger.error(f"Error during nomenclature classification of new lots: {e}", exc_info=True)
+	finally:
+		stats.finished_at = time.monotonic()
+		stats.busy = stats.wall
+
+
+async def ingest_lots(lots: List[Dict], default_customer: str | None = None) -> IngestResult:
+	"""
+	Сохраняет новые лоты парсера в БД, скачивает их документацию и размечает номенклатуру
+
+	Args:
+		lots: Лоты, полученные от парсера
+		default_customer: Заказчик для лотов, у которых он не указан
+
+	Returns:
+		IngestResult с данными и объектами созданных лотов (в data["nomenclature_tags"] - разметка номенклатуры)
+	"""
+	result = IngestResult()
+
+	# Дедупликация и вставка одним запросом (INSERT ... ON CONFLICT DO NOTHING RETURNING)
+	upsert_stats = StageStats("upsert")
+	result.stats.append(upsert_stats)
+	with _Timer(upsert_stats):
+		by_number: Dict[str, Dict] = {}
+		for data in lots:
+			if default_customer and not data.get("customer"):
+				data["customer"] = default_customer
+			lot_number = data.get("lot_number")
+			if lot_number and lot_number not in by_number:
+				by_number[lot_number] = data
+		async with async_session_maker() as session:
+			inserted = await LotRepository(session).bulk_upsert([_lot_fields(data) for data in by_number.values()])
+		upsert_stats.items = len(lots)
+
+	if not inserted:
+		_log_stats(result)
+		return result
+
+	# RETURNING не гарантирует порядок - сопоставляем по номеру лота в порядке парсера
+	inserted_by_number = {lot.lot_number: lot for lot in inserted}
+	new_lots = [data for lot_number, data in by_number.items() if lot_number in inserted_by_number]
+	created_lots = [inserted_by_number[data["lot_number"]] for data in new_lots]
+	result.created = new_lots
+	result.created_lots = created_lots
+
+	# Классификация не зависит от документации и идет параллельно со скачиванием
+	classify_stats = StageStats("classify")
+	classify_task = asyncio.create_task(_classify(new_lots, created_lots, classify_stats))
+
+	download_stats = StageStats("download")
+	extract_stats = StageStats("extract")
+	download_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.PARSER_QUEUE_SIZE)
+	extract_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.PARSER_QUEUE_SIZE)
+
+	async def feed() -> None:
+		for data, lot in zip(new_lots, created_lots):
+			if data.get("url"):
+				await download_queue.put((data, lot))
+		await download_queue.put(_DONE)
+
+	await asyncio.gather(
+		feed(),
+		_run_stage(download_stats, _download_documentation, download_queue, extract_queue, settings.PARSER_DOWNLOAD_CONCURRENCY),
+		_run_stage(extract_stats, _extract_documentation, extract_queue, None, settings.PARSER_EXTRACT_CONCURRENCY),
+	)
+	await classify_task
+
+	result.stats.extend([download_stats, extract_stats, classify_stats])
+	_log_stats(result)
+	return result
+
+
+def _log_stats(result: IngestResult) -> None:
+	logger.info("Parser pipeline: " + "; ".join(str(stats) for stats in result.stats))
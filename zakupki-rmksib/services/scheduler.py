@@ -0,0 +1,219 @@
+"""
+Фоновые задачи (парсинг, очистка и доразметка лотов) и отдельный процесс планировщика.
+
+Каждый запуск задачи проходит через run_job: экземпляр планировщика берет аренду задачи в БД
+(scheduler_leases) и выполняет задачу, только если получил ее. После завершения аренда остается
+за экземпляром до начала следующего периода задачи (интервал или промежуток между запусками по cron
+минус SCHEDULER_FIRE_JITTER_SECONDS), поэтому реплики с собственными хранилищами задач, у которых
+интервальные задачи срабатывают со сдвигом в несколько минут, выполняют задачу один раз за период.
+Запуски и их длительность сохраняются в scheduled_job_runs (см. /job_stats).
+
+Запуск отдельного процесса (в боте при этом SCHEDULER_EMBEDDED=false):
+    python -m services.scheduler
+"""
+import asyncio
+import logging
+import os
+import signal
+import socket
+import traceback
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict
+from apscheduler.events import EVENT_JOB_MISSED, EVENT_JOB_MAX_INSTANCES
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from loguru import logger
+from config.settings import settings
+from database import async_session_maker, SchedulerRepository
+
+# Экземпляр планировщика (держатель аренды)
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def purge_job_history() -> int:
+    async with async_session_maker() as session:
+        return await SchedulerRepository(session).purge_runs_older_than(settings.SCHEDULER_HISTORY_DAYS)
+
+
+def _job_functions() -> Dict[str, Callable[[], Awaitable[object]]]:
+    from services.parsers.job import run_parsers_once, cleanup_expired_lots, classify_pending_lots
+    return {
+        "parser-job": run_parsers_once,
+        "cleanup-expired-lots": cleanup_expired_lots,
+        "classify-pending-lots": classify_pending_lots,
+        "purge-job-history": purge_job_history,
+    }
+
+
+async def _keep_lease(job_id: str) -> None:
+    """Продлевать аренду, пока задача выполняется"""
+    ttl = settings.SCHEDULER_LEASE_SECONDS
+    while True:
+        await asyncio.sleep(ttl / 3)
+        try:
+            async with async_session_maker() as session:
+                renewed = await SchedulerRepository(session).renew_lease(job_id, INSTANCE_ID, ttl)
+            if not renewed:
+                logger.error(f"Lease for job {job_id} was taken over by another instance while the job is running")
+                return
+        except Exception as e:
+            logger.warning(f"Could not renew lease for job {job_id}: {e}")
+
+
+def _job_period_seconds(job_id: str) -> float:
+    """Период задачи по расписанию: интервал или промежуток между двумя ближайшими запусками по cron"""
+    trigger = dict(_job_triggers()[job_id])
+    trigger_type = trigger.pop("trigger")
+    trigger.pop("next_run_time", None)
+    if trigger_type == "interval":
+        return IntervalTrigger(**trigger).interval.total_seconds()
+    cron = CronTrigger(**trigger)
+    first = cron.get_next_fire_time(None, datetime.now(cron.timezone))
+    second = cron.get_next_fire_time(first, first + timedelta(seconds=1))
+    return (second - first).total_seconds()
+
+
+async def run_job(job_id: str) -> None:
+    """Выполнить задачу job_id, если этот экземпляр получил ее аренду, и записать запуск в историю"""
+    job = _job_functions()[job_id]
+    started_at = datetime.utcnow()
+    async with async_session_maker() as session:
+        acquired = await SchedulerRepository(session).acquire_lease(job_id, INSTANCE_ID, settings.SCHEDULER_LEASE_SECONDS)
+    if not acquired:
+        logger.info(f"Job {job_id} skipped: another scheduler instance holds the lease")
+        return
+
+    async with async_session_maker() as session:
+        run = await SchedulerRepository(session).start_run(job_id, INSTANCE_ID)
+    keeper = asyncio.create_task(_keep_lease(job_id))
+    status, error = "success", None
+    try:
+        await job()
+    except Exception as e:
+        status, error = "failed", "".join(traceback.format_exception(e))
+        logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+    finally:
+        keeper.cancel()
+        async with async_session_maker() as session:
+            repo = SchedulerRepository(session)
+            await repo.finish_run(run.id, status, error)
+            # Аренда держится до следующего периода: запуск этого периода у других реплик пропускается
+            period = _job_period_seconds(job_id)
+            hold = period - min(settings.SCHEDULER_FIRE_JITTER_SECONDS, period / 2)
+            await repo.release_lease(job_id, INSTANCE_ID, hold_until=started_at + timedelta(seconds=hold))
+    logger.info(f"Job {job_id} finished with status {status}")
+
+
+async def _record_missed(job_id: str, scheduled_at: datetime) -> None:
+    async with async_session_maker() as session:
+        repo = SchedulerRepository(session)
+        run = await repo.start_run(job_id, INSTANCE_ID, status="missed")
+        await repo.finish_run(run.id, "missed", f"Scheduled at {scheduled_at.isoformat()}")
+
+
+def _on_job_event(event) -> None:
+    if event.code == EVENT_JOB_MISSED:
+        # Запуск пропущен дольше misfire_grace_time (например, планировщик был остановлен)
+        logger.warning(f"Job {event.job_id} missed its run at {event.scheduled_run_time}")
+        asyncio.get_running_loop().create_task(_record_missed(event.job_id, event.scheduled_run_time))
+    elif event.code == EVENT_JOB_MAX_INSTANCES:
+        logger.warning(f"Job {event.job_id} is still running, next run skipped")
+
+
+def _job_triggers() -> Dict[str, dict]:
+    """Расписание фоновых задач"""
+    triggers = {
+        # Очистка лотов с истекающим дедлайном (каждый день в 3:00)
+        "cleanup-expired-lots": {"trigger": "cron", "hour": 3, "minute": 0},
+        # Доразметка номенклатурными группами лотов, оставшихся без классификации
+        # (загруженных до ее появления или при недоступной LLM): при старте и затем каждые 15 минут
+        "classify-pending-lots": {"trigger": "interval", "minutes": 15, "next_run_time": datetime.now()},
+        # Очистка истории запусков (каждый день в 3:30)
+        "purge-job-history": {"trigger": "cron", "hour": 3, "minute": 30},
+    }
+    # Парсинг лотов (каждые N минут, если настроено)
+    parser_interval = getattr(settings, 'PARSER_INTERVAL_MINUTES', 720)  # По умолчанию 12 часов
+    if parser_interval > 0:
+        triggers["parser-job"] = {"trigger": "interval", "minutes": parser_interval}
+    return triggers
+
+
+def add_background_jobs(scheduler: AsyncIOScheduler) -> None:
+    """
+    Добавить фоновые задачи в scheduler. Задачи, уже сохраненные в постоянном хранилище, сохраняют
+    время следующего запуска; задачи, которых больше нет в расписании, удаляются
+    """
+    triggers = _job_triggers()
+    for job in scheduler.get_jobs():
+        if job.func_ref == f"{__name__}:run_job" and job.id not in triggers:
+            job.remove()
+    for job_id, trigger in triggers.items():
+        trigger = dict(trigger)
+        trigger_type = trigger.pop("trigger")
+        next_run_time = trigger.pop("next_run_time", None)
+        existing = scheduler.get_job(job_id)
+        if existing is not None:
+            fresh = {"cron": CronTrigger, "interval": IntervalTrigger}[trigger_type](**trigger)
+            if str(fresh) != str(existing.trigger):
+                existing.reschedule(trigger_type, **trigger)
+            continue
+        scheduler.add_job(
+            run_job,
+            trigger_type,
+            args=[job_id],
+            id=job_id,
+            replace_existing=True,
+            **({"next_run_time": next_run_time} if next_run_time else {}),
+            **trigger,
+        )
+    scheduler.add_listener(_on_job_event, EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
+
+
+def _sync_database_url() -> str:
+    """URL БД для хранилища задач APScheduler (синхронный драйвер)"""
+    from database.connection import database_url
+    return database_url.replace("+asyncpg", "+psycopg2").replace("+aiosqlite", "")
+
+
+def create_standalone_scheduler() -> AsyncIOScheduler:
+    """Планировщик отдельного процесса: задачи хранятся в БД, пропущенные запуски догоняются"""
+    from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+    return AsyncIOScheduler(
+        jobstores={"default": SQLAlchemyJobStore(url=settings.SCHEDULER_JOBSTORE_URL or _sync_database_url())},
+        job_defaults={
+            # Несколько пропущенных запусков выполняются один раз
+            "coalesce": True,
+            "max_instances": 1,
+            "misfire_grace_time": settings.SCHEDULER_MISFIRE_GRACE_SECONDS,
+        },
+    )
+
+
+async def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    from services.ai import close_http_client
+
+    scheduler = create_standalone_scheduler()
+    # Хранилище загружается при старте; задачи сверяются с расписанием до первого запуска
+    scheduler.start(paused=True)
+    add_background_jobs(scheduler)
+    scheduler.resume()
+    logger.info(f"Scheduler {INSTANCE_ID} started: {', '.join(job.id for job in scheduler.get_jobs())}")
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+    try:
+        await stopping.wait()
+    finally:
+        scheduler.shutdown(wait=False)
+        await close_http_client()
+        from services.documentation import extraction_pool
+        extraction_pool.shutdown()
+        logger.info(f"Scheduler {INSTANCE_ID} stopped")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
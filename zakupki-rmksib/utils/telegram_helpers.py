@@ -1,48 +1,33 @@
 """Утилиты для работы с Telegram API"""
-from typing import List
+import asyncio
+import time
+from typing import AsyncIterable, List, Optional
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
 from aiogram.types import Message
 from aiogram import Bot
+from loguru import logger
 
+# Лимит длины текста сообщения Telegram
+TELEGRAM_MESSAGE_LIMIT = 4096
 
-async def send_long_message(
-    bot: Bot,
-    chat_id: int,
-    text: str,
-    parse_mode: str = "HTML",
-    max_length: int = 4096,
-    reply_markup=None
-) -> List[Message]:
+# Курсор в конце текста, пока ответ модели еще генерируется
+STREAM_CURSOR = " ▌"
+
+
+def split_message_text(text: str, max_length: int = TELEGRAM_MESSAGE_LIMIT) -> List[str]:
     """
-    Отправляет длинное сообщение, разбивая его на части если необходимо
+    Разбивает текст на части не длиннее max_length (по строкам, длинные строки - по словам)
     
     Args:
-        bot: Экземпляр бота
-        chat_id: ID чата
-        text: Текст сообщения
-        parse_mode: Режим парсинга (HTML/Markdown)
-        max_length: Максимальная длина одного сообщения (по умолчанию 4096 для Telegram)
-        reply_markup: Клавиатура (будет добавлена только к последнему сообщению)
+        text: Исходный текст
+        max_length: Максимальная длина одной части
     
     Returns:
-        Список отправленных сообщений
+        Список частей (одна часть, если текст помещается целиком)
     """
-    if bot is None:
-        raise ValueError("Bot instance is required")
-    
-    messages = []
-    
     if len(text) <= max_length:
-        # Сообщение помещается в один раз
-        msg = await bot.send_message(
-            chat_id=chat_id,
-            text=text,
-            parse_mode=parse_mode,
-            reply_markup=reply_markup
-        )
-        messages.append(msg)
-        return messages
+        return [text]
     
-    # Разбиваем на части
     parts = []
     current_part = ""
     
@@ -78,6 +63,37 @@ async def send_long_message(
     if current_part:
         parts.append(current_part.rstrip())
     
+    return parts
+
+
+async def send_long_message(
+    bot: Bot,
+    chat_id: int,
+    text: str,
+    parse_mode: str = "HTML",
+    max_length: int = 4096,
+    reply_markup=None
+) -> List[Message]:
+    """
+    Отправляет длинное сообщение, разбивая его на части если необходимо
+    
+    Args:
+        bot: Экземпляр бота
+        chat_id: ID чата
+        text: Текст сообщения
+        parse_mode: Режим парсинга (HTML/Markdown)
+        max_length: Максимальная длина одного сообщения (по умолчанию 4096 для Telegram)
+        reply_markup: Клавиатура (будет добавлена только к последнему сообщению)
+    
+    Returns:
+        Список отправленных сообщений
+    """
+    if bot is None:
+        raise ValueError("Bot instance is required")
+    
+    messages = []
+    parts = split_message_text(text, max_length)
+    
     # Отправляем все части
     for i, part in enumerate(parts):
         # Клавиатуру добавляем только к последнему сообщению
@@ -94,6 +110,100 @@ async def send_long_message(
     return messages
 
 
+async def _safe_edit(message: Message, text: str, parse_mode: Optional[str], reply_markup=None, final: bool = False) -> None:
+    """
+    Правка сообщения при потоковом выводе.
+    
+    Промежуточные правки не критичны: при незакрытом HTML-теге в середине ответа
+    или при совпадении текста правка пропускается. Финальная правка при ошибке разметки
+    повторяется без parse_mode, чтобы пользователь гарантированно получил текст.
+    """
+    while True:
+        try:
+            await message.edit_text(text, parse_mode=parse_mode, reply_markup=reply_markup)
+            return
+        except TelegramRetryAfter as e:
+            if not final:
+                return
+            await asyncio.sleep(e.retry_after)
+        except TelegramBadRequest as e:
+            error = str(e).lower()
+            if "message is not modified" in error:
+                return
+            if final and parse_mode and "can't parse entities" in error:
+                parse_mode = None
+                continue
+            if final:
+                raise
+            logger.debug(f"Skip intermediate stream edit: {e}")
+            return
+
+
+async def stream_to_message(
+    message: Message,
+    chunks: AsyncIterable[str],
+    header: str = "",
+    parse_mode: Optional[str] = "HTML",
+    reply_markup=None,
+    min_interval: float = 1.5,
+    max_length: int = TELEGRAM_MESSAGE_LIMIT
+) -> str:
+    """
+    Выводит потоковый ответ в сообщение, редактируя его по мере поступления фрагментов
+    
+    Сообщение редактируется не чаще раза в min_interval секунд (лимит Telegram на правки).
+    Если текст превышает max_length, он разбивается так же, как в send_long_message:
+    первая часть остается в исходном сообщении, остальные отправляются новыми сообщениями.
+    
+    Args:
+        message: Сообщение бота, которое будет редактироваться (например, "Анализирую...")
+        chunks: Асинхронный поток фрагментов текста
+        header: Заголовок перед текстом ответа
+        parse_mode: Режим парсинга (HTML/Markdown)
+        reply_markup: Клавиатура (добавляется к последнему сообщению после завершения потока)
+        min_interval: Минимальный интервал между правками, секунды
+        max_length: Максимальная длина одного сообщения
+    
+    Returns:
+        Полный текст ответа (без заголовка)
+    """
+    messages: List[Message] = [message]
+    shown: List[Optional[str]] = [None]
+    body = ""
+    
+    async def render(final: bool) -> None:
+        # Место под курсор резервируем, чтобы часть с курсором не превысила лимит
+        parts = split_message_text(header + body, max_length - len(STREAM_CURSOR))
+        for i, part in enumerate(parts):
+            is_last = i == len(parts) - 1
+            text = part if final or not is_last else part + STREAM_CURSOR
+            markup = reply_markup if final and is_last else None
+            if i < len(messages):
+                if shown[i] == text and not (final and is_last):
+                    continue
+                await _safe_edit(messages[i], text, parse_mode, reply_markup=markup, final=final)
+            else:
+                # Продолжение отправляем без разметки: финальная правка применит parse_mode
+                msg = await message.bot.send_message(chat_id=message.chat.id, text=text)
+                messages.append(msg)
+                shown.append(text)
+                if final:
+                    await _safe_edit(msg, text, parse_mode, reply_markup=markup, final=True)
+            shown[i] = text
+    
+    last_render = 0.0
+    async for chunk in chunks:
+        body += chunk
+        now = time.monotonic()
+        if now - last_render >= min_interval:
+            last_render = now
+            await render(final=False)
+    
+    if body:
+        await render(final=True)
+    return body
+
+
 def truncate_text(text: str, max_length: int = 4000, suffix: str = "...") -> str:
     """
     Обрезает текст до максимальной длины